@@ -0,0 +1,178 @@
+"""
+Menuda Finance API - ASGI Entry Point
+
+Async serving mode for I/O-bound routes. The routes that spend most of their
+time waiting (invoice extraction, S3 uploads, transaction reads, event
+streams) are served by async handlers in async_routes/ on an event loop;
+every other route falls through to the regular Flask app, run in a thread
+pool. URLs and payloads are identical to the WSGI app.
+
+Run with (behind a proxy, add --proxy-headers --forwarded-allow-ips <proxy>
+so request.remote_addr is the client's, see utils/ratelimit.py):
+    uvicorn asgi:app --workers 4
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import time
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, g, jsonify, request
+from werkzeug.exceptions import HTTPException
+from config import CORS_EXPOSE_HEADERS, CORS_ORIGINS
+from main import create_app
+from async_routes.transactions import async_transactions_bp
+from async_routes.invoices import async_invoices_bp, init_http_client, close_http_client
+from async_routes.attachments import async_attachments_bp
+from async_routes.events import async_events_bp
+from utils import async_db
+from utils.db import LAST_WRITE_HEADER, begin_request, last_write_header
+from utils.auth import SessionError, session_from_request, tokens_required
+from utils.ratelimit import EXEMPT_RULES, get_rate_limiter, rate_limit_identity, rate_limited, too_many_requests
+from utils.metrics import http_request_duration
+
+
+def create_async_app():
+    """
+    Create and configure the Quart application with the async routes
+    Returns:
+        Quart: Configured Quart application
+    """
+    app = Quart(__name__)
+
+    # Register blueprints
+    app.register_blueprint(async_transactions_bp, url_prefix='/api')
+    app.register_blueprint(async_invoices_bp, url_prefix='/api')
+    app.register_blueprint(async_attachments_bp, url_prefix='/api')
+    app.register_blueprint(async_events_bp, url_prefix='/api')
+
+    @app.before_serving
+    async def open_clients():
+        """Open the DB pool and HTTP client once per worker"""
+        await async_db.init_pool()
+        await init_http_client()
+
+    @app.after_serving
+    async def close_clients():
+        """Release the DB pool and HTTP client on shutdown"""
+        await close_http_client()
+        await async_db.close_pool()
+
+    @app.before_request
+    async def start_request():
+        """Start the request timer, verify the session token and apply rate limits"""
+        request.start_time = time.perf_counter()
+        begin_request(request.headers)
+
+        try:
+            g.session = session_from_request(request.headers, request.args, request.endpoint)
+        except SessionError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 401
+
+        if g.session is None and tokens_required():
+            return jsonify({
+                'status': 'error',
+                'message': 'Session token required'
+            }), 401
+
+        # Same limits and shared state as the Flask app (utils/ratelimit.py)
+        limiter = get_rate_limiter()
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        if limiter is not None and rule is not None and rule not in EXEMPT_RULES:
+            identity = rate_limit_identity(g.session, request.remote_addr)
+            decision = await limiter.check_async(rule, identity)
+            if not decision.allowed:
+                rate_limited.inc(endpoint=rule, limit=decision.limit)
+                body, headers = too_many_requests(decision)
+                return jsonify(body), 429, headers
+            g.rate_limit_slots = decision.slots
+        return None
+
+    @app.teardown_request
+    async def release_rate_limit_slots(exception=None):
+        """Give back the concurrency slots of the finished request"""
+        slots = g.pop('rate_limit_slots', None)
+        limiter = get_rate_limiter()
+        if slots and limiter is not None:
+            await limiter.release_async(slots)
+
+    @app.after_request
+    async def finish_request(response):
+        """Record route latency and add the CORS headers flask-cors adds in WSGI mode"""
+        header = last_write_header()
+        if header:
+            response.headers[LAST_WRITE_HEADER] = header
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_duration.observe(
+            time.perf_counter() - request.start_time,
+            method=request.method, endpoint=endpoint, status=response.status_code
+        )
+
+        origin = request.headers.get('Origin')
+        if origin in CORS_ORIGINS:
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.headers['Access-Control-Expose-Headers'] = ', '.join(CORS_EXPOSE_HEADERS)
+            response.headers.add('Vary', 'Origin')
+        return response
+
+    return app
+
+
+class RouteDispatcher:
+    """
+    ASGI app that sends requests matching an async route to the Quart app
+    and everything else to the WSGI Flask app
+    """
+    def __init__(self, async_app, wsgi_app):
+        """
+        Initialize dispatcher
+        Args:
+            async_app: Quart application with the async routes
+            wsgi_app: Flask application
+        """
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self._async_adapter = async_app.url_map.bind('localhost')
+        self._wsgi_adapter = wsgi_app.url_map.bind('localhost')
+
+    def _is_async_route(self, scope):
+        """
+        Check whether an HTTP request matches one of the async routes
+        Args:
+            scope (dict): ASGI connection scope
+        Returns:
+            bool: True when the Quart app should serve the request
+        """
+        # CORS preflights are answered by flask-cors in the WSGI app
+        if scope['method'] == 'OPTIONS':
+            return False
+        try:
+            async_rule, _ = self._async_adapter.match(scope['path'], method=scope['method'], return_rule=True)
+        except HTTPException:
+            return False
+        # A more specific Flask-only route (e.g. /transactions/search next to
+        # /transactions/<transaction_id>) stays on the WSGI app
+        try:
+            wsgi_rule, _ = self._wsgi_adapter.match(scope['path'], method=scope['method'], return_rule=True)
+        except HTTPException:
+            return True
+        return wsgi_rule.rule == async_rule.rule
+
+    async def __call__(self, scope, receive, send):
+        """
+        ASGI entry point
+        Args:
+            scope (dict): ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        # Startup/shutdown events open and close the async clients
+        if scope['type'] == 'lifespan' or (scope['type'] == 'http' and self._is_async_route(scope)):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+# Create the application instance
+app = RouteDispatcher(create_async_app(), create_app())
@@ -0,0 +1,3 @@
+"""
+Async route package initialization (ASGI mode, see asgi.py)
+"""
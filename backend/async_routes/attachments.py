@@ -0,0 +1,98 @@
+"""
+Async attachment upload route for Menuda Finance API (ASGI mode)
+
+Same URL and payload as routes/attachments.py; the S3 upload runs off the
+event loop.
+"""
+import os
+import uuid
+from quart import Blueprint, g, request, jsonify
+from utils.s3 import S3Manager
+from utils.idempotency import idempotent_async
+
+# Create blueprint without url_prefix (will be set in asgi.py)
+async_attachments_bp = Blueprint('async_attachments', __name__)
+
+@async_attachments_bp.route('/attachments/upload', methods=['POST'])
+@idempotent_async
+async def upload_attachment():
+    """
+    Handle file upload and store in Amazon S3
+    Returns:
+        JSON: Data with URL and attachment type
+    """
+    files = await request.files
+    form = await request.form
+
+    # Check if file is in request
+    if 'file' not in files:
+        return jsonify({
+            'status': 'error',
+            'message': 'No file provided'
+        }), 400
+
+    # Get file from request
+    file = files['file']
+
+    # Check if the file is empty
+    if file.filename == '':
+        return jsonify({
+            'status': 'error',
+            'message': 'No file selected'
+        }), 400
+
+    # Get user ID
+    user_id = g.session['uid'] if g.session else form.get('user_id')
+    if not user_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'User ID is required'
+        }), 400
+
+    temp_path = None
+    try:
+        # Create S3 manager
+        s3_manager = S3Manager()
+
+        # Get file extension
+        file_ext = os.path.splitext(file.filename)[1].lower()
+
+        # Save file temporarily
+        temp_path = os.path.join('/tmp', f"{uuid.uuid4().hex}{file_ext}")
+        await file.save(temp_path)
+
+        # Upload to S3
+        file_url = await s3_manager.upload_file_async(
+            temp_path,
+            user_id,
+            content_type=file.content_type
+        )
+
+        # Determine attachment type
+        attachment_type = 'file'
+        if file.content_type.startswith('image/'):
+            attachment_type = 'image'
+        elif file.content_type == 'application/pdf':
+            attachment_type = 'pdf'
+
+        return jsonify({
+            'status': 'success',
+            'message': 'File uploaded successfully',
+            'data': {
+                'url': file_url,
+                'type': attachment_type,
+                'filename': os.path.basename(file_url)
+            }
+        })
+
+    except Exception as e:
+        print(f"Error uploading file: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error uploading file: {str(e)}'
+        }), 500
+
+    finally:
+        # Remove temporary file
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
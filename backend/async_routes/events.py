@@ -0,0 +1,60 @@
+"""
+Async change event stream routes for Menuda Finance API (ASGI mode)
+
+Same URL and events as routes/events.py. An open stream only holds a
+coroutine here, not a worker thread, so there is no per-worker cap; streams
+still count against the per-user concurrency limit of /api/events.
+"""
+from quart import Blueprint, Response, g, request, jsonify
+from utils.changefeed import open_stream, stream_events_async
+from utils.ratelimit import get_rate_limiter
+
+
+async def _stream(subscription, slots):
+    """Stream events, then give back the rate limit slots the request took"""
+    try:
+        async for chunk in stream_events_async(subscription):
+            yield chunk
+    finally:
+        limiter = get_rate_limiter()
+        if slots and limiter is not None:
+            await limiter.release_async(slots)
+
+# Create blueprint without url_prefix (will be set in asgi.py)
+async_events_bp = Blueprint('async_events', __name__)
+
+
+@async_events_bp.route('/events', methods=['GET'])
+async def stream_changes():
+    """
+    Stream the user's change events as server-sent events
+    Query Parameters:
+        user_id: UUID of the user
+        access_token: Session token (EventSource cannot send the header)
+    Returns:
+        Response: text/event-stream of change events (see utils/changefeed.py)
+    """
+    user_id = g.session['uid'] if g.session else request.args.get('user_id')
+    if not user_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing required parameter: user_id'
+        }), 400
+
+    subscription = open_stream(user_id)
+    if subscription is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Too many open event streams'
+        }), 429
+
+    # Held until the stream ends, not released at teardown
+    slots = g.pop('rate_limit_slots', None) or ()
+    response = Response(_stream(subscription, slots), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Proxies must pass events through as they are written
+        'X-Accel-Buffering': 'no'
+    })
+    # Streams end after SSE_MAX_DURATION, not Quart's response timeout
+    response.timeout = None
+    return response
@@ -0,0 +1,145 @@
+"""
+Async invoice processing routes for Menuda Finance API (ASGI mode)
+
+Same URL and payload as routes/invoices.py, with the same extraction router.
+Remote engine calls go through a shared httpx.AsyncClient (local OCR runs in
+a worker thread), and extraction runs concurrently with the S3 upload, so a
+slow extraction only holds a coroutine, not a worker.
+"""
+import asyncio
+import os
+import uuid
+import httpx
+from quart import Blueprint, g, request, jsonify
+from routes.invoices import get_extraction_router
+from utils.s3 import S3Manager
+from utils.idempotency import idempotent_async
+from utils.changefeed import INVOICE_PROCESSED
+from utils.events import emit
+
+# Create blueprint without url_prefix (will be set in asgi.py)
+async_invoices_bp = Blueprint('async_invoices', __name__)
+
+# Shared HTTP client (connection pooling to the extraction API), opened in asgi.py
+_http_client = None
+
+
+async def init_http_client():
+    """
+    Create the shared async HTTP client
+    Returns:
+        httpx.AsyncClient: HTTP client
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0))
+    return _http_client
+
+
+async def close_http_client():
+    """
+    Close the shared async HTTP client
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+@async_invoices_bp.route('/invoices/process', methods=['POST'])
+@idempotent_async
+async def process_invoice():
+    """
+    Extract an invoice image's details and store it in S3
+    Returns:
+        JSON: Extracted invoice data
+    """
+    files = await request.files
+    form = await request.form
+
+    # Check if file was uploaded
+    if 'invoice' not in files:
+        return jsonify({
+            'status': 'error',
+            'message': 'No invoice file provided'
+        }), 400
+
+    invoice_file = files['invoice']
+
+    # Check if the file is empty
+    if invoice_file.filename == '':
+        return jsonify({
+            'status': 'error',
+            'message': 'No invoice file selected'
+        }), 400
+
+    # Get user ID
+    user_id = g.session['uid'] if g.session else form.get('user_id')
+    if not user_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'User ID is required'
+        }), 400
+
+    temp_filepath = None
+    try:
+        # Save the file temporarily with a unique filename
+        file_ext = invoice_file.filename.rsplit('.', 1)[1].lower() if '.' in invoice_file.filename else 'jpg'
+        temp_filename = f"invoice_{uuid.uuid4().hex}.{file_ext}"
+        temp_filepath = os.path.join('/tmp', temp_filename)
+        await invoice_file.save(temp_filepath)
+
+        # Extraction and upload are independent, so run them concurrently
+        s3_manager = S3Manager()
+        extracted_data, file_url = await asyncio.gather(
+            extract_invoice_async(temp_filepath),
+            s3_manager.upload_file_async(temp_filepath, user_id, content_type=invoice_file.content_type)
+        )
+
+        # Add the S3 URL to the extracted data
+        extracted_data['attachment_url'] = file_url
+        extracted_data['attachment_type'] = 'image' if file_ext.lower() in ['jpg', 'jpeg', 'png', 'gif'] else 'file'
+
+        # Let the user's other devices know a receipt is ready to be saved
+        # (brokers only queue the event, so this does not block the loop)
+        emit(INVOICE_PROCESSED, {'user_id': user_id, 'attachment_url': file_url})
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Invoice processed successfully',
+            'data': extracted_data
+        })
+
+    except Exception as e:
+        print(f"Error processing invoice: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error processing invoice: {str(e)}'
+        }), 500
+
+    finally:
+        # Clean up the temporary file
+        if temp_filepath and os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+
+
+async def extract_invoice_async(image_path):
+    """
+    Extract the invoice details from an image with the extraction router
+    Args:
+        image_path: Path to the image file
+    Returns:
+        dict: Extracted invoice data, with the engine that produced it and
+        its confidence
+    """
+    try:
+        # Read image file
+        with open(image_path, 'rb') as image_file:
+            image_data = image_file.read()
+
+        client = await init_http_client()
+        return await get_extraction_router().extract_async(image_data, http_client=client)
+
+    except Exception as e:
+        print(f"Error extracting invoice: {e}")
+        raise
@@ -0,0 +1,125 @@
+"""
+Async transaction read routes for Menuda Finance API (ASGI mode)
+
+Same URLs, payloads and statements (utils/queries.py) as the GET handlers in
+routes/transactions.py, backed by the aiomysql pool so slow queries do not
+pin a worker.
+"""
+from datetime import datetime
+from quart import Blueprint, current_app, g, request, jsonify
+from utils.async_db import fetch_all, fetch_one
+from utils.db import last_write
+from utils.queries import USER_TRANSACTION, to_json, user_transactions
+from utils.singleflight import AsyncSingleFlight
+
+# Create blueprint without url_prefix (will be set in asgi.py)
+async_transactions_bp = Blueprint('async_transactions', __name__)
+
+# Identical concurrent list requests share one query and one payload
+_list_flights = AsyncSingleFlight('transactions')
+
+@async_transactions_bp.route('/transactions', methods=['GET'])
+async def get_transactions():
+    """
+    Get user transactions
+    Query Parameters:
+        user_id: UUID of the user
+        from_date: Earliest transaction date, YYYY-MM-DD (optional)
+        to_date: Latest transaction date, YYYY-MM-DD (optional)
+        archived: 'true' to list archived transactions instead (optional)
+    Returns:
+        JSON: Array of transactions with their details
+    """
+    try:
+        # Get query parameters
+        user_id = g.session['uid'] if g.session else request.args.get('user_id')
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+
+        # A date range only reads the partitions of the years it covers
+        params = [user_id]
+        for name in ('from_date', 'to_date'):
+            value = request.args.get(name)
+            if value:
+                try:
+                    params.append(datetime.strptime(value, '%Y-%m-%d').date())
+                except ValueError:
+                    return jsonify({
+                        'status': 'error',
+                        'message': f'{name} must be formatted as YYYY-MM-DD'
+                    }), 400
+
+        # Get transactions with category and vendor details
+        query = user_transactions(
+            archived=request.args.get('archived') == 'true',
+            from_date=bool(request.args.get('from_date')),
+            to_date=bool(request.args.get('to_date'))
+        )
+
+        async def load():
+            # Format dates for JSON serialization
+            transactions = [to_json(transaction) for transaction in await fetch_all(query, tuple(params))]
+
+            return await jsonify({
+                'status': 'success',
+                'data': transactions,
+                'count': len(transactions)
+            }).get_data()
+
+        key = (request.endpoint, user_id, tuple(sorted(request.args.items(multi=True))))
+        body, _ = await _list_flights.do(key, load, not_before=last_write(user_id))
+        return current_app.response_class(body, content_type='application/json')
+
+    except Exception as e:
+        print(f"Error in get_transactions: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
+@async_transactions_bp.route('/transactions/<transaction_id>', methods=['GET'])
+async def get_transaction(transaction_id):
+    """
+    Get a single transaction by ID
+    Query Parameters:
+        user_id: UUID of the user (for security verification)
+    Returns:
+        JSON: Transaction details
+    """
+    try:
+        # Get query parameters
+        user_id = g.session['uid'] if g.session else request.args.get('user_id')
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+
+        # Get transaction with category and vendor details
+        transaction = await fetch_one(USER_TRANSACTION, (transaction_id, user_id))
+
+        if not transaction:
+            return jsonify({
+                'status': 'error',
+                'message': 'Transaction not found or not owned by this user'
+            }), 404
+
+        # Format dates for JSON serialization
+        to_json(transaction)
+
+        return jsonify({
+            'status': 'success',
+            'data': transaction
+        })
+
+    except Exception as e:
+        print(f"Error in get_transaction: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Server error occurred: {str(e)}'
+        }), 500
@@ -0,0 +1,6 @@
+"""
+Benchmark suite for Menuda Finance API
+
+Run from the backend directory:
+    python -m benchmarks.run --help
+"""
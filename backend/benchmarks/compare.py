@@ -0,0 +1,104 @@
+"""
+Compare two benchmark result files
+
+Usage (from the backend directory):
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+
+Exits with status 1 when any scenario's p99 latency grows, or the concurrent
+throughput drops, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path, 'r', encoding='utf-8') as results_file:
+        return json.load(results_file)
+
+
+def _change(old, new):
+    """
+    Relative change between two values
+    Returns:
+        float: (new - old) / old, or None when not comparable
+    """
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def _format_change(change):
+    return '    n/a' if change is None else f'{change * 100:+6.1f}%'
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Print a comparison table
+    Args:
+        baseline (dict): Baseline results
+        candidate (dict): Candidate results
+        threshold (float): Allowed relative regression
+    Returns:
+        list: Descriptions of regressions beyond the threshold
+    """
+    regressions = []
+    print(f"baseline {baseline['meta']['commit']}  ->  candidate {candidate['meta']['commit']}")
+    print(f"{'scenario':<28}{'p50 ms':>20}{'p99 ms':>20}")
+
+    rows = [('serial', name) for name in baseline.get('serial', {})]
+    rows += [('concurrent', name) for name in baseline.get('concurrent', {}).get('scenarios', {})]
+    for phase, name in rows:
+        if phase == 'serial':
+            old = baseline['serial'].get(name)
+            new = candidate.get('serial', {}).get(name)
+        else:
+            old = baseline['concurrent']['scenarios'].get(name)
+            new = candidate.get('concurrent', {}).get('scenarios', {}).get(name)
+        if not old or not new:
+            continue
+
+        p50 = _change(old['p50_ms'], new['p50_ms'])
+        p99 = _change(old['p99_ms'], new['p99_ms'])
+        print(f"{phase + '/' + name:<28}{new['p50_ms']:>12} {_format_change(p50)}"
+              f"{new['p99_ms']:>12} {_format_change(p99)}")
+        if p99 is not None and p99 > threshold:
+            regressions.append(f'{phase}/{name} p99 {_format_change(p99).strip()}')
+
+    old_rps = baseline.get('concurrent', {}).get('overall', {}).get('throughput_rps')
+    new_rps = candidate.get('concurrent', {}).get('overall', {}).get('throughput_rps')
+    rps = _change(old_rps, new_rps)
+    print(f"{'concurrent throughput':<28}{str(new_rps) + ' req/s':>20} {_format_change(rps)}")
+    if rps is not None and -rps > threshold:
+        regressions.append(f'concurrent throughput {_format_change(rps).strip()}')
+
+    old_rss = baseline.get('memory', {}).get('max_rss_mb')
+    new_rss = candidate.get('memory', {}).get('max_rss_mb')
+    print(f"{'max rss':<28}{str(new_rss) + ' MB':>20} {_format_change(_change(old_rss, new_rss))}")
+    return regressions
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Command line arguments (defaults to sys.argv)
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative regression (default 0.10)')
+    args = parser.parse_args(argv)
+
+    regressions = compare(_load(args.baseline), _load(args.candidate), args.threshold)
+    if regressions:
+        print('Regressions: ' + '; '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
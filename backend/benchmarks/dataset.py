@@ -0,0 +1,169 @@
+"""
+Seeded synthetic dataset for Menuda Finance benchmarks
+
+The same seed and sizes always produce the same users, categories, vendors
+and transactions, so results from different commits are comparable.
+"""
+import datetime
+import random
+import uuid
+
+CATEGORY_NAMES = [
+    'Comida', 'Transporte', 'Vivienda', 'Servicios', 'Salud', 'Entretenimiento',
+    'Educacion', 'Ropa', 'Viajes', 'Mascotas', 'Regalos', 'Suscripciones',
+    'Mercado', 'Restaurantes', 'Impuestos', 'Ahorro',
+]
+
+VENDOR_NAMES = [
+    'Uber', 'Rappi', 'Exito', 'Carulla', 'Netflix', 'Spotify', 'Claro', 'Movistar',
+    'Juan Valdez', 'Crepes & Waffles', 'Farmatodo', 'Cruz Verde', 'Avianca',
+    'Cine Colombia', 'Falabella', 'Zara', 'Amazon', 'Apple', 'Terpel', 'Homecenter',
+    'D1', 'Ara', 'Olimpica', 'Didi', 'Cabify', 'Bancolombia', 'EPM', 'Codensa',
+]
+
+TITLE_WORDS = [
+    'Almuerzo', 'Cena', 'Viaje', 'Mercado', 'Pago', 'Suscripcion', 'Compra',
+    'Factura', 'Recarga', 'Cafe', 'Domicilio', 'Gasolina', 'Medicamentos',
+]
+
+
+class Dataset:
+    """
+    Identifiers of the seeded rows, used by the load generator to build requests
+    """
+    def __init__(self):
+        self.users = []
+        self.categories = {}
+        self.vendors = {}
+        self.transactions = {}
+
+    def to_dict(self):
+        """
+        Summarize the dataset for the results file
+        Returns:
+            dict: Row counts
+        """
+        return {
+            'users': len(self.users),
+            'categories': sum(len(rows) for rows in self.categories.values()),
+            'vendors': sum(len(rows) for rows in self.vendors.values()),
+            'transactions': sum(len(rows) for rows in self.transactions.values()),
+        }
+
+
+def _uuid(rng):
+    """Deterministic UUID4 string from the seeded generator"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def seed_dataset(connection, users=10, categories_per_user=8, vendors_per_user=20,
+                 transactions_per_user=500, seed=42, batch_size=1000):
+    """
+    Insert a synthetic dataset
+    Args:
+        connection: Database connection (MySQL or a stand-in)
+        users (int): Number of users
+        categories_per_user (int): Categories per user
+        vendors_per_user (int): Vendors per user
+        transactions_per_user (int): Transactions per user
+        seed (int): Random seed
+        batch_size (int): Rows per executemany batch
+    Returns:
+        Dataset: Identifiers of the inserted rows
+    """
+    rng = random.Random(seed)
+    dataset = Dataset()
+    now = datetime.datetime(2025, 1, 1, 12, 0, 0)
+    start_date = datetime.date(2021, 1, 1)
+    span_days = (now.date() - start_date).days
+
+    user_rows = []
+    category_rows = []
+    vendor_rows = []
+    transaction_rows = []
+
+    for user_index in range(users):
+        user_id = _uuid(rng)
+        email = f'user{user_index}@bench.menuda.local'
+        dataset.users.append({'user_id': user_id, 'email': email, 'name': f'Usuario {user_index}'})
+        user_rows.append((user_id, f'Usuario {user_index}', email, '', now, now))
+
+        category_ids = []
+        for index in range(categories_per_user):
+            category_id = _uuid(rng)
+            category_ids.append(category_id)
+            name = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+            if index >= len(CATEGORY_NAMES):
+                name = f'{name} {index}'
+            category_rows.append((category_id, user_id, name, now, now))
+        dataset.categories[user_id] = category_ids
+
+        vendor_ids = []
+        for index in range(vendors_per_user):
+            vendor_id = _uuid(rng)
+            vendor_ids.append(vendor_id)
+            name = VENDOR_NAMES[index % len(VENDOR_NAMES)]
+            if index >= len(VENDOR_NAMES):
+                name = f'{name} {index}'
+            vendor_rows.append((vendor_id, user_id, name, rng.choice(category_ids), now, now))
+        dataset.vendors[user_id] = vendor_ids
+
+        transaction_ids = []
+        for _ in range(transactions_per_user):
+            transaction_id = _uuid(rng)
+            transaction_ids.append(transaction_id)
+            transaction_date = start_date + datetime.timedelta(days=rng.randrange(span_days))
+            transaction_rows.append((
+                transaction_id,
+                user_id,
+                f'{rng.choice(TITLE_WORDS)} {rng.choice(VENDOR_NAMES)}',
+                round(rng.lognormvariate(10, 1), 2),
+                transaction_date,
+                rng.choice(category_ids),
+                rng.choice(vendor_ids),
+                now,
+                now,
+            ))
+        dataset.transactions[user_id] = transaction_ids
+
+    cursor = connection.cursor()
+    try:
+        _insert_batches(cursor, """
+            INSERT INTO users (user_id, name, email, picture, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, user_rows, batch_size)
+        _insert_batches(cursor, """
+            INSERT INTO categories (category_id, user_id, category_name, created_at, updated_at, is_active)
+            VALUES (%s, %s, %s, %s, %s, TRUE)
+        """, category_rows, batch_size)
+        _insert_batches(cursor, """
+            INSERT INTO vendors (vendor_id, user_id, vendor_name, category_id, created_at, updated_at, is_active)
+            VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+        """, vendor_rows, batch_size)
+        _insert_batches(cursor, """
+            INSERT INTO transaction_ids (transaction_id, user_id, created_at) VALUES (%s, %s, %s)
+        """, [(row[0], row[1], row[7]) for row in transaction_rows], batch_size)
+        _insert_batches(cursor, """
+            INSERT INTO transactions (
+                transaction_id, user_id, title, amount, transaction_date,
+                category_id, vendor_id, created_at, updated_at, is_deleted
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE)
+        """, transaction_rows, batch_size)
+        connection.commit()
+    finally:
+        cursor.close()
+
+    return dataset
+
+
+def _insert_batches(cursor, statement, rows, batch_size):
+    """
+    Insert rows in batches with executemany
+    Args:
+        cursor: Database cursor
+        statement (str): INSERT statement
+        rows (list): Parameter tuples
+        batch_size (int): Rows per batch
+    """
+    for offset in range(0, len(rows), batch_size):
+        cursor.executemany(statement, rows[offset:offset + batch_size])
@@ -0,0 +1,223 @@
+"""
+Invoice extraction engine benchmark for Menuda Finance
+
+Runs each extraction engine over the receipt fixtures in
+benchmarks/fixtures/receipts.json and reports latency percentiles and
+per-field accuracy (amount, date, vendor, category), plus how many receipts
+the router would escalate past each engine at the configured confidence
+threshold.
+
+Engines:
+    fake    Always runs (router and harness overhead baseline)
+    local   Tesseract on the fixture text rendered as an image; without
+            Pillow/pytesseract/tesseract, parse_receipt_text on the fixture
+            text instead (reported as local-text)
+    openai  Rendered images sent to the remote model; only when Pillow and
+            OPENAI_API_KEY are available (each receipt is a billed call)
+
+Usage (from the backend directory):
+    python -m benchmarks.extraction [--engines fake,local,openai] [--repeat 20]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks.run import RESULTS_DIR, git_commit, summarize
+from routes import invoices
+from routes.invoices import (
+    EXTRACTION_MIN_CONFIDENCE, ENGINES, LocalOCREngine, parse_receipt_text
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'receipts.json')
+
+ACCURACY_FIELDS = ('amount', 'date', 'vendor', 'category')
+
+
+def load_fixtures(path=FIXTURES):
+    with open(path, 'r', encoding='utf-8') as fixtures_file:
+        return json.load(fixtures_file)
+
+
+def render_receipt(text):
+    """
+    Draw receipt text as a PNG, one fixture line per image line
+    Args:
+        text (str): Receipt text
+    Returns:
+        bytes: PNG image, or None without Pillow
+    """
+    if invoices.Image is None:
+        return None
+    from PIL import ImageDraw, ImageFont
+
+    lines = text.splitlines()
+    font = ImageFont.load_default()
+    line_height = 28
+    image = invoices.Image.new('L', (900, line_height * (len(lines) + 2)), color=255)
+    draw = ImageDraw.Draw(image)
+    for number, line in enumerate(lines, start=1):
+        draw.text((30, number * line_height), line, fill=0, font=font)
+    # Tesseract reads small bitmap fonts better upscaled
+    image = image.resize((image.width * 2, image.height * 2))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def field_matches(field, expected, actual):
+    """
+    Compare one extracted field with the fixture's expected value
+    Returns:
+        bool: True when the field counts as correct
+    """
+    if actual in (None, ''):
+        return False
+    if field == 'amount':
+        try:
+            return abs(float(actual) - float(expected)) < 0.01
+        except (TypeError, ValueError):
+            return False
+    if field == 'vendor':
+        # OCR casing and legal suffixes (S.A., S.A.S.) vary
+        return str(expected).lower() in str(actual).lower()
+    return str(actual).strip().lower() == str(expected).strip().lower()
+
+
+def run_engine(label, extract, fixtures, repeat, min_confidence):
+    """
+    Time an engine over every fixture and score its results
+    Args:
+        label (str): Name reported for the engine
+        extract (callable): Takes a fixture, returns (fields, confidence)
+        fixtures (list): Receipt fixtures
+        repeat (int): Timed runs per fixture (results are scored on the first)
+        min_confidence (float): Router acceptance threshold
+    Returns:
+        dict: Latency statistics, accuracy per field and escalations
+    """
+    latencies = []
+    errors = 0
+    correct = dict.fromkeys(ACCURACY_FIELDS, 0)
+    escalated = 0
+    started = time.perf_counter()
+
+    for fixture in fixtures:
+        for attempt in range(repeat):
+            call_start = time.perf_counter()
+            try:
+                fields, confidence = extract(fixture)
+            except Exception as e:
+                errors += 1
+                if attempt == 0:
+                    print(f"  {label}: {fixture['name']} failed: {e}")
+                    escalated += 1
+                break
+            latencies.append(time.perf_counter() - call_start)
+            if attempt == 0:
+                for field in ACCURACY_FIELDS:
+                    if field_matches(field, fixture['expected'][field], fields.get(field)):
+                        correct[field] += 1
+                if confidence < min_confidence:
+                    escalated += 1
+
+    stats = summarize(latencies, errors, time.perf_counter() - started)
+    stats['accuracy'] = {field: round(count / len(fixtures), 3) for field, count in correct.items()}
+    stats['escalation_rate'] = round(escalated / len(fixtures), 3)
+    return stats
+
+
+def engine_runners(names, images):
+    """
+    Build the extract callables for the requested engines that can run here
+    Args:
+        names (list): Engine names
+        images (dict): Rendered PNG bytes by fixture name (empty without Pillow)
+    Returns:
+        list: (label, callable) pairs
+    """
+    runners = []
+    for name in names:
+        if name == 'fake':
+            engine = ENGINES['fake']()
+            runners.append(('fake', lambda fixture, engine=engine: engine.extract(fixture['text'].encode('utf-8'))))
+        elif name == 'local':
+            engine = LocalOCREngine()
+            if images and engine.available():
+                runners.append(('local', lambda fixture, engine=engine: engine.extract(images[fixture['name']])))
+            else:
+                print("Tesseract not available: benchmarking the local parser on the fixture text")
+                runners.append(('local-text', lambda fixture: parse_receipt_text(fixture['text'])))
+        elif name == 'openai':
+            engine = ENGINES['openai']()
+            if images and engine.available():
+                runners.append(('openai', lambda fixture, engine=engine: engine.extract(images[fixture['name']])))
+            else:
+                print("Skipping openai: needs Pillow and OPENAI_API_KEY")
+        else:
+            raise ValueError(f"Unknown engine: {name}")
+    return runners
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status
+    """
+    parser = argparse.ArgumentParser(description='Invoice extraction engine benchmark')
+    parser.add_argument('--engines', default='fake,local,openai',
+                        help='Comma-separated engines (fake, local, openai)')
+    parser.add_argument('--fixtures', default=FIXTURES, help='Receipt fixtures JSON file')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Timed runs per receipt for local engines (remote engines run once)')
+    parser.add_argument('--min-confidence', type=float, default=EXTRACTION_MIN_CONFIDENCE,
+                        help='Router acceptance threshold used for the escalation rate')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/extraction-<commit>.json)')
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    names = [name.strip() for name in args.engines.split(',') if name.strip()]
+    images = {}
+    if invoices.Image is not None:
+        images = {fixture['name']: render_receipt(fixture['text']) for fixture in fixtures}
+
+    print(f"{len(fixtures)} receipts")
+    engines = {}
+    for label, extract in engine_runners(names, images):
+        repeat = 1 if label == 'openai' else args.repeat
+        engines[label] = run_engine(label, extract, fixtures, repeat, args.min_confidence)
+        stats = engines[label]
+        accuracy = ' '.join(f"{field}={value:.0%}" for field, value in stats['accuracy'].items())
+        print(f"  {label:<11} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms errors={stats['errors']} "
+              f"escalated={stats['escalation_rate']:.0%} {accuracy}")
+
+    commit = git_commit()
+    results = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'fixtures': len(fixtures),
+            'min_confidence': args.min_confidence,
+        },
+        'engines': engines,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f'extraction-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,399 @@
+"""
+Benchmark runner for Menuda Finance API
+
+Seeds a database (an embedded SQLite stand-in by default, or the MySQL server
+configured through DB_* environment variables), drives the Flask app through
+its test client, first one scenario at a time and then with a concurrent mixed
+load, and writes throughput / latency percentiles / memory to a JSON file.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --users 10 --transactions 1000 --concurrency 8
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.dataset import seed_dataset
+from benchmarks.standins import LocalS3Client, SQLiteConnection, SQLiteReplicaConnection, create_sqlite_database
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+# Scenarios: each takes (client, dataset, rng) and returns a response
+
+def scenario_get_transactions(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    return client.get(f"/api/transactions?user_id={user['user_id']}")
+
+
+def scenario_get_transaction(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    transaction_id = rng.choice(dataset.transactions[user['user_id']])
+    return client.get(f"/api/transactions/{transaction_id}?user_id={user['user_id']}")
+
+
+def scenario_create_transaction(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    user_id = user['user_id']
+    return client.post('/api/transactions', json={
+        'user_id': user_id,
+        'title': 'Benchmark transaction',
+        'amount': round(rng.uniform(1000, 200000), 2),
+        'transaction_date': (datetime.date(2025, 1, 1) - datetime.timedelta(days=rng.randrange(365))).isoformat(),
+        'category_id': rng.choice(dataset.categories[user_id]),
+        'vendor_id': rng.choice(dataset.vendors[user_id]),
+    })
+
+
+def scenario_search_transactions(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    # Mix of full words, prefixes and one-letter typos
+    query = rng.choice(['uber', 'rapp', 'almuerzo', 'netflx', 'mercado exito', 'cafe juan'])
+    return client.get(f"/api/transactions/search?user_id={user['user_id']}&q={query}")
+
+
+def scenario_forecast_transactions(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    # A few reference days in the seeded range: mostly cache hits, some misses
+    on_date = datetime.date(2024, 12, 1) + datetime.timedelta(days=rng.randrange(14))
+    return client.get(f"/api/transactions/forecast?user_id={user['user_id']}&date={on_date.isoformat()}")
+
+
+def scenario_get_vendors(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    return client.get(f"/api/vendors?user_id={user['user_id']}")
+
+
+def scenario_get_categories(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    return client.get(f"/api/categories?user_id={user['user_id']}")
+
+
+def scenario_check_user(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    return client.post('/api/users/check', json={
+        'email': user['email'],
+        'name': user['name'],
+        'picture': '',
+    })
+
+
+def scenario_upload_attachment(client, dataset, rng):
+    user = rng.choice(dataset.users)
+    payload = io.BytesIO(rng.randbytes(32 * 1024))
+    return client.post('/api/attachments/upload', data={
+        'user_id': user['user_id'],
+        'file': (payload, 'receipt.jpg', 'image/jpeg'),
+    }, content_type='multipart/form-data')
+
+
+SCENARIOS = {
+    'get_transactions': scenario_get_transactions,
+    'get_transaction': scenario_get_transaction,
+    'create_transaction': scenario_create_transaction,
+    'search_transactions': scenario_search_transactions,
+    'forecast_transactions': scenario_forecast_transactions,
+    'get_vendors': scenario_get_vendors,
+    'get_categories': scenario_get_categories,
+    'check_user': scenario_check_user,
+    'upload_attachment': scenario_upload_attachment,
+}
+
+# Relative weights for the concurrent mixed load (read heavy, like the app)
+MIX_WEIGHTS = {
+    'get_transactions': 20,
+    'get_transaction': 15,
+    'create_transaction': 10,
+    'search_transactions': 5,
+    'forecast_transactions': 5,
+    'get_vendors': 15,
+    'get_categories': 15,
+    'check_user': 10,
+    'upload_attachment': 5,
+}
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile
+    Args:
+        sorted_values (list): Values sorted ascending
+        fraction (float): Percentile as a fraction (0.99 for p99)
+    Returns:
+        float: Percentile value or None for an empty list
+    """
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Build the statistics for one scenario
+    Args:
+        latencies (list): Request latencies in seconds
+        errors (int): Number of failed requests
+        elapsed (float): Wall-clock time in seconds
+    Returns:
+        dict: Scenario statistics (latencies in milliseconds)
+    """
+    values = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed > 0 else None,
+        'mean_ms': to_ms(sum(values) / len(values)) if values else None,
+        'p50_ms': to_ms(percentile(values, 0.50)),
+        'p90_ms': to_ms(percentile(values, 0.90)),
+        'p99_ms': to_ms(percentile(values, 0.99)),
+        'max_ms': to_ms(values[-1]) if values else None,
+    }
+
+
+def run_serial(app, dataset, scenarios, iterations, warmup, seed):
+    """
+    Run each scenario on its own, one request at a time
+    Args:
+        app: Flask application
+        dataset (Dataset): Seeded dataset
+        scenarios (list): Scenario names
+        iterations (int): Measured requests per scenario
+        warmup (int): Unmeasured requests per scenario
+        seed (int): Random seed
+    Returns:
+        dict: Statistics by scenario
+    """
+    client = app.test_client()
+    results = {}
+    for name in scenarios:
+        rng = random.Random(f'{seed}-serial-{name}')
+        scenario = SCENARIOS[name]
+        for _ in range(warmup):
+            scenario(client, dataset, rng)
+
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            request_start = time.perf_counter()
+            response = scenario(client, dataset, rng)
+            latencies.append(time.perf_counter() - request_start)
+            if response.status_code >= 400:
+                errors += 1
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        print(f"  {name:<20} p50={results[name]['p50_ms']}ms p99={results[name]['p99_ms']}ms errors={errors}")
+    return results
+
+
+def run_concurrent(app, dataset, scenarios, total_requests, concurrency, seed):
+    """
+    Run a weighted mix of scenarios from several threads
+    Args:
+        app: Flask application
+        dataset (Dataset): Seeded dataset
+        scenarios (list): Scenario names
+        total_requests (int): Requests across all threads
+        concurrency (int): Number of client threads
+        seed (int): Random seed
+    Returns:
+        dict: Overall and per-scenario statistics
+    """
+    names = [name for name in scenarios if MIX_WEIGHTS.get(name)]
+    weights = [MIX_WEIGHTS[name] for name in names]
+    lock = threading.Lock()
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+
+    def worker(worker_index, count):
+        client = app.test_client()
+        rng = random.Random(f'{seed}-concurrent-{worker_index}')
+        for _ in range(count):
+            name = rng.choices(names, weights)[0]
+            request_start = time.perf_counter()
+            response = SCENARIOS[name](client, dataset, rng)
+            elapsed = time.perf_counter() - request_start
+            with lock:
+                latencies[name].append(elapsed)
+                if response.status_code >= 400:
+                    errors[name] += 1
+
+    per_worker = [total_requests // concurrency] * concurrency
+    for index in range(total_requests % concurrency):
+        per_worker[index] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker, index, count) for index, count in enumerate(per_worker)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    overall = summarize(all_latencies, sum(errors.values()), elapsed)
+    print(f"  {'mixed':<20} {overall['throughput_rps']} req/s p50={overall['p50_ms']}ms p99={overall['p99_ms']}ms")
+    return {
+        'concurrency': concurrency,
+        'overall': overall,
+        'scenarios': {name: summarize(latencies[name], errors[name], elapsed) for name in names},
+    }
+
+
+def git_commit():
+    """
+    Get the current git commit
+    Returns:
+        str: Short commit hash or 'unknown'
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def setup_backends(args, workdir):
+    """
+    Point the app at the benchmark database and the local S3 stand-in
+    Args:
+        args: Parsed command line arguments
+        workdir (str): Scratch directory
+    Returns:
+        Connection: Connection used for seeding
+    """
+    from utils.db import get_db_connection, set_connection_factory
+    from utils.s3 import set_client_factory
+
+    s3_root = os.path.join(workdir, 's3')
+    os.environ.setdefault('S3_BUCKET_NAME', 'menuda-bench')
+    # The load generator reuses a few users far faster than any client would
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+    set_client_factory(lambda: LocalS3Client(s3_root))
+
+    if args.backend == 'sqlite':
+        db_path = os.path.join(workdir, 'bench.sqlite3')
+        create_sqlite_database(db_path)
+        # Replicas read the same file: exercises routing, not replication
+        set_connection_factory(
+            lambda: SQLiteConnection(db_path),
+            [lambda: SQLiteReplicaConnection(db_path)] * args.replicas
+        )
+        return SQLiteConnection(db_path)
+
+    # MySQL: uses DB_HOST/DB_USER/DB_PASSWORD/DB_NAME (and DB_REPLICA_HOSTS)
+    # and a schema migrated with python -m scripts.migrate up
+    return get_db_connection()
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Command line arguments (defaults to sys.argv)
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(description='Menuda Finance API benchmarks')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='Database to seed and query (mysql uses DB_* variables; use a dedicated database)')
+    parser.add_argument('--replicas', type=int, default=0,
+                        help='SQLite read replica stand-ins (mysql reads DB_REPLICA_HOSTS)')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--categories', type=int, default=8, help='Categories per user')
+    parser.add_argument('--vendors', type=int, default=20, help='Vendors per user')
+    parser.add_argument('--transactions', type=int, default=500, help='Transactions per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma-separated scenario names')
+    parser.add_argument('--iterations', type=int, default=100, help='Serial requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured serial requests per scenario')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests in the concurrent phase')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads in the concurrent phase')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Track Python heap peak with tracemalloc (slows the run)')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/<commit>.json)')
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory(prefix='menuda-bench-') as workdir:
+        seed_connection = setup_backends(args, workdir)
+        print(f"Seeding {args.backend} dataset...")
+        seed_start = time.perf_counter()
+        dataset = seed_dataset(
+            seed_connection,
+            users=args.users,
+            categories_per_user=args.categories,
+            vendors_per_user=args.vendors,
+            transactions_per_user=args.transactions,
+            seed=args.seed,
+        )
+        seed_connection.close()
+        seed_seconds = time.perf_counter() - seed_start
+
+        from main import create_app
+        app = create_app()
+
+        print("Serial phase:")
+        serial = run_serial(app, dataset, scenarios, args.iterations, args.warmup, args.seed)
+        print("Concurrent phase:")
+        concurrent = run_concurrent(app, dataset, scenarios, args.requests, args.concurrency, args.seed)
+
+    memory = {
+        # ru_maxrss is reported in kilobytes on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if args.trace_memory:
+        memory['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    commit = git_commit()
+    results = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'replicas': args.replicas,
+            'seed': args.seed,
+            'dataset': dataset.to_dict(),
+            'seed_seconds': round(seed_seconds, 3),
+        },
+        'serial': serial,
+        'concurrent': concurrent,
+        'memory': memory,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
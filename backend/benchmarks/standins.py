@@ -0,0 +1,252 @@
+"""
+Local stand-ins for MySQL and S3 used by the benchmark suite
+
+SQLiteConnection mimics the subset of mysql-connector the routes use
+(cursor(dictionary=True), %s placeholders, NOW(), commit/rollback), so the
+Flask app runs unchanged against an embedded database file;
+SQLiteReplicaConnection plays a read replica with a configurable lag. LocalS3Client
+writes uploads to a local directory instead of a bucket.
+"""
+import datetime
+import decimal
+import os
+import re
+import shutil
+import sqlite3
+from utils.migrations import migrate
+
+# MySQL-only syntax rewritten for SQLite
+_TRANSLATIONS = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), "datetime('now', 'localtime')"),
+    (re.compile(r'\bON DUPLICATE KEY UPDATE\b', re.IGNORECASE), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'\bVALUES\((\w+)\)', re.IGNORECASE), r'excluded.\1'),
+    (re.compile(r'\bGREATEST\(', re.IGNORECASE), 'MAX('),
+    # SQLite serializes writers, so row locks are implicit
+    (re.compile(r'\s+FOR UPDATE\b', re.IGNORECASE), ''),
+]
+
+
+def _convert_datetime(value):
+    """Parse DATETIME/TIMESTAMP columns into datetime objects"""
+    return datetime.datetime.fromisoformat(value.decode('utf-8'))
+
+
+def _convert_date(value):
+    """Parse DATE columns into date objects"""
+    return datetime.date.fromisoformat(value.decode('utf-8'))
+
+
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(decimal.Decimal, str)
+
+
+def translate(statement):
+    """
+    Rewrite a MySQL statement into SQLite syntax
+    Args:
+        statement (str): MySQL statement
+    Returns:
+        str: Equivalent SQLite statement
+    """
+    for pattern, replacement in _TRANSLATIONS:
+        statement = pattern.sub(replacement, statement)
+    return statement
+
+
+class SQLiteCursor:
+    """
+    Cursor with the mysql-connector interface used by the routes
+    """
+    def __init__(self, connection, dictionary=False):
+        """
+        Initialize cursor
+        Args:
+            connection: sqlite3 connection
+            dictionary (bool): Return rows as dicts like MySQLCursorDict
+        """
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def column_names(self):
+        if not self._cursor.description:
+            return ()
+        return tuple(column[0] for column in self._cursor.description)
+
+    def execute(self, operation, params=None):
+        """Execute a MySQL-style statement"""
+        self._cursor.execute(translate(operation), tuple(params or ()))
+
+    def executemany(self, operation, seq_params):
+        """Execute a MySQL-style statement for every parameter set"""
+        self._cursor.executemany(translate(operation), [tuple(params) for params in seq_params])
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._row(row) for row in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    Connection with the mysql-connector interface used by the routes
+    """
+    def __init__(self, path):
+        """
+        Open a connection to a SQLite database file
+        Args:
+            path (str): Database file path
+        """
+        self._connection = sqlite3.connect(
+            path,
+            timeout=30,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        self._connected = True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._connection, dictionary=dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def is_connected(self):
+        return self._connected
+
+    def close(self):
+        if self._connected:
+            self._connected = False
+            self._connection.close()
+
+
+class SQLiteReplicaCursor(SQLiteCursor):
+    """
+    Cursor that also answers SHOW REPLICA STATUS with a fixed lag
+    """
+    def __init__(self, connection, dictionary=False, lag=0.0):
+        """
+        Initialize cursor
+        Args:
+            connection: sqlite3 connection
+            dictionary (bool): Return rows as dicts like MySQLCursorDict
+            lag (float): Seconds_Behind_Source to report (None: replication stopped)
+        """
+        super().__init__(connection, dictionary=dictionary)
+        self._lag = lag
+        self._status = None
+
+    def execute(self, operation, params=None):
+        """Execute a MySQL-style statement"""
+        if operation.strip().upper() in ('SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'):
+            self._status = [] if self._lag is None else [{'Seconds_Behind_Source': self._lag}]
+            return
+        self._status = None
+        super().execute(operation, params)
+
+    def fetchone(self):
+        if self._status is not None:
+            return self._status.pop(0) if self._status else None
+        return super().fetchone()
+
+    def fetchall(self):
+        if self._status is not None:
+            rows, self._status = self._status, []
+            return rows
+        return super().fetchall()
+
+
+class SQLiteReplicaConnection(SQLiteConnection):
+    """
+    Read replica stand-in: a connection (usually to the primary's file) that
+    reports a configurable replication lag
+    """
+    def __init__(self, path, lag=0.0):
+        """
+        Open a connection to a SQLite database file
+        Args:
+            path (str): Database file path
+            lag (float): Seconds_Behind_Source to report (None: replication stopped)
+        """
+        super().__init__(path)
+        self.lag = lag
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteReplicaCursor(self._connection, dictionary=dictionary, lag=self.lag)
+
+
+def create_sqlite_database(path):
+    """
+    Create an empty SQLite database with the application schema
+    Args:
+        path (str): Database file path (replaced if it exists)
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        # WAL lets readers proceed while a writer holds the lock
+        connection.execute('PRAGMA journal_mode=WAL')
+    finally:
+        connection.close()
+
+    # Same DDL as MySQL: the migration files are written to run on both,
+    # apart from the .mysql.sql ones
+    connection = SQLiteConnection(path)
+    try:
+        migrate(connection, dialect='sqlite')
+    finally:
+        connection.close()
+
+
+class LocalS3Client:
+    """
+    Stand-in for the boto3 S3 client that stores objects on local disk
+    """
+    def __init__(self, root):
+        """
+        Initialize client
+        Args:
+            root (str): Directory that plays the role of all buckets
+        """
+        self.root = root
+
+    def _target(self, bucket, key):
+        path = os.path.join(self.root, bucket or 'bucket', key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_file(self, file_path, bucket, key, ExtraArgs=None):
+        shutil.copyfile(file_path, self._target(bucket, key))
+
+    def upload_fileobj(self, file_obj, bucket, key, ExtraArgs=None):
+        with open(self._target(bucket, key), 'wb') as output:
+            shutil.copyfileobj(file_obj, output)
@@ -0,0 +1,187 @@
+"""
+Cold start benchmark for Menuda Finance API
+
+Starts fresh interpreters and measures, in each one:
+
+    import_ms         import main
+    create_app_ms     main.create_app() (imports the route modules)
+    first_request_ms  first GET /api/health through the test client
+    first_db_ms       first database-backed request (GET /api/categories on
+                      an empty SQLite stand-in)
+    first_s3_ms       first S3Manager() with the default factory (boto3 is
+                      imported on first use; no request is sent)
+
+and reports the median, minimum and maximum of each over the runs, plus the
+slowest imports from one run with -X importtime.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [--runs 10] [--output FILE]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import RESULTS_DIR, git_commit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in each fresh interpreter; prints the timings as JSON on its last line
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+client = app.test_client()
+response = client.get('/api/health')
+assert response.status_code == 200, response.status_code
+requested = time.perf_counter()
+
+from benchmarks.standins import SQLiteConnection, create_sqlite_database
+from utils.db import set_connection_factory
+db_path = os.path.join(sys.argv[1], 'startup.sqlite3')
+create_sqlite_database(db_path)
+set_connection_factory(lambda: SQLiteConnection(db_path))
+db_start = time.perf_counter()
+response = client.get('/api/categories?user_id=startup-user')
+assert response.status_code == 200, response.status_code
+db_done = time.perf_counter()
+
+from utils.s3 import S3Manager
+s3_start = time.perf_counter()
+S3Manager()
+s3_done = time.perf_counter()
+
+ms = lambda seconds: round(seconds * 1000, 3)
+print(json.dumps({
+    'import_ms': ms(imported - start),
+    'create_app_ms': ms(created - imported),
+    'first_request_ms': ms(requested - created),
+    'first_db_ms': ms(db_done - db_start),
+    'first_s3_ms': ms(s3_done - s3_start),
+}))
+"""
+
+METRICS = ('import_ms', 'create_app_ms', 'first_request_ms', 'first_db_ms', 'first_s3_ms')
+
+
+def _child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = BACKEND_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env.setdefault('AWS_REGION', 'us-east-1')
+    env.setdefault('RATE_LIMIT_ENABLED', 'false')
+    return env
+
+
+def run_once(workdir, importtime=False):
+    """
+    Measure one cold start
+    Args:
+        workdir (str): Scratch directory for the SQLite stand-in
+        importtime (bool): Also collect -X importtime output
+    Returns:
+        tuple: (timings dict, importtime lines or None)
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD, workdir]
+    completed = subprocess.run(
+        command, cwd=BACKEND_DIR, env=_child_env(), capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{completed.stderr[-2000:]}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    return timings, completed.stderr.splitlines() if importtime else None
+
+
+def slowest_imports(lines, top):
+    """
+    Slowest imports of the app, by cumulative time
+    Args:
+        lines (list): -X importtime output
+        top (int): Number of modules
+    Returns:
+        list: Dicts with module and cumulative_ms
+    """
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|', 2)
+        # Modules imported by the interpreter, main or create_app (one
+        # space of indentation per nesting level, after a leading space)
+        depth = (len(name) - len(name.lstrip(' ')) + 1) // 2
+        if depth <= 2 and name.strip() != 'main':
+            imports.append({'module': name.strip(), 'cumulative_ms': round(int(cumulative_us) / 1000, 1)})
+    return sorted(imports, key=lambda entry: -entry['cumulative_ms'])[:top]
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status
+    """
+    parser = argparse.ArgumentParser(description='Menuda Finance API cold start benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters started')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports reported')
+    parser.add_argument('--output', help='Results file (default benchmarks/results/startup-<commit>.json)')
+    args = parser.parse_args(argv)
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='menuda-startup-') as workdir:
+        # Warm the OS file cache and bytecode so runs compare interpreter work
+        run_once(workdir)
+        for _ in range(args.runs):
+            runs.append(run_once(workdir)[0])
+        _, importtime = run_once(workdir, importtime=True)
+
+    summary = {}
+    for metric in METRICS:
+        values = [run[metric] for run in runs]
+        summary[metric] = {
+            'median': round(statistics.median(values), 3),
+            'min': min(values),
+            'max': max(values),
+        }
+        print(f"  {metric:<17} median={summary[metric]['median']}ms "
+              f"min={summary[metric]['min']}ms max={summary[metric]['max']}ms")
+
+    imports = slowest_imports(importtime, args.top)
+    print("Slowest imports (cumulative):")
+    for entry in imports:
+        print(f"  {entry['module']:<28} {entry['cumulative_ms']}ms")
+
+    commit = git_commit()
+    results = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': args.runs,
+        },
+        'startup': summary,
+        'slowest_imports': imports,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f'startup-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
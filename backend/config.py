@@ -0,0 +1,18 @@
+"""
+Shared configuration for Menuda Finance API
+"""
+
+# Frontend origins allowed to call the API (WSGI app via flask-cors, ASGI app in asgi.py)
+CORS_ORIGINS = [
+    "http://127.0.0.1:8080",
+    "http://localhost:8080",
+    "http://192.168.1.10:8080",
+    "http://localhost:5500",
+]
+
+CORS_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "Idempotency-Key", "X-Last-Write"]
+
+# Response headers the frontend reads (read-your-writes marker, see utils/db.py)
+CORS_EXPOSE_HEADERS = ["X-Last-Write"]
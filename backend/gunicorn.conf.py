@@ -0,0 +1,83 @@
+"""
+Gunicorn configuration for Menuda Finance API
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py
+
+The master builds the app once (preload_app) and workers fork from it, so a
+new worker starts with every route module already imported instead of
+importing them itself. The app imports a few heavy libraries only on first
+use, so that a bare import main stays fast; the master imports them before
+forking (PRELOAD_MODULES), or each worker would import its own copy on its
+first request instead of sharing the master's pages. Before the first fork the master checks the database
+by opening the pool, then closes those connections: sockets inherited by
+several workers would interleave their traffic. Each worker then opens and
+checks its own pool in post_fork, before it accepts requests.
+
+Configuration (environment variables):
+    GUNICORN_BIND: Address to listen on (default 0.0.0.0:$PORT, PORT default 5000)
+    WEB_CONCURRENCY: Worker processes (default 2 x CPUs + 1)
+    GUNICORN_THREADS: Threads per worker (default 4; event streams hold one
+        each, and SSE_MAX_WORKER_STREAMS defaults to half of them)
+    GUNICORN_TIMEOUT: Seconds before a silent worker is restarted (default 120,
+        invoice extraction can take that long)
+    DB_WARM_POOL: Check the database before forking and warm each worker's
+        pool (default true)
+"""
+import gc
+import importlib
+import multiprocessing
+import os
+
+wsgi_app = 'main:create_app()'
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = True
+
+# Event streams hold a thread each: leave at least half for other requests
+os.environ.setdefault('SSE_MAX_WORKER_STREAMS', str(max(1, threads // 2)))
+
+# Imported lazily by the app (utils.s3, utils.forecast, utils.recurring,
+# routes.invoices), loaded in the master so workers share them
+PRELOAD_MODULES = ('boto3', 'botocore.exceptions', 'requests', 'numpy')
+
+_warm_pool = os.getenv('DB_WARM_POOL', 'true').lower() not in ('0', 'false', 'no')
+
+
+def when_ready(server):
+    """
+    Master, after the app is loaded and before the first fork
+    """
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            server.log.warning("Could not preload %s: %s", module, e)
+
+    if _warm_pool:
+        from utils.db import reset_pools, warm_pool
+        try:
+            server.log.info("Database reachable: %d pooled connections checked", warm_pool())
+        except Exception as e:
+            server.log.warning("Database check before fork failed: %s", e)
+        finally:
+            reset_pools()
+
+    # Move the loaded modules out of the collector's generations, so
+    # collections in the workers do not touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Worker, right after the fork
+    """
+    if not _warm_pool:
+        return
+    from utils.db import warm_pool
+    try:
+        warm_pool()
+    except Exception as e:
+        server.log.warning("Worker %s could not warm the database pool: %s", worker.pid, e)
@@ -1,21 +1,45 @@
 """
 Menuda Finance API - Main Application Entry Point
+
+Importing this module is cheap: the route modules are imported by
+create_app, and the module-level app (gunicorn main:app, flask run) is
+built on first access. See gunicorn.conf.py for the preloading setup.
 """
+import importlib
+import os
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
-from routes.users import users_bp
-from routes.transactions import transactions_bp
-from routes.vendors import vendors_bp
-from routes.categories import categories_bp
-from routes.invoices import invoices_bp
-from routes.attachments import attachments_bp
+from config import CORS_ORIGINS, CORS_METHODS, CORS_ALLOW_HEADERS, CORS_EXPOSE_HEADERS
+from utils.compression import init_compression
+from utils.metrics import init_metrics
+from utils.profiler import init_profiler
+from utils.auth import init_auth
+from utils.ratelimit import init_rate_limits
+from utils.changefeed import init_change_feed
+from utils.db import init_read_your_writes
 from flask import send_from_directory
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 
 # Load environment variables
 load_dotenv()
 
+# Blueprints registered under /api, as (module, blueprint attribute)
+BLUEPRINTS = (
+    ('routes.users', 'users_bp'),
+    ('routes.transactions', 'transactions_bp'),
+    ('routes.vendors', 'vendors_bp'),
+    ('routes.categories', 'categories_bp'),
+    ('routes.invoices', 'invoices_bp'),
+    ('routes.attachments', 'attachments_bp'),
+    ('routes.metrics', 'metrics_bp'),
+    ('routes.recurring', 'recurring_bp'),
+    ('routes.budgets', 'budgets_bp'),
+    ('routes.events', 'events_bp'),
+    ('routes.sync', 'sync_bp'),
+)
+
 def create_app():
     """
     Create and configure Flask application
@@ -24,24 +48,48 @@ def create_app():
     """
     app = Flask(__name__)
     
+    # Behind TRUSTED_PROXIES reverse proxies (load balancers), take the client
+    # address from X-Forwarded-For (rate limits are keyed on it)
+    trusted_proxies = int(os.getenv('TRUSTED_PROXIES', '0'))
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+    
     # Enable CORS for all routes with proper configuration
     CORS(app, resources={
         "/api/*": {
-            "origins": ["http://127.0.0.1:8080", "http://localhost:8080", "http://192.168.1.10:8080", "http://localhost:5500"],
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
-            "allow_headers": ["Content-Type", "Authorization"],
+            "origins": CORS_ORIGINS,
+            "methods": CORS_METHODS, 
+            "allow_headers": CORS_ALLOW_HEADERS,
+            "expose_headers": CORS_EXPOSE_HEADERS,
             "supports_credentials": True
         }
     })
     
+    # Record per-route latency and DB usage
+    init_metrics(app)
+    
+    # Opt-in per-request profiling (admin header or sampling rate)
+    init_profiler(app)
+    
+    # Carry each client's last write across workers (X-Last-Write)
+    init_read_your_writes(app)
+    
+    # Resolve the user from signed session tokens
+    init_auth(app)
+    
+    # Per-user token buckets and concurrency caps (after auth: keyed by user)
+    init_rate_limits(app)
+    
+    # Compress large responses (gzip/brotli negotiated per request)
+    init_compression(app)
+    
+    # Push user events to their server-sent event streams
+    init_change_feed(app)
+    
     # Register blueprints
-    app.register_blueprint(users_bp, url_prefix='/api')
-    app.register_blueprint(transactions_bp, url_prefix='/api')
-    app.register_blueprint(vendors_bp, url_prefix='/api')  # Make sure this line is present
-    app.register_blueprint(categories_bp, url_prefix='/api')
-    app.register_blueprint(invoices_bp, url_prefix='/api')
-    app.register_blueprint(attachments_bp, url_prefix='/api')
-
+    for module_name, blueprint_name in BLUEPRINTS:
+        blueprint = getattr(importlib.import_module(module_name), blueprint_name)
+        app.register_blueprint(blueprint, url_prefix='/api')
 
     
     @app.route('/api/health', methods=['GET'])
@@ -54,9 +102,16 @@ def create_app():
 
 
 
-# Create the application instance
-app = create_app()
+def __getattr__(name):
+    """
+    Create the application instance on first access to main.app
+    """
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
     # Run the application
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,46 @@
+-- Users, categories, vendors and transactions
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id VARCHAR(36) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    picture TEXT,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+
+-- Categories and vendors are soft-deleted (is_active = FALSE)
+CREATE TABLE IF NOT EXISTS categories (
+    category_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    category_name VARCHAR(100) NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS vendors (
+    vendor_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    vendor_name VARCHAR(255) NOT NULL,
+    category_id VARCHAR(36) NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+-- Transactions are soft-deleted (is_deleted = TRUE)
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL,
+    transaction_date DATE NOT NULL,
+    category_id VARCHAR(36) NOT NULL,
+    vendor_id VARCHAR(36) NOT NULL,
+    attachment_url TEXT,
+    attachment_type VARCHAR(20),
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE
+);
@@ -0,0 +1,37 @@
+-- Recurring transaction series (see utils/recurring.py)
+
+CREATE TABLE IF NOT EXISTS recurring_series (
+    series_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    vendor_id VARCHAR(36) NOT NULL,
+    category_id VARCHAR(36) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL,
+    amount_tolerance DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    period VARCHAR(16) NOT NULL,
+    interval_days DECIMAL(7, 2) NOT NULL,
+    anchor_day TINYINT NOT NULL,
+    occurrences INT NOT NULL,
+    confidence DECIMAL(5, 4) NOT NULL,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    next_date DATE NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL
+);
+
+CREATE INDEX idx_recurring_series_user ON recurring_series (user_id, is_active);
+
+-- Due series for the materialize job
+CREATE INDEX idx_recurring_series_due ON recurring_series (is_active, next_date);
+
+-- One row per materialized occurrence; the primary key stops a date from
+-- being created twice
+CREATE TABLE IF NOT EXISTS recurring_occurrences (
+    series_id VARCHAR(36) NOT NULL,
+    occurrence_date DATE NOT NULL,
+    transaction_id VARCHAR(36) NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (series_id, occurrence_date)
+);
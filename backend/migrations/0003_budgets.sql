@@ -0,0 +1,23 @@
+-- Budgets (see utils/budgets.py)
+
+CREATE TABLE IF NOT EXISTS budgets (
+    budget_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    category_id VARCHAR(36) NOT NULL,
+    period VARCHAR(16) NOT NULL,
+    limit_amount DECIMAL(12, 2) NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE INDEX idx_budgets_user_category ON budgets (user_id, is_active, category_id);
+
+-- Spend per budget and period, adjusted by the transaction write handlers
+CREATE TABLE IF NOT EXISTS budget_spend (
+    budget_id VARCHAR(36) NOT NULL,
+    period_start DATE NOT NULL,
+    spent DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (budget_id, period_start)
+);
@@ -0,0 +1,18 @@
+-- Stored responses for Idempotency-Key retries (see utils/idempotency.py,
+-- used when IDEMPOTENCY_STORE=database)
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id VARCHAR(36) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_fingerprint CHAR(64) NOT NULL,
+    owner_token CHAR(32) NOT NULL,
+    status_code SMALLINT NULL,
+    content_type VARCHAR(255) NULL,
+    response_body MEDIUMBLOB NULL,
+    created_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+-- Purge of expired keys
+CREATE INDEX idx_idempotency_keys_expires ON idempotency_keys (expires_at);
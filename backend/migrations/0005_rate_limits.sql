@@ -0,0 +1,15 @@
+-- Shared rate limit state (see utils/ratelimit.py, used when
+-- RATE_LIMIT_STORE=database)
+
+-- One row per token bucket: the epoch time at which it is full again
+CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+    bucket_key VARCHAR(255) PRIMARY KEY,
+    arrival DOUBLE NOT NULL
+);
+
+-- Requests in flight per concurrency cap
+CREATE TABLE IF NOT EXISTS rate_limit_slots (
+    slot_key VARCHAR(255) PRIMARY KEY,
+    in_flight INT NOT NULL DEFAULT 0,
+    updated_at DOUBLE NOT NULL
+);
@@ -0,0 +1,21 @@
+-- Indexes for the queries in routes/ and utils/; check the plans with
+-- python -m scripts.check_query_plans
+
+-- POST /users/check looks users up by email
+CREATE UNIQUE INDEX uq_users_email ON users (email);
+
+-- GET /categories (ORDER BY category_name) and the duplicate-name check in
+-- POST /categories
+CREATE INDEX idx_categories_user ON categories (user_id, is_active, category_name);
+
+-- GET /vendors (ORDER BY vendor_name) and the duplicate-name check in
+-- POST /vendors
+CREATE INDEX idx_vendors_user ON vendors (user_id, vendor_name, is_active);
+
+-- GET /transactions (ORDER BY transaction_date DESC), the search and
+-- recurring detection scans, budget spend seeding and the forecast's date
+-- range; category_id and amount make the forecast query index-only
+CREATE INDEX idx_transactions_user_date ON transactions (user_id, is_deleted, transaction_date, category_id, amount);
+
+-- Vendor/category usage counts for GET /vendors/suggestions (index-only)
+CREATE INDEX idx_transactions_user_vendor ON transactions (user_id, is_deleted, vendor_id, category_id);
@@ -0,0 +1,25 @@
+-- Archived transactions (see utils/archive.py): soft-deleted rows some time
+-- after the delete, and optionally whole cold years
+
+CREATE TABLE IF NOT EXISTS transactions_archive (
+    transaction_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL,
+    transaction_date DATE NOT NULL,
+    category_id VARCHAR(36) NOT NULL,
+    vendor_id VARCHAR(36) NOT NULL,
+    attachment_url TEXT,
+    attachment_type VARCHAR(20),
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE,
+    archived_at DATETIME NOT NULL
+);
+
+-- GET /transactions?archived=true
+CREATE INDEX idx_transactions_archive_user_date ON transactions_archive (user_id, is_deleted, transaction_date);
+
+-- Deleted rows due for archival; only a small slice of the table has
+-- is_deleted = TRUE
+CREATE INDEX idx_transactions_deleted ON transactions (is_deleted, updated_at);
@@ -0,0 +1,33 @@
+-- One transactions partition per year of transaction_date, so queries with
+-- a date range only read the years they cover. scripts/archive_transactions.py
+-- adds the partitions for coming years ahead of time (pmax stays empty).
+
+-- Every unique key of a partitioned table must include the partitioning
+-- column, so the primary key no longer makes transaction_id unique on its
+-- own: the same ID could be inserted again with another date, or after the
+-- first row moved to transactions_archive. New IDs are reserved in
+-- transaction_ids first (0010_transaction_ids.sql), which restores the
+-- guarantee at the cost of one extra insert per new transaction.
+--
+-- Lookups by transaction_id alone (the routes for one transaction) use the
+-- key's prefix but cannot be pruned, so they probe the index of every
+-- partition: about ten index dives instead of one, still no scan. Date
+-- range queries, the bulk of the reads, only touch the years they cover.
+ALTER TABLE transactions DROP PRIMARY KEY, ADD PRIMARY KEY (transaction_id, transaction_date);
+
+ALTER TABLE transactions PARTITION BY RANGE COLUMNS (transaction_date) (
+    -- Also holds every earlier date
+    PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+    PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+    PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+    PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+    PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Archived rows are rarely read: trade CPU on those reads for disk
+ALTER TABLE transactions_archive ROW_FORMAT=COMPRESSED;
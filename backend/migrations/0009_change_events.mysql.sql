@@ -0,0 +1,13 @@
+-- Change events shared by all workers for the server-sent event streams
+-- (see utils/changefeed.py, used when CHANGE_BROKER=database)
+
+CREATE TABLE IF NOT EXISTS change_events (
+    event_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    event_type VARCHAR(64) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL
+);
+
+-- Purge of old events
+CREATE INDEX idx_change_events_created ON change_events (created_at);
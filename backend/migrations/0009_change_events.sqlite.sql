@@ -0,0 +1,12 @@
+-- Same as 0009_change_events.mysql.sql (SQLite spells the auto-increment key differently)
+
+CREATE TABLE IF NOT EXISTS change_events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id VARCHAR(36) NOT NULL,
+    event_type VARCHAR(64) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at DATETIME NOT NULL
+);
+
+-- Purge of old events
+CREATE INDEX idx_change_events_created ON change_events (created_at);
@@ -0,0 +1,18 @@
+-- Every transaction ID ever issued, live or archived. The partitioned
+-- transactions table (0008) can only enforce a unique
+-- (transaction_id, transaction_date), and transactions_archive has its own
+-- key, so new transactions insert their ID here first: a reused ID fails on
+-- this primary key, whatever the date and wherever the first row now lives.
+-- Archival moves rows without touching this table.
+
+CREATE TABLE IF NOT EXISTS transaction_ids (
+    transaction_id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    created_at DATETIME NOT NULL
+);
+
+INSERT INTO transaction_ids (transaction_id, user_id, created_at)
+SELECT transaction_id, user_id, created_at FROM transactions;
+
+INSERT INTO transaction_ids (transaction_id, user_id, created_at)
+SELECT transaction_id, user_id, created_at FROM transactions_archive;
@@ -0,0 +1,3 @@
+-- Recurring detection skips materialized transactions (see utils/recurring.py)
+
+CREATE INDEX idx_recurring_occurrences_transaction ON recurring_occurrences (transaction_id);
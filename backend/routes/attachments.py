@@ -17,12 +17,15 @@ import uuid
 from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from utils.s3 import S3Manager
+from utils.auth import current_user_id
+from utils.idempotency import idempotent
 
 
 # Create blueprint
 attachments_bp = Blueprint('attachments', __name__)
 
 @attachments_bp.route('/attachments/upload', methods=['POST'])
+@idempotent
 def upload_attachment():
     """
     Handle file upload and store in Amazon S3
@@ -47,7 +50,7 @@ def upload_attachment():
         }), 400
     
     # Get user ID
-    user_id = request.form.get('user_id')
+    user_id = current_user_id(request.form.get('user_id'))
     if not user_id:
         return jsonify({
             'status': 'error',
@@ -0,0 +1,300 @@
+"""
+Budget-related routes for Menuda Finance API
+"""
+import datetime
+import uuid
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, request, jsonify
+from utils.db import get_db_connection, close_connection
+from utils.auth import current_user_id, with_session_user
+from utils.budgets import PERIODS, budget_status, invalidate_status
+from utils.idempotency import idempotent
+
+# Create blueprint without url_prefix (will be set in main.py)
+budgets_bp = Blueprint('budgets', __name__)
+
+@budgets_bp.route('/budgets', methods=['GET'])
+def get_budgets():
+    """
+    Get user budgets
+    Query Parameters:
+        user_id: UUID of the user
+    Returns:
+        JSON: Array of budgets with their category
+    """
+    connection = None
+    cursor = None
+
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+
+        # Connect to database
+        connection = get_db_connection(readonly=True, user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+
+        query = """
+        SELECT
+            b.budget_id,
+            b.category_id,
+            c.category_name,
+            b.period,
+            b.limit_amount,
+            b.created_at,
+            b.updated_at
+        FROM
+            budgets b
+            JOIN categories c ON b.category_id = c.category_id
+        WHERE
+            b.user_id = %s
+            AND b.is_active = TRUE
+        ORDER BY
+            c.category_name,
+            b.period
+        """
+
+        cursor.execute(query, (user_id,))
+        budgets = cursor.fetchall()
+
+        # Format values for JSON serialization
+        for budget in budgets:
+            budget['limit_amount'] = float(budget['limit_amount'])
+            if 'created_at' in budget and budget['created_at']:
+                budget['created_at'] = budget['created_at'].isoformat()
+            if 'updated_at' in budget and budget['updated_at']:
+                budget['updated_at'] = budget['updated_at'].isoformat()
+
+        return jsonify({
+            'status': 'success',
+            'data': budgets,
+            'count': len(budgets)
+        })
+
+    except Exception as e:
+        print(f"Error in get_budgets: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
+
+@budgets_bp.route('/budgets', methods=['POST'])
+@idempotent
+def save_budget():
+    """
+    Create a budget, or change the limit of the existing one for the same
+    category and period
+    Request Body:
+        JSON with user_id, category_id, limit_amount and period
+        (weekly, monthly or yearly; default monthly)
+    Returns:
+        JSON: Saved budget
+    """
+    connection = None
+    cursor = None
+
+    try:
+        # Get request data
+        data = with_session_user(request.json)
+
+        # Validate required fields
+        required_fields = ['user_id', 'category_id', 'limit_amount']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Missing required field: {field}'
+                }), 400
+
+        period = data.get('period', 'monthly')
+        if period not in PERIODS:
+            return jsonify({
+                'status': 'error',
+                'message': f"period must be one of: {', '.join(PERIODS)}"
+            }), 400
+
+        try:
+            limit_amount = Decimal(str(data['limit_amount']))
+        except InvalidOperation:
+            limit_amount = None
+        if limit_amount is None or not limit_amount.is_finite() or limit_amount <= 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'limit_amount must be a positive number'
+            }), 400
+
+        # Connect to database
+        connection = get_db_connection(user_id=data['user_id'])
+        cursor = connection.cursor(dictionary=True)
+
+        # Check the category belongs to the user
+        cursor.execute(
+            "SELECT category_id FROM categories WHERE category_id = %s AND user_id = %s AND is_active = TRUE",
+            (data['category_id'], data['user_id'])
+        )
+        if not cursor.fetchone():
+            return jsonify({
+                'status': 'error',
+                'message': 'Category not found or not owned by this user'
+            }), 404
+
+        # One budget per category and period
+        cursor.execute("""
+        SELECT budget_id FROM budgets
+        WHERE user_id = %s AND category_id = %s AND period = %s AND is_active = TRUE
+        """, (data['user_id'], data['category_id'], period))
+        existing_budget = cursor.fetchone()
+
+        if existing_budget:
+            budget_id = existing_budget['budget_id']
+            cursor.execute("""
+            UPDATE budgets SET limit_amount = %s, updated_at = NOW()
+            WHERE budget_id = %s
+            """, (limit_amount, budget_id))
+        else:
+            budget_id = str(uuid.uuid4())
+            cursor.execute("""
+            INSERT INTO budgets (
+                budget_id, user_id, category_id, period, limit_amount, created_at, updated_at, is_active
+            ) VALUES (
+                %s, %s, %s, %s, %s, NOW(), NOW(), TRUE
+            )
+            """, (budget_id, data['user_id'], data['category_id'], period, limit_amount))
+
+        connection.commit()
+        invalidate_status(data['user_id'])
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Budget updated successfully' if existing_budget else 'Budget created successfully',
+            'data': {
+                'budget_id': budget_id,
+                'category_id': data['category_id'],
+                'period': period,
+                'limit_amount': float(limit_amount)
+            }
+        })
+
+    except Exception as e:
+        print(f"Error in save_budget: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
+
+@budgets_bp.route('/budgets/<budget_id>', methods=['DELETE'])
+@idempotent
+def delete_budget(budget_id):
+    """
+    Delete a budget by ID
+    Query Parameters:
+        user_id: UUID of the user (for security verification)
+    Returns:
+        JSON: Success message
+    """
+    connection = None
+    cursor = None
+
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+
+        # Connect to database
+        connection = get_db_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+
+        # Use soft delete by setting is_active flag to FALSE
+        cursor.execute("""
+        UPDATE budgets SET is_active = FALSE, updated_at = NOW()
+        WHERE budget_id = %s AND user_id = %s AND is_active = TRUE
+        """, (budget_id, user_id))
+
+        if cursor.rowcount == 0:
+            return jsonify({
+                'status': 'error',
+                'message': 'Budget not found or not owned by this user'
+            }), 404
+
+        connection.commit()
+        invalidate_status(user_id)
+
+        return jsonify({
+            'status': 'success',
+            'message': 'Budget deleted successfully'
+        })
+
+    except Exception as e:
+        print(f"Error in delete_budget: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
+
+@budgets_bp.route('/budgets/status', methods=['GET'])
+def get_budget_status():
+    """
+    Get spend against each budget for the current period
+    Query Parameters:
+        user_id: UUID of the user
+        date: Day whose periods to report, YYYY-MM-DD (default today)
+    Returns:
+        JSON: Array with limit, spent, remaining, ratio and status per budget
+    """
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+
+        on_date = request.args.get('date')
+        if on_date:
+            try:
+                on_date = datetime.date.fromisoformat(on_date)
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'date must be formatted as YYYY-MM-DD'
+                }), 400
+
+        # Served from the per-worker cache when fresh
+        status = budget_status(user_id, on_date)
+
+        return jsonify({
+            'status': 'success',
+            'data': status,
+            'count': len(status)
+        })
+
+    except Exception as e:
+        print(f"Error in get_budget_status: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
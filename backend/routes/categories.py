@@ -3,12 +3,17 @@ Category-related routes for Menuda Finance API
 """
 from flask import Blueprint, request, jsonify
 from utils.db import get_db_connection, close_connection
+from utils.auth import current_user_id, with_session_user
+from utils.singleflight import coalesce
+from utils.suggestions import suggestion_indexes
+from utils.idempotency import idempotent
 import uuid
 
 # Create blueprint without url_prefix (will be set in main.py)
 categories_bp = Blueprint('categories', __name__)
 
 @categories_bp.route('/categories', methods=['GET'])
+@coalesce('categories')
 def get_categories():
     """
     Get user categories
@@ -22,7 +27,7 @@ def get_categories():
     
     try:
         # Get query parameters
-        user_id = request.args.get('user_id')
+        user_id = current_user_id(request.args.get('user_id'))
         
         if not user_id:
             return jsonify({
@@ -31,7 +36,7 @@ def get_categories():
             }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(readonly=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         
         # Get categories
@@ -78,6 +83,7 @@ def get_categories():
         close_connection(connection, cursor)
 
 @categories_bp.route('/categories', methods=['POST'])
+@idempotent
 def create_category():
     """
     Create a new category
@@ -91,7 +97,7 @@ def create_category():
     
     try:
         # Get request data
-        data = request.json
+        data = with_session_user(request.json)
         
         # Validate required fields
         required_fields = ['user_id', 'category_name']
@@ -103,7 +109,7 @@ def create_category():
                 }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(user_id=data['user_id'])
         cursor = connection.cursor(dictionary=True)
         
         # Check if category already exists
@@ -179,6 +185,9 @@ def create_category():
         cursor.execute(get_query, (category_id,))
         new_category = cursor.fetchone()
         
+        # Keep the suggestion index current
+        suggestion_indexes.set_category(data['user_id'], category_id, new_category['category_name'])
+        
         # Format dates
         if 'created_at' in new_category and new_category['created_at']:
             new_category['created_at'] = new_category['created_at'].isoformat()
@@ -0,0 +1,74 @@
+"""
+Change event stream routes for Menuda Finance API
+
+Each open stream holds a worker thread until SSE_MAX_DURATION, so a worker
+serves at most SSE_MAX_WORKER_STREAMS at once (gunicorn.conf.py keeps it
+below its threads) and the other threads stay free for regular requests.
+Streams are also charged to the per-user concurrency limit of /api/events
+(utils/ratelimit.py). The ASGI app (asgi.py) serves streams without holding
+threads; prefer it when many clients stay connected.
+
+Configuration (environment variables):
+    SSE_MAX_WORKER_STREAMS: Open streams per worker process (default 2)
+"""
+import os
+import threading
+from flask import Blueprint, Response, request, jsonify
+from utils.auth import current_user_id
+from utils.changefeed import get_change_hub, open_stream, stream_events
+from utils.ratelimit import get_rate_limiter, hold_request_slots
+
+# Threads this worker may spend on streams
+_stream_threads = threading.BoundedSemaphore(int(os.getenv('SSE_MAX_WORKER_STREAMS', '2')))
+
+# Create blueprint without url_prefix (will be set in main.py)
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/events', methods=['GET'])
+def stream_changes():
+    """
+    Stream the user's change events as server-sent events
+    Query Parameters:
+        user_id: UUID of the user
+        access_token: Session token (EventSource cannot send the header)
+    Returns:
+        Response: text/event-stream of change events (see utils/changefeed.py)
+    """
+    user_id = current_user_id(request.args.get('user_id'))
+    if not user_id:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing required parameter: user_id'
+        }), 400
+
+    if not _stream_threads.acquire(blocking=False):
+        return jsonify({
+            'status': 'error',
+            'message': 'Too many open event streams on this server, retry later'
+        }), 503, {'Retry-After': '30'}
+
+    subscription = open_stream(user_id)
+    if subscription is None:
+        _stream_threads.release()
+        return jsonify({
+            'status': 'error',
+            'message': 'Too many open event streams'
+        }), 429
+
+    slots = hold_request_slots()
+
+    def close_stream():
+        """Free the thread and the rate limit slots, whether or not the stream started"""
+        get_change_hub().unsubscribe(subscription)
+        limiter = get_rate_limiter()
+        if slots and limiter is not None:
+            limiter.release(slots)
+        _stream_threads.release()
+
+    response = Response(stream_events(subscription), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Proxies must pass events through as they are written
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(close_stream)
+    return response
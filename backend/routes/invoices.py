@@ -1,21 +1,51 @@
 """
 Invoice processing routes for Menuda Finance API
+
+Fields are extracted by pluggable engines (ExtractionEngine): the remote
+OpenAI model, local tesseract OCR with receipt heuristics, and a
+deterministic fake. ExtractionRouter tries them in EXTRACTION_ENGINES order
+and only escalates to the next (slower, billed) engine when a result's
+confidence is below EXTRACTION_MIN_CONFIDENCE. Engines whose dependencies
+are missing are skipped, so without OCR installed every receipt goes to
+OpenAI as before.
 """
+import asyncio
+import base64
+import hashlib
+import io
 import os
+import re
+import shutil
+import threading
 import uuid
+from datetime import date, timedelta
 from flask import Blueprint, request, jsonify
-import requests
 from utils.db import get_db_connection, close_connection
 from utils.s3 import S3Manager
+from utils.auth import current_user_id
+from utils.metrics import registry, time_external
+from utils.idempotency import idempotent
+from utils.changefeed import INVOICE_PROCESSED
+from utils.events import emit
+from utils.extraction import (
+    INVOICE_SCHEMA, ChatCompletionStream, find_date, parse_amount, parse_extraction
+)
 
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # Local OCR is optional; the router skips the engine without it
+    pytesseract = None
+    Image = None
 
 # Create blueprint
 invoices_bp = Blueprint('invoices', __name__)
 
 @invoices_bp.route('/invoices/process', methods=['POST'])
+@idempotent
 def process_invoice():
     """
-    Process an invoice image using OpenAI and store in S3
+    Extract an invoice image's details and store it in S3
     Returns:
         JSON: Extracted invoice data
     """
@@ -36,7 +66,7 @@ def process_invoice():
         }), 400
     
     # Get user ID
-    user_id = request.form.get('user_id')
+    user_id = current_user_id(request.form.get('user_id'))
     if not user_id:
         return jsonify({
             'status': 'error',
@@ -50,8 +80,8 @@ def process_invoice():
         temp_filepath = os.path.join('/tmp', temp_filename)
         invoice_file.save(temp_filepath)
         
-        # Process with OpenAI API
-        extracted_data = process_with_openai(temp_filepath, user_id)
+        # Extract the fields (local OCR first, OpenAI on low confidence)
+        extracted_data = extract_invoice(temp_filepath)
         
         # Upload to S3
         s3_manager = S3Manager()
@@ -69,6 +99,9 @@ def process_invoice():
         if os.path.exists(temp_filepath):
             os.remove(temp_filepath)
         
+        # Let the user's other devices know a receipt is ready to be saved
+        emit(INVOICE_PROCESSED, {'user_id': user_id, 'attachment_url': file_url})
+        
         return jsonify({
             'status': 'success',
             'message': 'Invoice processed successfully',
@@ -82,111 +115,538 @@ def process_invoice():
             'message': f'Error processing invoice: {str(e)}'
         }), 500
 
-def process_with_openai(image_path, user_id):
+# OpenAI chat completions endpoint used for extraction
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+
+def build_openai_request(image_data):
     """
-    Process the image with OpenAI API to extract invoice details
+    Build the headers and payload for the OpenAI extraction request
+    Args:
+        image_data (bytes): Raw image bytes
+    Returns:
+        tuple: (headers dict, payload dict)
+    Raises:
+        ValueError: If the OpenAI API key is not configured
+    """
+    # Get OpenAI API key from environment
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OpenAI API key not found in environment")
+    
+    # Encode image data to base64
+    base64_image = base64.b64encode(image_data).decode('utf-8')
+    
+    # Setup the request to OpenAI GPT-4o Vision API
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+    
+    payload = {
+        'model': 'gpt-4o',
+        # Stream the answer so reading stops as soon as the object is complete
+        'stream': True,
+        'response_format': {
+            'type': 'json_schema',
+            'json_schema': {'name': 'invoice', 'strict': True, 'schema': INVOICE_SCHEMA}
+        },
+        'messages': [
+            {
+                'role': 'system',
+                'content': (
+                    'You are an expert at extracting information from invoices and receipts. '
+                    'Extract the following fields from the provided invoice image: '
+                    'title (description of purchase), amount (total paid), date (transaction date), '
+                    'vendor (store or company name), and category (e.g., Food, Transportation, etc.). '
+                    'Return the data in a structured JSON format only.'
+                )
+            },
+            {
+                'role': 'user',
+                'content': [
+                    {
+                        'type': 'text',
+                        'text': 'Extract the invoice information from this image and provide ONLY a JSON response with title, amount (as a number), date (in YYYY-MM-DD format), vendor, and category fields. Make your best guess for categorization.'
+                    },
+                    {
+                        'type': 'image_url',
+                        'image_url': {
+                            'url': f'data:image/jpeg;base64,{base64_image}'
+                        }
+                    }
+                ]
+            }
+        ]
+    }
+    
+    return headers, payload
+
+def parse_openai_response(result):
+    """
+    Extract the invoice fields from a (non-streamed) OpenAI chat completion
+    Args:
+        result (dict): Decoded OpenAI response body
+    Returns:
+        dict: Extracted invoice data with all required fields present
+    """
+    extracted_data, _ = parse_extraction(result['choices'][0]['message']['content'])
+    return extracted_data
+
+def remote_confidence(invalid_fields):
+    """
+    Confidence in a remote result: full unless fields failed validation
+    Args:
+        invalid_fields (list): Fields that were missing or could not be normalized
+    Returns:
+        float: Share of valid fields
+    """
+    return 1.0 - len(invalid_fields) / len(INVOICE_FIELDS)
+
+def extract_invoice(image_path):
+    """
+    Extract the invoice details from an image with the extraction router
     Args:
         image_path: Path to the image file
-        user_id: User ID for the request
     Returns:
-        dict: Extracted invoice data
+        dict: Extracted invoice data, with the engine that produced it and
+        its confidence
     """
     try:
         # Read image file
         with open(image_path, 'rb') as image_file:
             image_data = image_file.read()
         
-        # Get OpenAI API key from environment
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not found in environment")
-        
-        # Import base64 for encoding image data
-        import base64
-        # Encode image data to base64
-        base64_image = base64.b64encode(image_data).decode('utf-8')
-        
-        # Setup the request to OpenAI GPT-4o Vision API
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            'model': 'gpt-4o',
-            'messages': [
-                {
-                    'role': 'system',
-                    'content': (
-                        'You are an expert at extracting information from invoices and receipts. '
-                        'Extract the following fields from the provided invoice image: '
-                        'title (description of purchase), amount (total paid), date (transaction date), '
-                        'vendor (store or company name), and category (e.g., Food, Transportation, etc.). '
-                        'Return the data in a structured JSON format only.'
-                    )
-                },
-                {
-                    'role': 'user',
-                    'content': [
-                        {
-                            'type': 'text',
-                            'text': 'Extract the invoice information from this image and provide ONLY a JSON response with title, amount (as a number), date (in YYYY-MM-DD format), vendor, and category fields. Make your best guess for categorization.'
-                        },
-                        {
-                            'type': 'image_url',
-                            'image_url': {
-                                'url': f'data:image/jpeg;base64,{base64_image}'
-                            }
-                        }
-                    ]
-                }
-            ]
-        }
+        return get_extraction_router().extract(image_data)
+    
+    except Exception as e:
+        print(f"Error extracting invoice: {e}")
+        raise
+
+
+# Fields every engine returns
+INVOICE_FIELDS = ('title', 'amount', 'date', 'vendor', 'category')
+
+# Engines tried in order, escalating to the next one on low confidence
+EXTRACTION_ENGINES = os.getenv('EXTRACTION_ENGINES', 'local,openai')
+
+# Confidence (0-1) at which a result is accepted without escalating
+EXTRACTION_MIN_CONFIDENCE = float(os.getenv('EXTRACTION_MIN_CONFIDENCE', '0.8'))
+
+# Tesseract languages for the local engine
+OCR_LANG = os.getenv('OCR_LANG', 'spa+eng')
+
+extractions = registry.counter(
+    'menuda_invoice_extractions_total',
+    'Invoice extraction attempts by engine and outcome (accepted, escalated, failed)',
+    ('engine', 'outcome')
+)
+
+
+class ExtractionEngine:
+    """
+    Turns receipt image bytes into the invoice fields
+    """
+    name = 'base'
+
+    def available(self):
+        """
+        Check whether the engine can run in this process
+        Returns:
+            bool: True when its dependencies and credentials are present
+        """
+        return True
+
+    def extract(self, image_data):
+        """
+        Extract the invoice fields from an image
+        Args:
+            image_data (bytes): Raw image bytes
+        Returns:
+            tuple: (dict with INVOICE_FIELDS, confidence between 0 and 1)
+        """
+        raise NotImplementedError
+
+    async def extract_async(self, image_data, http_client=None):
+        """
+        Same as extract, for the async routes (runs in a worker thread unless
+        the engine overrides it)
+        Args:
+            image_data (bytes): Raw image bytes
+            http_client (httpx.AsyncClient): Shared HTTP client, if any
+        Returns:
+            tuple: (dict with INVOICE_FIELDS, confidence between 0 and 1)
+        """
+        return await asyncio.to_thread(self.extract, image_data)
+
+
+class RemoteLLMEngine(ExtractionEngine):
+    """
+    OpenAI vision model. Slow and billed per call, but reads any receipt, so
+    its results are taken at full confidence unless fields fail validation
+    """
+    name = 'openai'
+
+    def available(self):
+        return bool(os.getenv('OPENAI_API_KEY'))
+
+    def extract(self, image_data):
+        # Imported on first use: requests is slow to import and only this
+        # engine needs it
+        import requests
         
-        response = requests.post(
-            'https://api.openai.com/v1/chat/completions',
-            headers=headers,
-            json=payload
-        )
+        headers, payload = build_openai_request(image_data)
         
-        if response.status_code != 200:
-            raise Exception(f"OpenAI API error: {response.text}")
+        stream = ChatCompletionStream()
+        with time_external('openai', 'chat_completions'):
+            response = requests.post(
+                OPENAI_CHAT_URL,
+                headers=headers,
+                json=payload,
+                stream=True
+            )
+            try:
+                if response.status_code != 200:
+                    raise Exception(f"OpenAI API error: {response.text}")
+                for line in response.iter_lines():
+                    if stream.feed_line(line):
+                        break
+            finally:
+                response.close()
         
-        # Extract and parse the JSON response
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content']
+        # Parse, repair and normalize what was streamed
+        extracted_data, invalid_fields = stream.result()
+        return extracted_data, remote_confidence(invalid_fields)
+
+    async def extract_async(self, image_data, http_client=None):
+        if http_client is None:
+            return await super().extract_async(image_data)
         
-        # Find the JSON part in the response (in case there's extra text)
-        import json
-        import re
+        headers, payload = build_openai_request(image_data)
         
-        # Try to parse directly first
-        try:
-            extracted_data = json.loads(extracted_text)
-        except json.JSONDecodeError:
-            # If direct parsing fails, try to find JSON block in markdown
-            json_match = re.search(r'```(?:json)?\n(.*?)\n```', extracted_text, re.DOTALL)
-            if json_match:
-                try:
-                    extracted_data = json.loads(json_match.group(1))
-                except json.JSONDecodeError:
-                    # If still fails, make a best effort to clean up the response
-                    extracted_text = extracted_text.strip()
-                    if extracted_text.startswith('{') and extracted_text.endswith('}'):
-                        extracted_data = json.loads(extracted_text)
-                    else:
-                        raise Exception("Unable to parse JSON from response")
-            else:
-                raise Exception("No JSON found in response")
+        stream = ChatCompletionStream()
+        with time_external('openai', 'chat_completions'):
+            async with http_client.stream('POST', OPENAI_CHAT_URL, headers=headers, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"OpenAI API error: {response.text}")
+                async for line in response.aiter_lines():
+                    if stream.feed_line(line):
+                        break
         
-        # Make sure all required fields are present
-        required_fields = ['title', 'amount', 'date', 'vendor', 'category']
-        for field in required_fields:
-            if field not in extracted_data:
-                extracted_data[field] = ""
+        extracted_data, invalid_fields = stream.result()
+        return extracted_data, remote_confidence(invalid_fields)
+
+
+class LocalOCREngine(ExtractionEngine):
+    """
+    Tesseract OCR followed by parse_receipt_text. Runs in-process in tens of
+    milliseconds; needs Pillow, pytesseract and the tesseract binary
+    """
+    name = 'local'
+
+    def __init__(self, lang=None):
+        self.lang = lang or OCR_LANG
+        self._available = None
+
+    def available(self):
+        if self._available is None:
+            self._available = (
+                pytesseract is not None
+                and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+            )
+        return self._available
+
+    def read_text(self, image_data):
+        """
+        OCR an image
+        Args:
+            image_data (bytes): Raw image bytes
+        Returns:
+            str: Recognized text, one line per receipt line
+        """
+        with Image.open(io.BytesIO(image_data)) as image:
+            # Grayscale reads receipts as well as color and is faster
+            with time_external('tesseract', 'image_to_string'):
+                return pytesseract.image_to_string(image.convert('L'), lang=self.lang)
+
+    def extract(self, image_data):
+        return parse_receipt_text(self.read_text(image_data))
+
+
+class FakeExtractionEngine(ExtractionEngine):
+    """
+    Deterministic engine for tests and benchmarks: the same image always gives
+    the same result, without OCR or network calls
+    """
+    name = 'fake'
+
+    def __init__(self, responses=None, confidence=1.0):
+        """
+        Args:
+            responses (dict): Optional results by SHA-256 hex digest of the image
+            confidence (float): Confidence reported with every result
+        """
+        self.responses = responses or {}
+        self.confidence = confidence
+
+    def extract(self, image_data):
+        digest = hashlib.sha256(image_data).hexdigest()
+        if digest in self.responses:
+            return dict(self.responses[digest]), self.confidence
         
-        return extracted_data
+        seed = int(digest[:12], 16)
+        vendor = f"Comercio {digest[:6].upper()}"
+        return {
+            'title': f"Compra en {vendor}",
+            'amount': float(seed % 500000 + 1000),
+            'date': (date(2025, 1, 1) + timedelta(days=seed % 365)).isoformat(),
+            'vendor': vendor,
+            'category': FAKE_CATEGORIES[seed % len(FAKE_CATEGORIES)],
+        }, self.confidence
+
+
+# Categories the fake engine picks from
+FAKE_CATEGORIES = ('Comida', 'Transporte', 'Mercado', 'Salud', 'Servicios')
+
+ENGINES = {
+    RemoteLLMEngine.name: RemoteLLMEngine,
+    LocalOCREngine.name: LocalOCREngine,
+    FakeExtractionEngine.name: FakeExtractionEngine,
+}
+
+
+class ExtractionRouter:
+    """
+    Tries engines in order (cheapest first) and escalates to the next one when
+    a result is below the confidence threshold or the engine fails. The last
+    engine's result is accepted whatever its confidence; if it fails, the most
+    confident earlier result is returned instead.
+    """
+
+    def __init__(self, engines, min_confidence=EXTRACTION_MIN_CONFIDENCE):
+        """
+        Args:
+            engines (list): ExtractionEngine instances, in escalation order
+            min_confidence (float): Confidence at which a result is accepted
+        """
+        self.engines = list(engines)
+        self.min_confidence = min_confidence
+
+    def _usable(self):
+        engines = [engine for engine in self.engines if engine.available()]
+        if not engines:
+            raise Exception("No invoice extraction engine available")
+        return engines
+
+    def _accept(self, engine, result, is_last):
+        """
+        Record an engine's result and decide whether to stop
+        Returns:
+            bool: True when the result is accepted
+        """
+        accepted = result[1] >= self.min_confidence or is_last
+        extractions.inc(engine=engine.name, outcome='accepted' if accepted else 'escalated')
+        return accepted
+
+    def _finish(self, engine, result):
+        data, confidence = result
+        data['engine'] = engine.name
+        data['confidence'] = round(confidence, 2)
+        return data
+
+    def _fallback(self, best, error):
+        if best is None:
+            raise error
+        return self._finish(*best)
+
+    def extract(self, image_data):
+        """
+        Extract the invoice fields from an image
+        Args:
+            image_data (bytes): Raw image bytes
+        Returns:
+            dict: INVOICE_FIELDS plus engine and confidence
+        Raises:
+            Exception: If no engine is available, or every engine failed
+        """
+        engines = self._usable()
+        best = None
+        for position, engine in enumerate(engines):
+            try:
+                result = engine.extract(image_data)
+            except Exception as e:
+                extractions.inc(engine=engine.name, outcome='failed')
+                print(f"Error extracting with {engine.name}: {e}")
+                if position == len(engines) - 1:
+                    return self._fallback(best, e)
+                continue
+            if self._accept(engine, result, position == len(engines) - 1):
+                return self._finish(engine, result)
+            if best is None or result[1] > best[1][1]:
+                best = (engine, result)
+
+    async def extract_async(self, image_data, http_client=None):
+        """
+        Same as extract, for the async routes
+        Args:
+            image_data (bytes): Raw image bytes
+            http_client (httpx.AsyncClient): Shared HTTP client for remote engines
+        Returns:
+            dict: INVOICE_FIELDS plus engine and confidence
+        """
+        engines = self._usable()
+        best = None
+        for position, engine in enumerate(engines):
+            try:
+                result = await engine.extract_async(image_data, http_client)
+            except Exception as e:
+                extractions.inc(engine=engine.name, outcome='failed')
+                print(f"Error extracting with {engine.name}: {e}")
+                if position == len(engines) - 1:
+                    return self._fallback(best, e)
+                continue
+            if self._accept(engine, result, position == len(engines) - 1):
+                return self._finish(engine, result)
+            if best is None or result[1] > best[1][1]:
+                best = (engine, result)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_extraction_router():
+    """
+    Get the process-wide extraction router, built from EXTRACTION_ENGINES
+    Returns:
+        ExtractionRouter: Router
+    Raises:
+        ValueError: If EXTRACTION_ENGINES names an unknown engine
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                names = [name.strip() for name in EXTRACTION_ENGINES.split(',') if name.strip()]
+                unknown = [name for name in names if name not in ENGINES]
+                if unknown:
+                    raise ValueError(f"Unknown extraction engine(s): {', '.join(unknown)}")
+                _router = ExtractionRouter([ENGINES[name]() for name in names])
+    return _router
+
+
+def set_extraction_router(router):
+    """
+    Replace the extraction router (tests, benchmarks)
+    Args:
+        router (ExtractionRouter): Router to use, or None to rebuild from the environment
+    """
+    global _router
+    with _router_lock:
+        _router = router
+
+
+# Receipt text heuristics for the local engine
+
+# Lines holding the amount paid (\b keeps SUBTOTAL out)
+_TOTAL_LINE = re.compile(
+    r'\b(total|valor\s+total|neto\s+a\s+pagar|importe|total\s+a\s+pagar)\b', re.IGNORECASE
+)
+
+# Amounts: 1.234.567 / 1,234,567.89 / 25.000 / 12,50 / 4500
+_AMOUNT = re.compile(r'(?<![\d.,])\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?(?![\d.,]*\d)|(?<![\d.,])\d+(?:[.,]\d{1,2})?(?![\d.,]*\d)')
+
+# Header lines that are not the vendor name
+_NOT_VENDOR = re.compile(
+    r'\b(nit|rut|factura|fecha|tel|telefono|dir|direccion|calle|cra|carrera|ticket|recibo|'
+    r'regimen|resolucion|www|http|iva|cliente|caja)\b|\d{5,}',
+    re.IGNORECASE
+)
+
+# Category keywords, matched as whole words in the lowercased text
+CATEGORY_KEYWORDS = (
+    ('Transporte', ('uber', 'didi', 'cabify', 'taxi', 'peaje', 'parqueadero', 'gasolina', 'terpel', 'combustible')),
+    ('Restaurantes', ('restaurante', 'pizza', 'burger', 'hamburguesa', 'crepes', 'propina', 'mesa')),
+    ('Mercado', ('exito', 'éxito', 'carulla', 'd1', 'ara', 'olimpica', 'olímpica', 'jumbo', 'supermercado')),
+    ('Salud', ('farmatodo', 'cruz verde', 'drogueria', 'droguería', 'farmacia', 'clinica', 'clínica')),
+    ('Servicios', ('claro', 'movistar', 'tigo', 'epm', 'codensa', 'enel', 'energia', 'energía', 'acueducto', 'gas natural')),
+    ('Comida', ('juan valdez', 'cafe', 'café', 'panaderia', 'panadería', 'almuerzo', 'tostao')),
+    ('Entretenimiento', ('cine', 'cinemark', 'cine colombia', 'netflix', 'spotify', 'boleteria', 'boletería')),
+    ('Viajes', ('avianca', 'latam', 'hotel', 'hostal', 'tiquete')),
+    ('Ropa', ('zara', 'falabella', 'arturo calle', 'koaj', 'studio f')),
+)
+_CATEGORY_PATTERNS = tuple(
+    (category, re.compile(r'\b(' + '|'.join(re.escape(word) for word in words) + r')\b'))
+    for category, words in CATEGORY_KEYWORDS
+)
+
+# Share of the confidence each field contributes
+_FIELD_WEIGHTS = {'amount': 0.45, 'date': 0.25, 'vendor': 0.2, 'category': 0.1}
+
+
+def _line_amounts(line):
+    amounts = (parse_amount(match.group(0)) for match in _AMOUNT.finditer(line))
+    return [amount for amount in amounts if amount is not None]
+
+
+def _find_vendor(lines):
+    """
+    Vendor name: the first header line that reads like a name
+    Returns:
+        str: Vendor name, or ''
+    """
+    for line in lines[:6]:
+        letters = sum(char.isalpha() for char in line)
+        if letters >= 3 and letters >= len(line.replace(' ', '')) / 2 and not _NOT_VENDOR.search(line):
+            name = ' '.join(line.split()).strip(' .,:;-*')
+            return name.title() if name.isupper() else name
+    return ''
+
+
+def parse_receipt_text(text):
+    """
+    Extract the invoice fields from OCR'd receipt text
+    Args:
+        text (str): Receipt text
+    Returns:
+        tuple: (dict with INVOICE_FIELDS, confidence between 0 and 1)
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    found = {}
     
-    except Exception as e:
-        print(f"Error processing with OpenAI: {e}")
-        raise
\ No newline at end of file
+    # The amount paid is on a TOTAL line; fall back to the largest number
+    total_amounts = [amount for line in lines if _TOTAL_LINE.search(line) for amount in _line_amounts(line)]
+    amount = max(total_amounts) if total_amounts else None
+    if amount is not None:
+        found['amount'] = 1.0
+    else:
+        # Skip date-looking and long ID-like lines (NIT, phone numbers)
+        all_amounts = [
+            amount for line in lines if not find_date(line) and not re.search(r'\d{7,}', line)
+            for amount in _line_amounts(line)
+        ]
+        amount = max(all_amounts) if all_amounts else None
+        if amount is not None:
+            found['amount'] = 0.4
+    
+    transaction_date = find_date(text)
+    if transaction_date:
+        found['date'] = 1.0
+    
+    vendor = _find_vendor(lines)
+    if vendor:
+        found['vendor'] = 1.0
+    
+    lowered = text.lower()
+    category = next((name for name, pattern in _CATEGORY_PATTERNS if pattern.search(lowered)), '')
+    if category:
+        found['category'] = 1.0
+    
+    confidence = sum(_FIELD_WEIGHTS[field] * share for field, share in found.items())
+    return {
+        'title': f"Compra en {vendor}" if vendor else '',
+        'amount': float(amount) if amount is not None else '',
+        'date': transaction_date.isoformat() if transaction_date else '',
+        'vendor': vendor,
+        'category': category,
+    }, round(confidence, 4)
@@ -0,0 +1,39 @@
+"""
+Metrics routes for Menuda Finance API
+
+Configuration (environment variables):
+    METRICS_TOKEN: Secret a scraper sends in the X-Metrics-Token header
+        (Prometheus: http_headers in the scrape config). Without it the
+        endpoint is not served.
+"""
+import hmac
+import os
+from flask import Blueprint, Response, jsonify, request
+from utils.metrics import registry
+
+# Create blueprint without url_prefix (will be set in main.py)
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose process metrics in Prometheus text format
+    Returns:
+        Response: Prometheus exposition text (404 when METRICS_TOKEN is not
+        set, 401 when X-Metrics-Token does not match it)
+    """
+    metrics_token = os.getenv('METRICS_TOKEN')
+    if not metrics_token:
+        return jsonify({
+            'status': 'error',
+            'message': 'Not found'
+        }), 404
+
+    header_token = request.headers.get('X-Metrics-Token', '')
+    if not hmac.compare_digest(metrics_token.encode(), header_token.encode()):
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid metrics token'
+        }), 401
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,96 @@
+"""
+Recurring transaction routes for Menuda Finance API
+
+Series are detected and materialized by scripts/recurring.py; these routes
+only read the stored results.
+"""
+from flask import Blueprint, request, jsonify
+from utils.db import get_db_connection, close_connection
+from utils.auth import current_user_id
+
+# Create blueprint without url_prefix (will be set in main.py)
+recurring_bp = Blueprint('recurring', __name__)
+
+@recurring_bp.route('/recurring', methods=['GET'])
+def get_recurring_series():
+    """
+    Get the user's active recurring series
+    Query Parameters:
+        user_id: UUID of the user
+    Returns:
+        JSON: Array of series with vendor, category, amount and next date
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+        
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+        
+        # Connect to database
+        connection = get_db_connection(readonly=True, user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+        
+        # Get series with vendor and category details
+        query = """
+        SELECT 
+            s.series_id,
+            s.title,
+            s.amount,
+            s.amount_tolerance,
+            s.period,
+            s.interval_days,
+            s.occurrences,
+            s.confidence,
+            s.last_date,
+            s.next_date,
+            c.category_id,
+            c.category_name,
+            v.vendor_id,
+            v.vendor_name
+        FROM 
+            recurring_series s
+            JOIN categories c ON s.category_id = c.category_id
+            JOIN vendors v ON s.vendor_id = v.vendor_id
+        WHERE 
+            s.user_id = %s
+            AND s.is_active = TRUE
+        ORDER BY 
+            s.next_date
+        """
+        
+        cursor.execute(query, (user_id,))
+        series = cursor.fetchall()
+        
+        # Format values for JSON serialization
+        for item in series:
+            for field in ('amount', 'amount_tolerance', 'interval_days', 'confidence'):
+                if item.get(field) is not None:
+                    item[field] = float(item[field])
+            if 'last_date' in item and item['last_date']:
+                item['last_date'] = item['last_date'].isoformat()
+            if 'next_date' in item and item['next_date']:
+                item['next_date'] = item['next_date'].isoformat()
+        
+        return jsonify({
+            'status': 'success',
+            'data': series,
+            'count': len(series)
+        })
+        
+    except Exception as e:
+        print(f"Error in get_recurring_series: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+    
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
@@ -0,0 +1,485 @@
+"""
+Offline sync routes for Menuda Finance API
+
+The PWA queues writes made while offline and replays them here in one
+request when it reconnects. Operations are applied in order in a single
+database transaction, and each gets its own outcome:
+
+    applied    Written (or already written by an earlier replay of the same create)
+    merged     Create of a vendor/category whose name already exists; later
+               operations referring to the client ID use the existing one
+    conflict   The row changed since base_updated_at; 'current' is the server row
+    not_found  The row does not exist, is deleted or belongs to another user
+    invalid    The operation is malformed; 'message' says why
+
+Creates carry a client-generated UUID, so replaying a create that already
+reached the server does not insert it twice. Updates and deletes carry the
+updated_at the client last saw and only apply if the row still has it.
+"""
+import uuid
+from datetime import timedelta
+from flask import Blueprint, request, jsonify
+from utils.db import get_db_connection, close_connection
+from utils.auth import with_session_user
+from utils.budgets import apply_spend_changes, spend_changes
+from utils.changefeed import SYNC_APPLIED
+from utils.idempotency import idempotent
+from utils.queries import RESERVE_TRANSACTION_ID, USER_TRANSACTION, VENDOR_BY_ID, fetch_all, fetch_one, to_json, user_transactions_by_ids
+from utils.search import search_indexes
+from utils.suggestions import suggestion_indexes
+from routes.transactions import (
+    PATCH_FIELDS, detect_attachment_type, notify_transaction_changes, parse_updated_at, patch_value
+)
+
+# Operations per request
+SYNC_MAX_OPERATIONS = 500
+
+# Transactions re-read per statement for the search index after the commit
+SYNC_CHUNK_SIZE = 500
+
+# Per entity: table, ID column, live-row condition, delete assignment, flag column and
+# value of a new row, writable fields and the fields a create requires
+ENTITIES = {
+    'transaction': {
+        'table': 'transactions',
+        'key': 'transaction_id',
+        'live': 'is_deleted = FALSE',
+        'delete': 'is_deleted = TRUE',
+        'flag': ('is_deleted', 'FALSE'),
+        'fields': PATCH_FIELDS,
+        'required': ('title', 'amount', 'transaction_date', 'category_id', 'vendor_id'),
+    },
+    'vendor': {
+        'table': 'vendors',
+        'key': 'vendor_id',
+        'live': 'is_active = TRUE',
+        'delete': 'is_active = FALSE',
+        'flag': ('is_active', 'TRUE'),
+        'fields': ('vendor_name', 'category_id'),
+        'required': ('vendor_name', 'category_id'),
+    },
+    'category': {
+        'table': 'categories',
+        'key': 'category_id',
+        'live': 'is_active = TRUE',
+        'delete': 'is_active = FALSE',
+        'flag': ('is_active', 'TRUE'),
+        'fields': ('category_name',),
+        'required': ('category_name',),
+    },
+}
+
+# Fields that refer to another entity, which must exist and belong to the user
+REFERENCES = {'category_id': 'category', 'vendor_id': 'vendor'}
+
+# Name column used to merge creates of a vendor/category that already exists
+NAME_FIELDS = {'vendor': 'vendor_name', 'category': 'category_name'}
+
+ACTIONS = ('create', 'update', 'delete')
+
+
+class SyncBatch:
+    """
+    State shared by the operations of one sync request
+    """
+    def __init__(self, connection, cursor, user_id):
+        """
+        Initialize batch
+        Args:
+            connection: Database connection (one transaction for the whole batch)
+            cursor: Dictionary cursor on the connection
+            user_id (str): User the operations belong to
+        """
+        self.connection = connection
+        self.cursor = cursor
+        self.user_id = user_id
+        # Client IDs of merged creates -> existing server IDs
+        self.id_map = {}
+        # (entity, id) pairs known to exist and belong to the user
+        self.known = set()
+        # Budget spend deltas of the transaction operations, applied once before the commit
+        self.spend = []
+        # (entity, action, id, previous row) of every applied write
+        self.writes = []
+
+    def resolve(self, value):
+        """Map a client ID that was merged into an existing row"""
+        return self.id_map.get(value, value) if isinstance(value, str) else value
+
+    def load(self, entity, row_id):
+        """
+        Read a live row the user owns
+        Args:
+            entity (str): Key of ENTITIES
+            row_id (str): Row ID
+        Returns:
+            dict: ID, writable fields and updated_at, or None
+        """
+        spec = ENTITIES[entity]
+        self.cursor.execute(f"""
+            SELECT {spec['key']}, {', '.join(spec['fields'])}, updated_at FROM {spec['table']}
+            WHERE {spec['key']} = %s AND user_id = %s AND {spec['live']}
+        """, (row_id, self.user_id))
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.known.add((entity, row_id))
+        return row
+
+    def current(self, entity, row_id):
+        """
+        Read a row as the client shows it, for a conflict outcome
+        Args:
+            entity (str): Key of ENTITIES
+            row_id (str): Row ID
+        Returns:
+            dict: JSON-ready row, or None when it is gone
+        """
+        if entity == 'transaction':
+            row = fetch_one(self.connection, USER_TRANSACTION, (row_id, self.user_id))
+        elif entity == 'vendor':
+            row = fetch_one(self.connection, VENDOR_BY_ID, (row_id,)) if self.load(entity, row_id) else None
+        else:
+            row = self.load(entity, row_id)
+        return to_json(row) if row else None
+
+    def updated_at(self, entity, row_id):
+        """Read back the updated_at a write set"""
+        spec = ENTITIES[entity]
+        self.cursor.execute(f"SELECT updated_at FROM {spec['table']} WHERE {spec['key']} = %s", (row_id,))
+        return self.cursor.fetchone()['updated_at'].isoformat()
+
+    def check_references(self, values):
+        """
+        Check that the categories and vendors a write refers to are the user's
+        Args:
+            values (dict): Normalized field values
+        Returns:
+            str: Error message, or None when all references are valid
+        """
+        for field, entity in REFERENCES.items():
+            if field in values and (entity, values[field]) not in self.known and not self.load(entity, values[field]):
+                return f'Unknown {field}: {values[field]}'
+        return None
+
+
+def _outcome(op, status, **fields):
+    """Result entry for one operation"""
+    return dict(fields, op_id=op.get('op_id'), status=status)
+
+
+def _parse_values(entity, data, batch):
+    """
+    Normalize the fields of a create or update
+    Args:
+        entity (str): Key of ENTITIES
+        data (dict): Fields sent by the client
+        batch (SyncBatch): Current batch
+    Returns:
+        dict: Normalized values
+    Raises:
+        ValueError: A field is unknown or invalid
+    """
+    fields = ENTITIES[entity]['fields']
+    unsupported = set(data) - set(fields)
+    if unsupported:
+        raise ValueError(f'Unsupported fields: {", ".join(sorted(unsupported))}')
+
+    values = {}
+    for field in fields:
+        if field in data:
+            value = batch.resolve(data[field]) if field in REFERENCES else data[field]
+            values[field] = patch_value(field, value)
+
+    # A new attachment URL gets a detected type unless one is given; no URL means no type
+    if 'attachment_url' in values and 'attachment_type' not in values:
+        attachment_url = values['attachment_url']
+        values['attachment_type'] = detect_attachment_type(attachment_url) if attachment_url else None
+    return values
+
+
+def _base_updated_at(op):
+    """Parse the updated_at an update or delete was based on"""
+    try:
+        return parse_updated_at(op['base_updated_at'])
+    except (KeyError, ValueError):
+        raise ValueError('base_updated_at must be the ISO updated_at the client last read, without a time zone')
+
+
+def _create(op, entity, row_id, batch):
+    """Insert a row with its client-generated ID"""
+    spec = ENTITIES[entity]
+    values = _parse_values(entity, op.get('data') or {}, batch)
+    missing = [field for field in spec['required'] if field not in values]
+    if missing:
+        return _outcome(op, 'invalid', id=row_id, message=f'Missing required field: {missing[0]}')
+
+    # Replay of a create that already reached the server
+    batch.cursor.execute(f"""
+        SELECT user_id, updated_at FROM {spec['table']} WHERE {spec['key']} = %s
+    """, (row_id,))
+    existing = batch.cursor.fetchone()
+    if existing is not None:
+        if existing['user_id'] != batch.user_id:
+            return _outcome(op, 'invalid', id=row_id, message='ID already in use')
+        return _outcome(op, 'applied', id=row_id, updated_at=existing['updated_at'].isoformat())
+
+    # Transaction IDs stay taken after their row is archived
+    if entity == 'transaction':
+        batch.cursor.execute("SELECT transaction_id FROM transaction_ids WHERE transaction_id = %s", (row_id,))
+        if batch.cursor.fetchone() is not None:
+            return _outcome(op, 'invalid', id=row_id, message='ID already in use')
+
+    error = batch.check_references(values)
+    if error:
+        return _outcome(op, 'invalid', id=row_id, message=error)
+
+    # Same rule as POST /vendors and POST /categories: names are unique per user
+    name_field = NAME_FIELDS.get(entity)
+    if name_field:
+        batch.cursor.execute(f"""
+            SELECT {spec['key']}, updated_at FROM {spec['table']}
+            WHERE user_id = %s AND {name_field} = %s AND is_active = TRUE
+        """, (batch.user_id, values[name_field]))
+        same_name = batch.cursor.fetchone()
+        if same_name is not None:
+            batch.id_map[row_id] = same_name[spec['key']]
+            batch.known.add((entity, same_name[spec['key']]))
+            return _outcome(op, 'merged', id=same_name[spec['key']], updated_at=same_name['updated_at'].isoformat())
+
+    if entity == 'transaction':
+        batch.cursor.execute(RESERVE_TRANSACTION_ID, (row_id, batch.user_id))
+    flag_column, flag_value = spec['flag']
+    columns = [spec['key'], 'user_id', *values, 'created_at', 'updated_at', flag_column]
+    placeholders = ['%s'] * (len(values) + 2) + ['NOW()', 'NOW()', flag_value]
+    batch.cursor.execute(f"""
+        INSERT INTO {spec['table']} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})
+    """, (row_id, batch.user_id, *values.values()))
+
+    batch.known.add((entity, row_id))
+    if entity == 'transaction':
+        batch.spend.extend(spend_changes(current=values))
+    batch.writes.append((entity, 'create', row_id, None))
+    return _outcome(op, 'applied', id=row_id, updated_at=batch.updated_at(entity, row_id))
+
+
+def _update(op, entity, row_id, batch):
+    """Write the fields that changed, if the row still has base_updated_at"""
+    spec = ENTITIES[entity]
+    values = _parse_values(entity, op.get('data') or {}, batch)
+    base_updated_at = _base_updated_at(op)
+
+    existing = batch.load(entity, row_id)
+    if existing is None:
+        return _outcome(op, 'not_found', id=row_id)
+    if existing['updated_at'] != base_updated_at:
+        return _outcome(op, 'conflict', id=row_id, current=batch.current(entity, row_id))
+
+    changes = {field: value for field, value in values.items() if value != patch_value(field, existing[field])}
+    if not changes:
+        return _outcome(op, 'applied', id=row_id, updated_at=existing['updated_at'].isoformat())
+
+    error = batch.check_references(changes)
+    if error:
+        return _outcome(op, 'invalid', id=row_id, message=error)
+
+    # updated_at always moves forward (see patch_transaction)
+    set_clause = ', '.join(f'{field} = %s' for field in changes)
+    batch.cursor.execute(f"""
+        UPDATE {spec['table']}
+        SET {set_clause}, updated_at = GREATEST(NOW(), %s)
+        WHERE {spec['key']} = %s AND user_id = %s AND {spec['live']} AND updated_at = %s
+    """, (*changes.values(), base_updated_at + timedelta(seconds=1), row_id, batch.user_id, base_updated_at))
+    if batch.cursor.rowcount == 0:
+        return _outcome(op, 'conflict', id=row_id, current=batch.current(entity, row_id))
+
+    if entity == 'transaction':
+        batch.spend.extend(spend_changes(current=dict(existing, **changes), previous=existing))
+    batch.writes.append((entity, 'update', row_id, existing))
+    return _outcome(op, 'applied', id=row_id, updated_at=batch.updated_at(entity, row_id))
+
+
+def _delete(op, entity, row_id, batch):
+    """Soft-delete a row, if it still has base_updated_at"""
+    spec = ENTITIES[entity]
+    base_updated_at = _base_updated_at(op)
+
+    existing = batch.load(entity, row_id)
+    if existing is None:
+        return _outcome(op, 'not_found', id=row_id)
+    if existing['updated_at'] != base_updated_at:
+        return _outcome(op, 'conflict', id=row_id, current=batch.current(entity, row_id))
+
+    batch.cursor.execute(f"""
+        UPDATE {spec['table']}
+        SET {spec['delete']}, updated_at = GREATEST(NOW(), %s)
+        WHERE {spec['key']} = %s AND user_id = %s AND {spec['live']} AND updated_at = %s
+    """, (base_updated_at + timedelta(seconds=1), row_id, batch.user_id, base_updated_at))
+    if batch.cursor.rowcount == 0:
+        return _outcome(op, 'conflict', id=row_id, current=batch.current(entity, row_id))
+
+    batch.known.discard((entity, row_id))
+    if entity == 'transaction':
+        batch.spend.extend(spend_changes(previous=existing))
+    batch.writes.append((entity, 'delete', row_id, existing))
+    return _outcome(op, 'applied', id=row_id)
+
+
+def apply_operation(op, batch):
+    """
+    Apply one queued client write
+    Args:
+        op (dict): Operation with op_id, entity, action, id, data and base_updated_at
+        batch (SyncBatch): Current batch
+    Returns:
+        dict: Outcome with op_id and status (see the module docstring)
+    """
+    if not isinstance(op, dict):
+        return {'op_id': None, 'status': 'invalid', 'message': 'Operation must be an object'}
+
+    entity = op.get('entity')
+    action = op.get('action')
+    if entity not in ENTITIES or action not in ACTIONS:
+        return _outcome(op, 'invalid', message='entity and action must be one of '
+                        f'{", ".join(ENTITIES)} and {", ".join(ACTIONS)}')
+    if op.get('data') is not None and not isinstance(op['data'], dict):
+        return _outcome(op, 'invalid', message='data must be an object')
+
+    try:
+        row_id = str(uuid.UUID(str(batch.resolve(op.get('id')))))
+    except ValueError:
+        return _outcome(op, 'invalid', message='id must be a UUID')
+
+    try:
+        if action == 'create':
+            return _create(op, entity, row_id, batch)
+        if action == 'update':
+            return _update(op, entity, row_id, batch)
+        return _delete(op, entity, row_id, batch)
+    except ValueError as e:
+        return _outcome(op, 'invalid', id=row_id, message=str(e))
+
+
+def _notify_sync(batch, events):
+    """
+    Update the in-memory indexes after the batch committed and emit its events
+    Args:
+        batch (SyncBatch): Committed batch
+        events (list): Budget events collected during the batch
+    """
+    user_id = batch.user_id
+
+    # Final state of every transaction written, with names for the search index
+    transaction_ids = list(dict.fromkeys(row_id for entity, _, row_id, _ in batch.writes if entity == 'transaction'))
+    rows = {}
+    for start in range(0, len(transaction_ids), SYNC_CHUNK_SIZE):
+        chunk = transaction_ids[start:start + SYNC_CHUNK_SIZE]
+        for row in fetch_all(batch.connection, user_transactions_by_ids(len(chunk)), (*chunk, user_id)):
+            rows[row['transaction_id']] = to_json(row)
+
+    # Suggestion counts move from each transaction's first state to its last
+    first_states = {}
+    for entity, _, row_id, previous in batch.writes:
+        if entity == 'transaction' and row_id not in first_states:
+            first_states[row_id] = previous
+    changes = [(row_id, rows.get(row_id), first_states[row_id]) for row_id in transaction_ids]
+
+    search_stale = False
+    for entity, action, row_id, previous in batch.writes:
+        if entity == 'transaction':
+            continue
+        row = None if action == 'delete' else batch.load(entity, row_id)
+        if row is None:
+            suggestion_indexes.invalidate(user_id)
+        elif entity == 'vendor':
+            suggestion_indexes.set_vendor(user_id, row_id, row['vendor_name'], row['category_id'])
+        else:
+            suggestion_indexes.set_category(user_id, row_id, row['category_name'])
+
+        # Transactions are indexed with their vendor and category names
+        name_field = NAME_FIELDS[entity]
+        if previous is not None and row is not None and row[name_field] != previous[name_field]:
+            search_stale = True
+
+    if search_stale:
+        search_indexes.invalidate(user_id)
+
+    counts = {entity: 0 for entity in ENTITIES}
+    for entity, _, _, _ in batch.writes:
+        counts[entity] += 1
+    change_event = (SYNC_APPLIED, {'user_id': user_id, **counts})
+    notify_transaction_changes(user_id, changes, [change_event, *events])
+
+
+# Create blueprint without url_prefix (will be set in main.py)
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/sync/push', methods=['POST'])
+@idempotent
+def push_changes():
+    """
+    Apply a batch of writes queued by an offline client
+    Request Body:
+        user_id: UUID of the user
+        operations: Ordered list of {op_id, entity ('transaction', 'vendor' or
+            'category'), action ('create', 'update' or 'delete'), id (UUID, client
+            generated for creates), data (fields), base_updated_at (updates and deletes)}
+    Returns:
+        JSON: One outcome per operation, in order
+    """
+    connection = None
+    cursor = None
+
+    try:
+        data = with_session_user(request.json)
+        user_id = data.get('user_id')
+        operations = data.get('operations')
+
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: user_id'
+            }), 400
+
+        if not isinstance(operations, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'operations must be a list'
+            }), 400
+
+        if len(operations) > SYNC_MAX_OPERATIONS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {SYNC_MAX_OPERATIONS} operations per request'
+            }), 400
+
+        # Connect to database
+        connection = get_db_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+
+        # Every operation in one database transaction
+        batch = SyncBatch(connection, cursor, user_id)
+        results = [apply_operation(op, batch) for op in operations]
+        events = apply_spend_changes(cursor, user_id, batch.spend)
+
+        connection.commit()
+
+        if batch.writes:
+            _notify_sync(batch, events)
+
+        applied = sum(1 for result in results if result['status'] in ('applied', 'merged'))
+        return jsonify({
+            'status': 'success',
+            'message': f'{applied} of {len(results)} operations applied',
+            'data': results
+        })
+
+    except Exception as e:
+        print(f"Error in push_changes: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
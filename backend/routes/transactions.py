@@ -2,15 +2,201 @@
 Updated transaction-related routes for Menuda Finance API with NULL handling
 """
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from flask import Blueprint, request, jsonify
 from utils.db import get_db_connection, close_connection
+from utils.auth import current_user_id, with_session_user
+from utils.singleflight import coalesce
+from utils.search import search_indexes
+from utils.suggestions import suggestion_indexes
+from utils.budgets import apply_spend_changes, invalidate_status, spend_changes
+from utils.changefeed import TRANSACTION_CREATED, TRANSACTION_DELETED, TRANSACTION_UPDATED, TRANSACTIONS_CHANGED
+from utils.events import emit_all
+from utils.forecast import get_forecast, invalidate_forecast
+from utils.idempotency import idempotent
+from utils.queries import (
+    RESERVE_TRANSACTION_ID, TRANSACTION_BY_ID, USER_TRANSACTION, fetch_all, fetch_one, to_json, user_transactions, user_transactions_by_ids
+)
+
+# Pagination limits for transaction search
+SEARCH_DEFAULT_PER_PAGE = 20
+SEARCH_MAX_PER_PAGE = 100
+
+# Bulk updates: IDs per request, and per IN (...) statement
+BULK_MAX_IDS = 5000
+BULK_CHUNK_SIZE = 500
+
+# Fields a bulk update may change
+BULK_PATCH_FIELDS = ('category_id', 'vendor_id')
+
+# Fields that refer to a category or vendor the user must own, and their table
+REFERENCE_TABLES = {'category_id': 'categories', 'vendor_id': 'vendors'}
+
+# Fields a PATCH may change, in the order they are written
+PATCH_FIELDS = (
+    'title', 'amount', 'transaction_date', 'category_id', 'vendor_id', 'attachment_url', 'attachment_type'
+)
+
+
+def detect_attachment_type(attachment_url):
+    """
+    Guess an attachment's type from its URL
+    Args:
+        attachment_url (str): Attachment URL
+    Returns:
+        str: 'image', 'pdf', 'audio' or 'file'
+    """
+    if attachment_url.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
+        return 'image'
+    if attachment_url.lower().endswith('.pdf'):
+        return 'pdf'
+    if attachment_url.lower().endswith(('.mp3', '.wav', '.ogg')):
+        return 'audio'
+    return 'file'
+
+def patch_value(field, value):
+    """
+    Normalize a PATCH (or sync) field so a requested value can be compared with the stored one
+    Args:
+        field (str): One of PATCH_FIELDS, or a required string field such as vendor_name
+        value: Value from the request body or the database
+    Returns:
+        Decimal for amount, date for transaction_date, the value otherwise
+    Raises:
+        ValueError: The value is not valid for the field
+    """
+    if field == 'amount':
+        try:
+            amount = Decimal(str(value))
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
+            raise ValueError('amount must be a number')
+        return amount
+    if field == 'transaction_date':
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return datetime.strptime(str(value), '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('transaction_date must be YYYY-MM-DD')
+    if field in ('attachment_url', 'attachment_type'):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f'{field} must be a string or null')
+        return value or None
+    if not isinstance(value, str) or not value:
+        raise ValueError(f'{field} must be a non-empty string')
+    return value
+
+def unknown_reference(cursor, user_id, values):
+    """
+    Check that the categories and vendors a write refers to are active and the user's
+    Args:
+        cursor: Database cursor
+        user_id (str): UUID of the user
+        values (dict): Normalized field values (see patch_value)
+    Returns:
+        str: Error message, or None when all references are valid
+    """
+    for field, table in REFERENCE_TABLES.items():
+        if field not in values:
+            continue
+        cursor.execute(f"""
+        SELECT {field} FROM {table} WHERE {field} = %s AND user_id = %s AND is_active = TRUE
+        """, (values[field], user_id))
+        if cursor.fetchone() is None:
+            return f'Unknown {field}: {values[field]}'
+    return None
+
+def parse_updated_at(value):
+    """
+    Parse the updated_at a client last read, for an optimistic concurrency check
+    Args:
+        value: ISO datetime as returned by the API (server time, no offset)
+    Returns:
+        datetime: Naive datetime comparable with the stored updated_at
+    Raises:
+        ValueError: The value is not an ISO datetime, or carries a time zone
+            (e.g. toISOString()'s 'Z'), which would never match the stored value
+    """
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError('updated_at must be an ISO datetime')
+    if parsed.tzinfo is not None:
+        raise ValueError('updated_at must be the value the API returned, without a time zone')
+    return parsed
+
+def _patch_conflict(current):
+    """
+    Response for a PATCH whose transaction changed or disappeared since the client read it
+    Args:
+        current (dict): Transaction row as it is now (None when deleted)
+    Returns:
+        tuple: (JSON response, status code)
+    """
+    if current is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Transaction not found or not owned by this user'
+        }), 404
+    return jsonify({
+        'status': 'error',
+        'message': 'Transaction was changed since it was read',
+        'data': to_json(current)
+    }), 409
+
+def _notify_transaction_change(user_id, transaction_id, current=None, previous=None, events=None):
+    """
+    Keep the in-memory indexes current after a committed write
+    Args:
+        user_id (str): Owner of the transaction
+        transaction_id (str): Transaction ID
+        current (dict): Transaction row after the write (None when deleted)
+        previous (dict): vendor_id and category_id before the write (None when created)
+        events (list): Events collected during the write, emitted now that it is committed
+    """
+    if previous is None:
+        change = TRANSACTION_CREATED
+    elif current is None:
+        change = TRANSACTION_DELETED
+    else:
+        change = TRANSACTION_UPDATED
+    change_event = (change, {'user_id': user_id, 'transaction_id': transaction_id})
+    notify_transaction_changes(user_id, [(transaction_id, current, previous)], [change_event, *(events or ())])
+
+def notify_transaction_changes(user_id, changes, events=None):
+    """
+    Keep the in-memory indexes current after a committed write to several transactions
+    Args:
+        user_id (str): Owner of the transactions
+        changes (list): (transaction_id, current, previous) tuples, as for _notify_transaction_change
+        events (list): Events collected during the write, emitted now that it is committed
+    """
+    for transaction_id, current, previous in changes:
+        if current is not None:
+            search_indexes.index_transaction(user_id, current)
+        else:
+            search_indexes.remove_transaction(user_id, transaction_id)
+
+        if previous is not None:
+            suggestion_indexes.record_transaction(user_id, previous['vendor_id'], previous['category_id'], -1)
+        if current is not None:
+            suggestion_indexes.record_transaction(user_id, current['vendor_id'], current['category_id'], 1)
+
+    invalidate_status(user_id)
+    invalidate_forecast(user_id)
+    emit_all(events)
 
 # Create blueprint without url_prefix (will be set in main.py)
 transactions_bp = Blueprint('transactions', __name__)
 
 # Add this to the existing transactions_bp in backend/routes/transactions.py
 @transactions_bp.route('/transactions', methods=['POST'])
+@idempotent
 def create_transaction():
     """
     Create a new transaction with improved attachment handling
@@ -24,7 +210,7 @@ def create_transaction():
     
     try:
         # Get request data
-        data = request.json
+        data = with_session_user(request.json)
         print(f"Received transaction data: {data}")
         
         # Validate required fields
@@ -37,11 +223,12 @@ def create_transaction():
                 }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(user_id=data['user_id'])
         cursor = connection.cursor(dictionary=True)
         
         # Generate transaction ID
         transaction_id = str(uuid.uuid4())
+        cursor.execute(RESERVE_TRANSACTION_ID, (transaction_id, data['user_id']))
         
         # Check if attachment fields exist
         has_attachment_url = 'attachment_url' in data and data['attachment_url']
@@ -95,41 +282,16 @@ def create_transaction():
                 data['vendor_id']
             ))
         
+        # Budget spend changes in the same database transaction
+        events = apply_spend_changes(cursor, data['user_id'], spend_changes(current=data))
+        
         connection.commit()
         
         # Get the newly created transaction
-        get_query = """
-        SELECT 
-            t.transaction_id,
-            t.title,
-            t.amount,
-            t.transaction_date,
-            t.attachment_url,
-            t.attachment_type,
-            t.created_at,
-            t.updated_at,
-            c.category_id,
-            c.category_name,
-            v.vendor_id,
-            v.vendor_name
-        FROM 
-            transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            JOIN vendors v ON t.vendor_id = v.vendor_id
-        WHERE 
-            t.transaction_id = %s
-        """
+        new_transaction = to_json(fetch_one(connection, TRANSACTION_BY_ID, (transaction_id,)))
         
-        cursor.execute(get_query, (transaction_id,))
-        new_transaction = cursor.fetchone()
-        
-        # Format dates for JSON serialization
-        if 'transaction_date' in new_transaction and new_transaction['transaction_date']:
-            new_transaction['transaction_date'] = new_transaction['transaction_date'].isoformat()
-        if 'created_at' in new_transaction and new_transaction['created_at']:
-            new_transaction['created_at'] = new_transaction['created_at'].isoformat()
-        if 'updated_at' in new_transaction and new_transaction['updated_at']:
-            new_transaction['updated_at'] = new_transaction['updated_at'].isoformat()
+        # Keep the search and suggestion indexes current
+        _notify_transaction_change(data['user_id'], transaction_id, current=new_transaction, events=events)
         
         return jsonify({
             'status': 'success',
@@ -150,6 +312,7 @@ def create_transaction():
 
 # Add this PUT endpoint for updating transactions
 @transactions_bp.route('/transactions/<transaction_id>', methods=['PUT'])
+@idempotent
 def update_transaction(transaction_id):
     """
     Update an existing transaction
@@ -163,7 +326,7 @@ def update_transaction(transaction_id):
     
     try:
         # Get request data
-        data = request.json
+        data = with_session_user(request.json)
         
         # Validate required fields
         required_fields = ['user_id', 'title', 'amount', 'transaction_date', 'category_id', 'vendor_id']
@@ -175,12 +338,12 @@ def update_transaction(transaction_id):
                 }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(user_id=data['user_id'])
         cursor = connection.cursor(dictionary=True)
         
         # Check if transaction exists and belongs to user
         check_query = """
-        SELECT transaction_id FROM transactions 
+        SELECT transaction_id, vendor_id, category_id, amount, transaction_date FROM transactions 
         WHERE transaction_id = %s AND user_id = %s AND is_deleted = FALSE
         """
         
@@ -200,14 +363,7 @@ def update_transaction(transaction_id):
         # Ensure both attachment fields are either both present or both NULL
         if attachment_url and not attachment_type:
             # Auto-detect attachment type based on URL if missing
-            if attachment_url.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                attachment_type = 'image'
-            elif attachment_url.lower().endswith('.pdf'):
-                attachment_type = 'pdf'
-            elif attachment_url.lower().endswith(('.mp3', '.wav', '.ogg')):
-                attachment_type = 'audio'
-            else:
-                attachment_type = 'file'
+            attachment_type = detect_attachment_type(attachment_url)
         elif not attachment_url:
             attachment_type = None
         
@@ -236,41 +392,20 @@ def update_transaction(transaction_id):
             transaction_id
         ))
         
+        # Budget spend changes in the same database transaction
+        events = apply_spend_changes(
+            cursor, data['user_id'], spend_changes(current=data, previous=existing_transaction)
+        )
+        
         connection.commit()
         
         # Get the updated transaction
-        get_query = """
-        SELECT 
-            t.transaction_id,
-            t.title,
-            t.amount,
-            t.transaction_date,
-            t.attachment_url,
-            t.attachment_type,
-            t.created_at,
-            t.updated_at,
-            c.category_id,
-            c.category_name,
-            v.vendor_id,
-            v.vendor_name
-        FROM 
-            transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            JOIN vendors v ON t.vendor_id = v.vendor_id
-        WHERE 
-            t.transaction_id = %s
-        """
-        
-        cursor.execute(get_query, (transaction_id,))
-        updated_transaction = cursor.fetchone()
+        updated_transaction = to_json(fetch_one(connection, TRANSACTION_BY_ID, (transaction_id,)))
         
-        # Format dates for JSON serialization
-        if 'transaction_date' in updated_transaction and updated_transaction['transaction_date']:
-            updated_transaction['transaction_date'] = updated_transaction['transaction_date'].isoformat()
-        if 'created_at' in updated_transaction and updated_transaction['created_at']:
-            updated_transaction['created_at'] = updated_transaction['created_at'].isoformat()
-        if 'updated_at' in updated_transaction and updated_transaction['updated_at']:
-            updated_transaction['updated_at'] = updated_transaction['updated_at'].isoformat()
+        # Keep the search and suggestion indexes current
+        _notify_transaction_change(
+            data['user_id'], transaction_id, current=updated_transaction, previous=existing_transaction, events=events
+        )
         
         return jsonify({
             'status': 'success',
@@ -289,12 +424,158 @@ def update_transaction(transaction_id):
         # Clean up resources
         close_connection(connection, cursor)
 
+@transactions_bp.route('/transactions/<transaction_id>', methods=['PATCH'])
+@idempotent
+def patch_transaction(transaction_id):
+    """
+    Change some fields of a transaction, unless it changed since the client read it
+    Request Body:
+        user_id: UUID of the user
+        updated_at: updated_at of the transaction as the client last read it
+        Any of title, amount, transaction_date, category_id, vendor_id,
+        attachment_url and attachment_type
+    Returns:
+        JSON: transaction_id, the new updated_at and the fields that changed
+        (409 with the current transaction when updated_at does not match)
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        # Get request data
+        data = with_session_user(request.json)
+        
+        for field in ('user_id', 'updated_at'):
+            if not data.get(field):
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Missing required field: {field}'
+                }), 400
+        
+        try:
+            expected_updated_at = parse_updated_at(data['updated_at'])
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        unsupported = set(data) - set(PATCH_FIELDS) - {'user_id', 'updated_at'}
+        if unsupported:
+            return jsonify({
+                'status': 'error',
+                'message': f'Unsupported fields: {", ".join(sorted(unsupported))}'
+            }), 400
+        
+        try:
+            values = {field: patch_value(field, data[field]) for field in PATCH_FIELDS if field in data}
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # A new attachment URL gets a detected type unless one is given; no URL means no type
+        if 'attachment_url' in values and 'attachment_type' not in values:
+            attachment_url = values['attachment_url']
+            values['attachment_type'] = detect_attachment_type(attachment_url) if attachment_url else None
+        
+        # Connect to database
+        connection = get_db_connection(user_id=data['user_id'])
+        cursor = connection.cursor(dictionary=True)
+        
+        existing_transaction = fetch_one(connection, USER_TRANSACTION, (transaction_id, data['user_id']))
+        if not existing_transaction or existing_transaction['updated_at'] != expected_updated_at:
+            return _patch_conflict(existing_transaction)
+        
+        # Only the columns whose value actually changes are written
+        changes = {
+            field: value for field, value in values.items()
+            if value != patch_value(field, existing_transaction[field])
+        }
+        
+        if not changes:
+            return jsonify({
+                'status': 'success',
+                'message': 'Transaction unchanged',
+                'data': to_json({'transaction_id': transaction_id, 'updated_at': existing_transaction['updated_at']})
+            })
+        
+        error = unknown_reference(cursor, data['user_id'], changes)
+        if error:
+            return jsonify({
+                'status': 'error',
+                'message': error
+            }), 400
+        
+        # updated_at always moves forward, even for two writes within the same second,
+        # so a client holding the previous value cannot overwrite this one
+        set_clause = ', '.join(f'{field} = %s' for field in changes)
+        cursor.execute(f"""
+        UPDATE transactions 
+        SET {set_clause}, updated_at = GREATEST(NOW(), %s)
+        WHERE transaction_id = %s AND user_id = %s AND is_deleted = FALSE AND updated_at = %s
+        """, (
+            *changes.values(), expected_updated_at + timedelta(seconds=1),
+            transaction_id, data['user_id'], expected_updated_at
+        ))
+        
+        # Another write got in between the read and this update
+        if cursor.rowcount == 0:
+            connection.rollback()
+            return _patch_conflict(fetch_one(connection, USER_TRANSACTION, (transaction_id, data['user_id'])))
+        
+        cursor.execute("SELECT updated_at FROM transactions WHERE transaction_id = %s", (transaction_id,))
+        updated_at = cursor.fetchone()['updated_at']
+        
+        # Budget spend changes in the same database transaction
+        events = []
+        if {'amount', 'category_id', 'transaction_date'} & set(changes):
+            events = apply_spend_changes(
+                cursor, data['user_id'],
+                spend_changes(current=dict(existing_transaction, **changes), previous=existing_transaction)
+            )
+        
+        connection.commit()
+        
+        # The search index needs the category and vendor names, re-read only when they changed
+        if 'category_id' in changes or 'vendor_id' in changes:
+            current = fetch_one(connection, TRANSACTION_BY_ID, (transaction_id,))
+        else:
+            current = dict(existing_transaction, **changes, updated_at=updated_at)
+        
+        # Keep the search and suggestion indexes current
+        _notify_transaction_change(
+            data['user_id'], transaction_id, current=current, previous=existing_transaction, events=events
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Transaction updated successfully',
+            'data': to_json(dict(changes, transaction_id=transaction_id, updated_at=updated_at))
+        })
+        
+    except Exception as e:
+        print(f"Error in patch_transaction: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Server error occurred: {str(e)}'
+        }), 500
+    
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
+
 @transactions_bp.route('/transactions', methods=['GET'])
+@coalesce('transactions')
 def get_transactions():
     """
     Get user transactions
     Query Parameters:
         user_id: UUID of the user
+        from_date: Earliest transaction date, YYYY-MM-DD (optional)
+        to_date: Latest transaction date, YYYY-MM-DD (optional)
+        archived: 'true' to list archived transactions instead (optional)
     Returns:
         JSON: Array of transactions with their details
     """
@@ -303,7 +584,7 @@ def get_transactions():
     
     try:
         # Get query parameters
-        user_id = request.args.get('user_id')
+        user_id = current_user_id(request.args.get('user_id'))
         
         if not user_id:
             return jsonify({
@@ -311,47 +592,30 @@ def get_transactions():
                 'message': 'Missing required parameter: user_id'
             }), 400
         
-        # Connect to database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        # A date range only reads the partitions of the years it covers
+        params = [user_id]
+        for name in ('from_date', 'to_date'):
+            value = request.args.get(name)
+            if value:
+                try:
+                    params.append(datetime.strptime(value, '%Y-%m-%d').date())
+                except ValueError:
+                    return jsonify({
+                        'status': 'error',
+                        'message': f'{name} must be formatted as YYYY-MM-DD'
+                    }), 400
         
-        # Get transactions with category and vendor details
-        query = """
-        SELECT 
-            t.transaction_id,
-            t.title,
-            t.amount,
-            t.transaction_date,
-            t.attachment_url,
-            t.attachment_type,
-            t.created_at,
-            t.updated_at,
-            c.category_id,
-            c.category_name,
-            v.vendor_id,
-            v.vendor_name
-        FROM 
-            transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            JOIN vendors v ON t.vendor_id = v.vendor_id
-        WHERE 
-            t.user_id = %s
-            AND t.is_deleted = FALSE
-        ORDER BY 
-            t.transaction_date DESC
-        """
+        query = user_transactions(
+            archived=request.args.get('archived') == 'true',
+            from_date=bool(request.args.get('from_date')),
+            to_date=bool(request.args.get('to_date'))
+        )
         
-        cursor.execute(query, (user_id,))
-        transactions = cursor.fetchall()
+        # Connect to database
+        connection = get_db_connection(readonly=True, user_id=user_id)
         
-        # Format dates for JSON serialization
-        for transaction in transactions:
-            if 'transaction_date' in transaction and transaction['transaction_date']:
-                transaction['transaction_date'] = transaction['transaction_date'].isoformat()
-            if 'created_at' in transaction and transaction['created_at']:
-                transaction['created_at'] = transaction['created_at'].isoformat()
-            if 'updated_at' in transaction and transaction['updated_at']:
-                transaction['updated_at'] = transaction['updated_at'].isoformat()
+        # Get transactions with category and vendor details
+        transactions = [to_json(transaction) for transaction in fetch_all(connection, query, params)]
         
         return jsonify({
             'status': 'success',
@@ -370,6 +634,129 @@ def get_transactions():
         # Clean up resources
         close_connection(connection, cursor)
 
+@transactions_bp.route('/transactions/search', methods=['GET'])
+def search_transactions():
+    """
+    Search user transactions by title, vendor and category
+    Query Parameters:
+        user_id: UUID of the user
+        q: Search text (prefix and typo tolerant)
+        page: Page number, starting at 1 (default 1)
+        per_page: Results per page (default 20, max 100)
+    Returns:
+        JSON: Ranked page of matching transactions
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+        query_text = request.args.get('q', '').strip()
+        
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+        
+        if not query_text:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: q'
+            }), 400
+        
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', SEARCH_DEFAULT_PER_PAGE, type=int)
+        if page < 1 or per_page < 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'page and per_page must be positive integers'
+            }), 400
+        per_page = min(per_page, SEARCH_MAX_PER_PAGE)
+        
+        # Connect to database
+        connection = get_db_connection(readonly=True, user_id=user_id)
+        
+        # Rank in memory, then load only the rows for the requested page
+        index = search_indexes.get(user_id, connection)
+        transaction_ids, total = index.search(query_text, offset=(page - 1) * per_page, limit=per_page)
+        
+        transactions = []
+        if transaction_ids:
+            query = user_transactions_by_ids(len(transaction_ids))
+            rows = {row['transaction_id']: row for row in fetch_all(connection, query, (*transaction_ids, user_id))}
+            
+            # Preserve the ranking order
+            transactions = [to_json(rows[transaction_id]) for transaction_id in transaction_ids if transaction_id in rows]
+        
+        return jsonify({
+            'status': 'success',
+            'data': transactions,
+            'count': len(transactions),
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        })
+        
+    except Exception as e:
+        print(f"Error in search_transactions: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+    
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
+
+@transactions_bp.route('/transactions/forecast', methods=['GET'])
+def forecast_transactions():
+    """
+    Project month-end spend per category
+    Query Parameters:
+        user_id: UUID of the user
+        date: Reference day, YYYY-MM-DD (default today)
+    Returns:
+        JSON: Spent to date and projected month-end total per category
+    """
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+        
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+        
+        on_date = request.args.get('date')
+        if on_date:
+            try:
+                on_date = datetime.strptime(on_date, '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'date must be formatted as YYYY-MM-DD'
+                }), 400
+        
+        # Served from the per-worker cache when fresh
+        forecast = get_forecast(user_id, on_date or None)
+        
+        return jsonify({
+            'status': 'success',
+            'data': forecast,
+            'count': len(forecast),
+            'projected_total': round(sum(item['projected_total'] for item in forecast), 2)
+        })
+        
+    except Exception as e:
+        print(f"Error in forecast_transactions: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
 @transactions_bp.route('/transactions/<transaction_id>', methods=['GET'])
 def get_transaction(transaction_id):
     """
@@ -384,7 +771,7 @@ def get_transaction(transaction_id):
     
     try:
         # Get query parameters
-        user_id = request.args.get('user_id')
+        user_id = current_user_id(request.args.get('user_id'))
         
         if not user_id:
             return jsonify({
@@ -393,36 +780,10 @@ def get_transaction(transaction_id):
             }), 400
         
         # Connect to database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        connection = get_db_connection(readonly=True, user_id=user_id)
         
         # Get transaction with category and vendor details
-        query = """
-        SELECT 
-            t.transaction_id,
-            t.title,
-            t.amount,
-            t.transaction_date,
-            t.attachment_url,
-            t.attachment_type,
-            t.created_at,
-            t.updated_at,
-            c.category_id,
-            c.category_name,
-            v.vendor_id,
-            v.vendor_name
-        FROM 
-            transactions t
-            JOIN categories c ON t.category_id = c.category_id
-            JOIN vendors v ON t.vendor_id = v.vendor_id
-        WHERE 
-            t.transaction_id = %s
-            AND t.user_id = %s
-            AND t.is_deleted = FALSE
-        """
-        
-        cursor.execute(query, (transaction_id, user_id))
-        transaction = cursor.fetchone()
+        transaction = fetch_one(connection, USER_TRANSACTION, (transaction_id, user_id))
         
         if not transaction:
             return jsonify({
@@ -431,12 +792,7 @@ def get_transaction(transaction_id):
             }), 404
         
         # Format dates for JSON serialization
-        if 'transaction_date' in transaction and transaction['transaction_date']:
-            transaction['transaction_date'] = transaction['transaction_date'].isoformat()
-        if 'created_at' in transaction and transaction['created_at']:
-            transaction['created_at'] = transaction['created_at'].isoformat()
-        if 'updated_at' in transaction and transaction['updated_at']:
-            transaction['updated_at'] = transaction['updated_at'].isoformat()
+        to_json(transaction)
         
         return jsonify({
             'status': 'success',
@@ -456,6 +812,7 @@ def get_transaction(transaction_id):
     
 
 @transactions_bp.route('/transactions/<transaction_id>', methods=['DELETE'])
+@idempotent
 def delete_transaction(transaction_id):
     """
     Delete a transaction by ID
@@ -469,7 +826,7 @@ def delete_transaction(transaction_id):
     
     try:
         # Get query parameters
-        user_id = request.args.get('user_id')
+        user_id = current_user_id(request.args.get('user_id'))
         
         if not user_id:
             return jsonify({
@@ -478,28 +835,49 @@ def delete_transaction(transaction_id):
             }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         
+        # Read what the transaction counted towards before removing it
+        check_query = """
+        SELECT transaction_id, vendor_id, category_id, amount, transaction_date FROM transactions 
+        WHERE transaction_id = %s AND user_id = %s AND is_deleted = FALSE
+        """
+        
+        cursor.execute(check_query, (transaction_id, user_id))
+        existing_transaction = cursor.fetchone()
+        
+        if not existing_transaction:
+            return jsonify({
+                'status': 'error',
+                'message': 'Transaction not found or not owned by this user'
+            }), 404
+        
         # Use soft delete by setting is_deleted flag to TRUE
         query = """
         UPDATE transactions 
         SET is_deleted = TRUE, updated_at = NOW()
-        WHERE transaction_id = %s AND user_id = %s
+        WHERE transaction_id = %s AND user_id = %s AND is_deleted = FALSE
         """
         
         cursor.execute(query, (transaction_id, user_id))
         
-        # Check if any rows were affected
+        # Check if any rows were affected (a concurrent delete may have won)
         if cursor.rowcount == 0:
             return jsonify({
                 'status': 'error',
                 'message': 'Transaction not found or not owned by this user'
             }), 404
         
+        # Budget spend changes in the same database transaction
+        events = apply_spend_changes(cursor, user_id, spend_changes(previous=existing_transaction))
+        
         # Commit the change
         connection.commit()
         
+        # Keep the search and suggestion indexes current
+        _notify_transaction_change(user_id, transaction_id, previous=existing_transaction, events=events)
+        
         return jsonify({
             'status': 'success',
             'message': 'Transaction deleted successfully'
@@ -516,3 +894,163 @@ def delete_transaction(transaction_id):
         # Clean up resources
         close_connection(connection, cursor)
 
+
+
+@transactions_bp.route('/transactions/bulk', methods=['POST'])
+@idempotent
+def bulk_update_transactions():
+    """
+    Update or delete many transactions at once
+    Request Body:
+        user_id: UUID of the user
+        transaction_ids: IDs of the transactions (at most BULK_MAX_IDS)
+        patch: Fields to set on all of them (category_id and/or vendor_id), or
+        delete: true to delete them instead
+    Returns:
+        JSON: Number of transactions changed, and the IDs not found or not owned by the user
+    """
+    connection = None
+    cursor = None
+    
+    try:
+        # Get request data
+        data = with_session_user(request.json)
+        user_id = data.get('user_id')
+        transaction_ids = data.get('transaction_ids')
+        patch = data.get('patch')
+        delete = data.get('delete') is True
+        
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: user_id'
+            }), 400
+        
+        if (not isinstance(transaction_ids, list) or not transaction_ids
+                or not all(isinstance(transaction_id, str) for transaction_id in transaction_ids)):
+            return jsonify({
+                'status': 'error',
+                'message': 'transaction_ids must be a non-empty list of transaction IDs'
+            }), 400
+        
+        # Each ID once, in request order
+        transaction_ids = list(dict.fromkeys(transaction_ids))
+        if len(transaction_ids) > BULK_MAX_IDS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {BULK_MAX_IDS} transactions per request'
+            }), 400
+        
+        if delete == (patch is not None):
+            return jsonify({
+                'status': 'error',
+                'message': 'Provide either patch or delete: true'
+            }), 400
+        
+        fields = []
+        if not delete:
+            if not isinstance(patch, dict) or not patch or set(patch) - set(BULK_PATCH_FIELDS):
+                return jsonify({
+                    'status': 'error',
+                    'message': f'patch must set one or more of: {", ".join(BULK_PATCH_FIELDS)}'
+                }), 400
+            fields = [field for field in BULK_PATCH_FIELDS if field in patch]
+            try:
+                patch = {field: patch_value(field, patch[field]) for field in fields}
+            except ValueError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400
+        
+        if delete:
+            set_clause = 'is_deleted = TRUE'
+            set_params = ()
+        else:
+            set_clause = ', '.join(f'{field} = %s' for field in fields)
+            set_params = tuple(patch[field] for field in fields)
+        
+        # Connect to database
+        connection = get_db_connection(user_id=user_id)
+        cursor = connection.cursor(dictionary=True)
+        
+        if not delete:
+            error = unknown_reference(cursor, user_id, patch)
+            if error:
+                return jsonify({
+                    'status': 'error',
+                    'message': error
+                }), 400
+        
+        # One ownership check and one write per chunk, all in one database transaction.
+        # The check locks the rows, so no concurrent write can change them before
+        # the UPDATE (rowcount is not compared: MySQL counts changed rows only)
+        existing_transactions = []
+        for start in range(0, len(transaction_ids), BULK_CHUNK_SIZE):
+            chunk = transaction_ids[start:start + BULK_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"""
+            SELECT transaction_id, vendor_id, category_id, amount, transaction_date FROM transactions 
+            WHERE transaction_id IN ({placeholders}) AND user_id = %s AND is_deleted = FALSE
+            FOR UPDATE
+            """, (*chunk, user_id))
+            owned = cursor.fetchall()
+            if not owned:
+                continue
+            
+            owned_ids = [row['transaction_id'] for row in owned]
+            placeholders = ', '.join(['%s'] * len(owned_ids))
+            cursor.execute(f"""
+            UPDATE transactions 
+            SET {set_clause}, updated_at = NOW()
+            WHERE transaction_id IN ({placeholders}) AND user_id = %s AND is_deleted = FALSE
+            """, (*set_params, *owned_ids, user_id))
+            existing_transactions.extend(owned)
+        
+        # Budget spend changes in the same database transaction (netted per budget period)
+        changes = []
+        for existing_transaction in existing_transactions:
+            current = None if delete else dict(existing_transaction, **{field: patch[field] for field in fields})
+            changes.extend(spend_changes(current=current, previous=existing_transaction))
+        events = apply_spend_changes(cursor, user_id, changes)
+        
+        connection.commit()
+        
+        # Get the updated transactions for the search index
+        updated_transactions = {}
+        if not delete:
+            changed_ids = [row['transaction_id'] for row in existing_transactions]
+            for start in range(0, len(changed_ids), BULK_CHUNK_SIZE):
+                chunk = changed_ids[start:start + BULK_CHUNK_SIZE]
+                for row in fetch_all(connection, user_transactions_by_ids(len(chunk)), (*chunk, user_id)):
+                    updated_transactions[row['transaction_id']] = to_json(row)
+        
+        # Keep the search and suggestion indexes current; streams get one event for the batch
+        change_event = (TRANSACTIONS_CHANGED, {
+            'user_id': user_id, 'action': 'deleted' if delete else 'updated', 'count': len(existing_transactions)
+        })
+        notify_transaction_changes(user_id, [
+            (row['transaction_id'], updated_transactions.get(row['transaction_id']), row)
+            for row in existing_transactions
+        ], events=[change_event, *events] if existing_transactions else events)
+        
+        found = {row['transaction_id'] for row in existing_transactions}
+        return jsonify({
+            'status': 'success',
+            'message': f"{len(found)} transactions {'deleted' if delete else 'updated'} successfully",
+            'data': {
+                'affected': len(found),
+                'not_found': [transaction_id for transaction_id in transaction_ids if transaction_id not in found]
+            }
+        })
+        
+    except Exception as e:
+        print(f"Error in bulk_update_transactions: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+    
+    finally:
+        # Clean up resources
+        close_connection(connection, cursor)
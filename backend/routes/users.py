@@ -5,6 +5,14 @@ import uuid
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from utils.db import get_db_connection, close_connection
+from utils.auth import (
+    CredentialError,
+    current_session,
+    google_client_id,
+    issue_session_token,
+    profile_fingerprint,
+    verify_google_credential,
+)
 
 # Create blueprint without url_prefix (will be set in main.py)
 users_bp = Blueprint('users', __name__)
@@ -14,8 +22,13 @@ def check_user():
     """
     Check if user exists in database and return UUID
     If user doesn't exist, create new user with UUID
+    The profile comes from the Google credential in the body, verified before
+    any session token is issued (see utils/auth.py); without GOOGLE_CLIENT_ID
+    the body's email, name and picture are trusted and no token is issued.
+    A valid session token for the same, unchanged profile is answered
+    without touching the database
     Returns:
-        JSON: User ID and status
+        JSON: User ID, session token and status (401 for an invalid credential)
     """
     connection = None
     cursor = None
@@ -30,10 +43,30 @@ def check_user():
                 'message': 'Missing required user data'
             }), 400
         
-        # Extract user data
-        email = data['email']
-        name = data['name']
-        picture = data.get('picture', '')  # Optional
+        # Known session with the same profile: nothing to look up or write
+        session = current_session()
+        if session and session['email'] == data['email'] and \
+                session['fp'] == profile_fingerprint(data['name'], data.get('picture', '')):
+            return jsonify({
+                'status': 'success',
+                'user_id': session['uid'],
+                'session_token': request.headers['Authorization'][7:].strip()
+            })
+        
+        # Extract user data, from the verified credential when sign-in is configured
+        if google_client_id():
+            try:
+                profile = verify_google_credential(data.get('credential'))
+            except CredentialError as e:
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 401
+        else:
+            profile = data
+        email = profile['email']
+        name = profile.get('name') or email
+        picture = profile.get('picture', '')  # Optional
         
         # Connect to database
         connection = get_db_connection()
@@ -41,39 +74,47 @@ def check_user():
         
         # Check if user exists
         cursor.execute(
-            "SELECT user_id FROM users WHERE email = %s",
+            "SELECT user_id, name, picture FROM users WHERE email = %s",
             (email,)
         )
         user = cursor.fetchone()
         
-        # Get current timestamp
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if user:
-            # User exists, return the UUID
+        if user and user['name'] == name and (user['picture'] or '') == (picture or ''):
+            # Profile unchanged: skip the write entirely
             user_id = user['user_id']
-            
-            # Update user information (in case anything changed)
-            cursor.execute(
-                "UPDATE users SET name = %s, picture = %s, updated_at = %s WHERE user_id = %s",
-                (name, picture, current_time, user_id)
-            )
         else:
-            # User doesn't exist, create new user with UUID
-            user_id = str(uuid.uuid4())
+            # New user or changed profile: a single upsert keyed by the unique email
+            user_id = user['user_id'] if user else str(uuid.uuid4())
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
             cursor.execute(
-                "INSERT INTO users (user_id, name, email, picture, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s)",
+                """
+                INSERT INTO users (user_id, name, email, picture, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    name = VALUES(name),
+                    picture = VALUES(picture),
+                    updated_at = VALUES(updated_at)
+                """,
                 (user_id, name, email, picture, current_time, current_time)
             )
+            # Keep this user's next reads on the primary (read-your-writes)
+            connection.user_id = user_id
+            connection.commit()
+            
+            if not user and cursor.rowcount != 1:
+                # Another request created the user concurrently: use its ID
+                cursor.execute(
+                    "SELECT user_id FROM users WHERE email = %s",
+                    (email,)
+                )
+                user_id = cursor.fetchone()['user_id']
         
-        # Commit changes
-        connection.commit()
-        
-        # Return success with user_id
+        # Return success with user_id and a session token for later requests
         return jsonify({
             'status': 'success',
-            'user_id': user_id
+            'user_id': user_id,
+            'session_token': issue_session_token(user_id, email, name, picture)
         })
         
     except Exception as e:
@@ -101,7 +142,7 @@ def get_user(user_id):
     
     try:
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(readonly=True, user_id=user_id)
         cursor = connection.cursor(dictionary=True)
         
         # Get user data
@@ -3,12 +3,22 @@ Vendor-related routes for Menuda Finance API
 """
 from flask import Blueprint, request, jsonify
 from utils.db import get_db_connection, close_connection
+from utils.auth import current_user_id, with_session_user
+from utils.singleflight import coalesce
+from utils.suggestions import suggestion_indexes
+from utils.idempotency import idempotent
+from utils.queries import USER_VENDORS, VENDOR_BY_ID, fetch_all, fetch_one, to_json
 import uuid
 
+# Default and maximum suggestions of each kind
+SUGGESTIONS_DEFAULT_LIMIT = 5
+SUGGESTIONS_MAX_LIMIT = 20
+
 # Create blueprint without url_prefix (will be set in main.py)
 vendors_bp = Blueprint('vendors', __name__)
 
 @vendors_bp.route('/vendors', methods=['GET'])
+@coalesce('vendors')
 def get_vendors():
     """
     Get user vendors
@@ -22,7 +32,7 @@ def get_vendors():
     
     try:
         # Get query parameters
-        user_id = request.args.get('user_id')
+        user_id = current_user_id(request.args.get('user_id'))
         
         if not user_id:
             return jsonify({
@@ -31,37 +41,10 @@ def get_vendors():
             }), 400
         
         # Connect to database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        connection = get_db_connection(readonly=True, user_id=user_id)
         
         # Get vendors with category details
-        query = """
-        SELECT 
-            v.vendor_id,
-            v.vendor_name,
-            v.category_id,
-            c.category_name,
-            v.created_at,
-            v.updated_at
-        FROM 
-            vendors v
-            JOIN categories c ON v.category_id = c.category_id
-        WHERE 
-            v.user_id = %s
-            AND v.is_active = TRUE
-        ORDER BY 
-            v.vendor_name
-        """
-        
-        cursor.execute(query, (user_id,))
-        vendors = cursor.fetchall()
-        
-        # Format dates for JSON serialization
-        for vendor in vendors:
-            if 'created_at' in vendor and vendor['created_at']:
-                vendor['created_at'] = vendor['created_at'].isoformat()
-            if 'updated_at' in vendor and vendor['updated_at']:
-                vendor['updated_at'] = vendor['updated_at'].isoformat()
+        vendors = [to_json(vendor) for vendor in fetch_all(connection, USER_VENDORS, (user_id,))]
         
         return jsonify({
             'status': 'success',
@@ -80,7 +63,55 @@ def get_vendors():
         # Clean up resources
         close_connection(connection, cursor)
 
+@vendors_bp.route('/vendors/suggestions', methods=['GET'])
+def get_vendor_suggestions():
+    """
+    Suggest vendors and categories while the user types a vendor name
+    Query Parameters:
+        user_id: UUID of the user
+        q: Vendor name typed so far (optional)
+        vendor_id: Vendor already selected (optional)
+        limit: Maximum suggestions of each kind (default 5, max 20)
+    Returns:
+        JSON: Matching vendors and categories ranked by past usage
+    """
+    try:
+        # Get query parameters
+        user_id = current_user_id(request.args.get('user_id'))
+        query_text = request.args.get('q', '').strip()
+        vendor_id = request.args.get('vendor_id') or None
+        limit = request.args.get('limit', SUGGESTIONS_DEFAULT_LIMIT, type=int)
+        
+        if not user_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required parameter: user_id'
+            }), 400
+        
+        if limit < 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'limit must be a positive integer'
+            }), 400
+        limit = min(limit, SUGGESTIONS_MAX_LIMIT)
+        
+        # Answered from memory; the index is built from the database on first use
+        index = suggestion_indexes.get(user_id)
+        
+        return jsonify({
+            'status': 'success',
+            'data': index.suggest(query=query_text, vendor_id=vendor_id, limit=limit)
+        })
+        
+    except Exception as e:
+        print(f"Error in get_vendor_suggestions: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Server error occurred'
+        }), 500
+
 @vendors_bp.route('/vendors', methods=['POST'])
+@idempotent
 def create_vendor():
     """
     Create a new vendor
@@ -94,7 +125,7 @@ def create_vendor():
     
     try:
         # Get request data
-        data = request.json
+        data = with_session_user(request.json)
         
         # Validate required fields
         required_fields = ['user_id', 'vendor_name', 'category_id']
@@ -106,7 +137,7 @@ def create_vendor():
                 }), 400
         
         # Connect to database
-        connection = get_db_connection()
+        connection = get_db_connection(user_id=data['user_id'])
         cursor = connection.cursor(dictionary=True)
         
         # Check if vendor already exists
@@ -130,29 +161,13 @@ def create_vendor():
             connection.commit()
             
             # Return the updated vendor
-            get_query = """
-            SELECT 
-                v.vendor_id,
-                v.vendor_name,
-                v.category_id,
-                c.category_name,
-                v.created_at,
-                v.updated_at
-            FROM 
-                vendors v
-                JOIN categories c ON v.category_id = c.category_id
-            WHERE 
-                v.vendor_id = %s
-            """
+            vendor = fetch_one(connection, VENDOR_BY_ID, (existing_vendor['vendor_id'],))
             
-            cursor.execute(get_query, (existing_vendor['vendor_id'],))
-            vendor = cursor.fetchone()
+            # Keep the suggestion index current
+            suggestion_indexes.set_vendor(data['user_id'], vendor['vendor_id'], vendor['vendor_name'], vendor['category_id'])
             
             # Format dates
-            if 'created_at' in vendor and vendor['created_at']:
-                vendor['created_at'] = vendor['created_at'].isoformat()
-            if 'updated_at' in vendor and vendor['updated_at']:
-                vendor['updated_at'] = vendor['updated_at'].isoformat()
+            to_json(vendor)
             
             return jsonify({
                 'status': 'success',
@@ -181,29 +196,13 @@ def create_vendor():
         connection.commit()
         
         # Get the newly created vendor
-        get_query = """
-        SELECT 
-            v.vendor_id,
-            v.vendor_name,
-            v.category_id,
-            c.category_name,
-            v.created_at,
-            v.updated_at
-        FROM 
-            vendors v
-            JOIN categories c ON v.category_id = c.category_id
-        WHERE 
-            v.vendor_id = %s
-        """
+        new_vendor = fetch_one(connection, VENDOR_BY_ID, (vendor_id,))
         
-        cursor.execute(get_query, (vendor_id,))
-        new_vendor = cursor.fetchone()
+        # Keep the suggestion index current
+        suggestion_indexes.set_vendor(data['user_id'], vendor_id, new_vendor['vendor_name'], new_vendor['category_id'])
         
         # Format dates
-        if 'created_at' in new_vendor and new_vendor['created_at']:
-            new_vendor['created_at'] = new_vendor['created_at'].isoformat()
-        if 'updated_at' in new_vendor and new_vendor['updated_at']:
-            new_vendor['updated_at'] = new_vendor['updated_at'].isoformat()
+        to_json(new_vendor)
         
         return jsonify({
             'status': 'success',
@@ -0,0 +1,114 @@
+"""
+Transaction archival job for Menuda Finance
+
+run       Archive long-deleted transactions (and cold years when
+          --keep-years is set), then add the coming years' partitions
+schedule  Do the same every --interval seconds
+
+See utils/archive.py. Run one schedule process per deployment (or call run
+from cron).
+
+Usage (from the backend directory):
+    python -m scripts.archive_transactions run [--deleted-days 30] [--keep-years 0]
+    python -m scripts.archive_transactions schedule [--interval 86400]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from utils.archive import add_year_partitions, archive_before, archive_deleted
+from utils.db import get_db_connection, close_connection
+
+# Days a deleted transaction stays in transactions before it is archived
+DEFAULT_DELETED_DAYS = int(os.environ.get('ARCHIVE_DELETED_DAYS', 30))
+
+# Years kept in transactions (the current one included); older ones are
+# archived. 0 never archives live transactions
+DEFAULT_KEEP_YEARS = int(os.environ.get('ARCHIVE_KEEP_YEARS', 0))
+
+# Rows moved per transaction
+DEFAULT_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+
+# Years ahead that already have a partition
+DEFAULT_PARTITION_YEARS_AHEAD = int(os.environ.get('ARCHIVE_PARTITION_YEARS_AHEAD', 1))
+
+# Seconds between scheduler runs
+DEFAULT_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 86400))
+
+
+def run_archive(deleted_days, keep_years, batch_size, partition_years_ahead):
+    """
+    Archive old rows and add the coming years' partitions
+    Args:
+        deleted_days (int): Days a deleted transaction is kept
+        keep_years (int): Years of transactions kept (0: keep all)
+        batch_size (int): Rows per transaction
+        partition_years_ahead (int): Years ahead that must have a partition
+    Returns:
+        tuple: (deleted rows archived, cold rows archived, partitions added)
+    """
+    connection = get_db_connection()
+    try:
+        today = datetime.date.today()
+        deleted_before = datetime.datetime.now() - datetime.timedelta(days=deleted_days)
+        deleted = archive_deleted(connection, deleted_before, batch_size)
+
+        cold = 0
+        if keep_years > 0:
+            cold = archive_before(connection, datetime.date(today.year - keep_years + 1, 1, 1), batch_size)
+
+        partitions = add_year_partitions(connection, today.year + partition_years_ahead)
+        return deleted, cold, partitions
+    finally:
+        close_connection(connection)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status
+    """
+    parser = argparse.ArgumentParser(description='Transaction archival job')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Archive old transactions once')
+    schedule_parser = subparsers.add_parser('schedule', help='Archive old transactions periodically')
+    schedule_parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL,
+                                 help='Seconds between runs')
+    for command_parser in (run_parser, schedule_parser):
+        command_parser.add_argument('--deleted-days', type=int, default=DEFAULT_DELETED_DAYS,
+                                    help='Archive transactions deleted more than this many days ago')
+        command_parser.add_argument('--keep-years', type=int, default=DEFAULT_KEEP_YEARS,
+                                    help='Archive transactions older than this many years (0: never)')
+        command_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                                    help='Rows moved per transaction')
+        command_parser.add_argument('--partition-years-ahead', type=int, default=DEFAULT_PARTITION_YEARS_AHEAD,
+                                    help='Years ahead that must have a partition')
+
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    while True:
+        started = time.monotonic()
+        try:
+            deleted, cold, partitions = run_archive(
+                args.deleted_days, args.keep_years, args.batch_size, args.partition_years_ahead
+            )
+            print(f"Archived {deleted} deleted and {cold} cold transactions, "
+                  f"added partitions: {', '.join(partitions) or 'none'}")
+        except Exception as e:
+            if args.command == 'run':
+                raise
+            print(f"Error in archive schedule: {e}")
+        if args.command == 'run':
+            return 0
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
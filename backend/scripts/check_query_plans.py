@@ -0,0 +1,344 @@
+"""
+Query plan check for Menuda Finance
+
+Migrates and seeds a database, sends a request to every route (and runs the
+recurring and archival jobs) while recording each distinct statement, then
+EXPLAINs the SELECT/UPDATE/DELETE statements with the parameters they ran
+with. Exits with status 1 if any of them reads a whole table: SQLite 'SCAN <table>', or
+MySQL access type ALL (table scan) or index (full index scan).
+
+Usage (from the backend directory):
+    python -m scripts.check_query_plans
+    python -m scripts.check_query_plans --backend mysql --transactions 5000
+
+--backend mysql migrates and seeds the DB_HOST/DB_USER/DB_PASSWORD/DB_NAME
+database: point it at an empty, dedicated one.
+"""
+import argparse
+import datetime
+import io
+import os
+import re
+import sys
+import tempfile
+import uuid
+from flask import has_request_context, request
+from dotenv import load_dotenv
+
+from benchmarks.dataset import seed_dataset
+from benchmarks.standins import LocalS3Client, SQLiteConnection, create_sqlite_database, translate
+
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+# SQLite plan rows that read every row of a table ('SCAN t', 'SCAN t USING
+# INDEX i'); SEARCH rows use an index to find the matching rows
+_SQLITE_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)')
+
+# MySQL access types that read the whole table or a whole index
+_MYSQL_FULL_SCANS = ('ALL', 'index')
+
+
+class RecordingCursor:
+    """
+    Cursor wrapper that records every statement it executes
+    """
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        """Record and execute a statement"""
+        key = _WHITESPACE.sub(' ', operation).strip()
+        if key not in self._statements:
+            source = request.endpoint if has_request_context() else 'job'
+            self._statements[key] = (source, operation, params)
+        return self._cursor.execute(operation, params, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RecordingConnection:
+    """
+    Connection wrapper that hands out recording cursors
+    """
+    def __init__(self, connection, statements):
+        self._connection = connection
+        self._statements = statements
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._connection.cursor(*args, **kwargs), self._statements)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def sqlite_full_scans(connection, statement, params):
+    """
+    EXPLAIN a statement on the SQLite stand-in
+    Args:
+        connection (SQLiteConnection): Stand-in connection
+        statement (str): MySQL-style statement
+        params: Parameters it ran with
+    Returns:
+        tuple: (plan lines, plan lines that scan a whole table)
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, params)
+        plan = [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    return plan, [line for line in plan if _SQLITE_SCAN.match(line)]
+
+
+def mysql_full_scans(connection, statement, params):
+    """
+    EXPLAIN a statement on MySQL
+    Args:
+        connection: MySQL connection
+        statement (str): Statement
+        params: Parameters it ran with
+    Returns:
+        tuple: (plan lines, plan lines that scan a whole table)
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute('EXPLAIN ' + statement, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    plan, scans = [], []
+    for row in rows:
+        line = f"{row.get('table')}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} {row.get('Extra') or ''}".strip()
+        plan.append(line)
+        # Derived tables (<derived2>) and table-less steps have no index to use
+        table = row.get('table') or ''
+        if row.get('type') in _MYSQL_FULL_SCANS and not table.startswith('<'):
+            scans.append(line)
+    return plan, scans
+
+
+def exercise_routes(app, dataset):
+    """
+    Send one request to every route that queries the database
+    Args:
+        app: Flask application
+        dataset (Dataset): Seeded identifiers
+    Returns:
+        list: (method, path, status) of requests that did not succeed
+    """
+    user = dataset.users[0]
+    user_id = user['user_id']
+    category_id = dataset.categories[user_id][0]
+    vendor_id = dataset.vendors[user_id][0]
+    transaction_id = dataset.transactions[user_id][0]
+    on_date = datetime.date(2024, 12, 15).isoformat()
+    transaction = {
+        'user_id': user_id,
+        'title': 'Plan check',
+        'amount': 12500,
+        'transaction_date': on_date,
+        'category_id': category_id,
+        'vendor_id': vendor_id,
+    }
+
+    failures = []
+    client = app.test_client()
+
+    def send(method, path, **kwargs):
+        response = client.open(path, method=method, **kwargs)
+        if response.status_code >= 400:
+            failures.append((method, path, response.status_code))
+        return response.get_json(silent=True) or {}
+
+    send('POST', '/api/users/check', json={'email': user['email'], 'name': user['name'], 'picture': ''})
+    send('GET', f'/api/users/{user_id}')
+
+    send('GET', f'/api/categories?user_id={user_id}')
+    send('POST', '/api/categories', json={'user_id': user_id, 'category_name': 'Plan check'})
+    send('GET', f'/api/vendors?user_id={user_id}')
+    send('POST', '/api/vendors', json={'user_id': user_id, 'vendor_name': 'Plan check', 'category_id': category_id})
+    send('GET', f'/api/vendors/suggestions?user_id={user_id}&q=ub')
+
+    send('GET', f'/api/transactions?user_id={user_id}')
+    send('GET', f'/api/transactions?user_id={user_id}&from_date=2024-10-01&to_date={on_date}')
+    send('GET', f'/api/transactions?user_id={user_id}&archived=true')
+    send('GET', f'/api/transactions/{transaction_id}?user_id={user_id}')
+    send('GET', f'/api/transactions/search?user_id={user_id}&q=uber')
+    send('GET', f'/api/transactions/forecast?user_id={user_id}&date={on_date}')
+
+    budget = send('POST', '/api/budgets', json={'user_id': user_id, 'category_id': category_id, 'limit_amount': 500000})
+    send('GET', f'/api/budgets?user_id={user_id}')
+    send('GET', f'/api/budgets/status?user_id={user_id}&date={on_date}')
+
+    created = send('POST', '/api/transactions', json=transaction)
+    new_id = (created.get('data') or {}).get('transaction_id', transaction_id)
+    updated = send('PUT', f'/api/transactions/{new_id}', json=dict(transaction, amount=13500))
+    send('PATCH', f'/api/transactions/{new_id}', json={
+        'user_id': user_id, 'updated_at': (updated.get('data') or {}).get('updated_at'), 'amount': 14500,
+    })
+    send('POST', '/api/transactions/bulk', json={
+        'user_id': user_id, 'transaction_ids': [new_id, transaction_id], 'patch': {'category_id': category_id},
+    })
+    send('DELETE', f'/api/transactions/{new_id}?user_id={user_id}')
+    created = send('POST', '/api/transactions', json=transaction)
+    new_id = (created.get('data') or {}).get('transaction_id', transaction_id)
+    send('POST', '/api/transactions/bulk', json={'user_id': user_id, 'transaction_ids': [new_id], 'delete': True})
+
+    # Offline replay: creates with client IDs, then an update and a delete of the new transaction
+    sync_ids = [str(uuid.uuid4()) for _ in range(3)]
+    fields = {key: value for key, value in transaction.items() if key != 'user_id'}
+    pushed = send('POST', '/api/sync/push', json={'user_id': user_id, 'operations': [
+        {'op_id': 1, 'entity': 'category', 'action': 'create', 'id': sync_ids[0], 'data': {'category_name': 'Sync'}},
+        {'op_id': 2, 'entity': 'vendor', 'action': 'create', 'id': sync_ids[1],
+         'data': {'vendor_name': 'Sync', 'category_id': sync_ids[0]}},
+        {'op_id': 3, 'entity': 'transaction', 'action': 'create', 'id': sync_ids[2],
+         'data': dict(fields, category_id=sync_ids[0], vendor_id=sync_ids[1])},
+    ]})
+    synced_at = ((pushed.get('data') or [{}])[-1]).get('updated_at')
+    send('POST', '/api/sync/push', json={'user_id': user_id, 'operations': [
+        {'op_id': 4, 'entity': 'vendor', 'action': 'update', 'id': sync_ids[1], 'base_updated_at': synced_at,
+         'data': {'vendor_name': 'Sync renamed'}},
+        {'op_id': 5, 'entity': 'transaction', 'action': 'delete', 'id': sync_ids[2], 'base_updated_at': synced_at},
+    ]})
+
+    budget_id = (budget.get('data') or {}).get('budget_id')
+    if budget_id:
+        send('DELETE', f'/api/budgets/{budget_id}?user_id={user_id}')
+
+    send('GET', f'/api/recurring?user_id={user_id}')
+    send('POST', '/api/attachments/upload', data={
+        'user_id': user_id,
+        'file': (io.BytesIO(b'\xff\xd8\xff' + b'0' * 1024), 'receipt.jpg', 'image/jpeg'),
+    }, content_type='multipart/form-data')
+    return failures
+
+
+def run_jobs(dataset):
+    """
+    Run the recurring detect and materialize jobs and the deleted-row
+    archival once (the cold-year archival reads whole partitions by design)
+    Args:
+        dataset (Dataset): Seeded identifiers
+    """
+    from utils.archive import archive_deleted
+    from utils.db import get_db_connection, close_connection
+    from utils.recurring import detect_for_user, materialize_due
+
+    today = datetime.date(2025, 1, 1)
+    connection = get_db_connection()
+    try:
+        detect_for_user(connection, dataset.users[0]['user_id'], today=today)
+        materialize_due(connection, today - datetime.timedelta(days=3), today + datetime.timedelta(days=7))
+        # Includes the transaction exercise_routes deleted
+        archive_deleted(connection, datetime.datetime.now() + datetime.timedelta(days=1))
+    finally:
+        close_connection(connection)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status (1 when a statement scans a whole table)
+    """
+    parser = argparse.ArgumentParser(description='Fail if a route query scans a whole table')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help='Database to check (mysql uses DB_* variables; use an empty, dedicated database)')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=2000, help='Transactions per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='Print every plan, not only failures')
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    from utils.db import set_connection_factory
+    from utils.s3 import set_client_factory
+
+    # One request per route: nothing here should be rate limited
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    os.environ.setdefault('S3_BUCKET_NAME', 'menuda-plan-check')
+
+    statements = {}
+    with tempfile.TemporaryDirectory(prefix='menuda-plans-') as workdir:
+        set_client_factory(lambda: LocalS3Client(os.path.join(workdir, 's3')))
+
+        if args.backend == 'sqlite':
+            db_path = os.path.join(workdir, 'plans.sqlite3')
+            create_sqlite_database(db_path)
+            open_connection = lambda: SQLiteConnection(db_path)
+            explain = lambda connection, statement, params: sqlite_full_scans(connection, translate(statement), params)
+        else:
+            import mysql.connector
+            from utils.migrations import migrate
+            config = {
+                'host': os.getenv('DB_HOST'),
+                'user': os.getenv('DB_USER'),
+                'password': os.getenv('DB_PASSWORD'),
+                'database': os.getenv('DB_NAME', 'menuda_finance'),
+            }
+            open_connection = lambda: mysql.connector.connect(**config)
+            connection = open_connection()
+            try:
+                migrate(connection)
+            finally:
+                connection.close()
+            explain = mysql_full_scans
+
+        print(f"Seeding {args.backend} dataset...")
+        connection = open_connection()
+        try:
+            dataset = seed_dataset(connection, users=args.users, transactions_per_user=args.transactions, seed=args.seed)
+            # Fresh statistics, as a long-running database would have
+            cursor = connection.cursor()
+            if args.backend == 'sqlite':
+                cursor.execute('ANALYZE')
+            else:
+                for table in ('users', 'categories', 'vendors', 'transactions'):
+                    cursor.execute(f'ANALYZE TABLE {table}')
+                    cursor.fetchall()
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+
+        set_connection_factory(lambda: RecordingConnection(open_connection(), statements))
+
+        from main import create_app
+        failures = exercise_routes(create_app(), dataset)
+        run_jobs(dataset)
+        set_connection_factory(None)
+
+        for method, path, status in failures:
+            print(f"Request failed ({status}): {method} {path}")
+
+        scanning = 0
+        connection = open_connection()
+        try:
+            for key, (source, statement, params) in statements.items():
+                if key.split(' ', 1)[0].upper() not in _EXPLAINED:
+                    continue
+                plan, scans = explain(connection, statement, params)
+                if scans:
+                    scanning += 1
+                if scans or args.verbose:
+                    print(f"{'FULL SCAN' if scans else 'ok'} [{source}] {key[:160]}")
+                    for line in plan:
+                        print(f"    {line}")
+        finally:
+            connection.close()
+
+    checked = sum(1 for key in statements if key.split(' ', 1)[0].upper() in _EXPLAINED)
+    print(f"{checked} statements checked, {scanning} with full scans, {len(failures)} failed requests")
+    return 1 if scanning or failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
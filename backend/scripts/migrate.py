@@ -0,0 +1,80 @@
+"""
+Schema migrations for Menuda Finance
+
+status  List every migration and whether it has been applied
+up      Apply the pending migrations (all, or up to --target)
+
+Uses the DB_HOST/DB_USER/DB_PASSWORD/DB_NAME database. Run up once per
+deployment, before the new code starts serving; see utils/migrations.py.
+
+Usage (from the backend directory):
+    python -m scripts.migrate status
+    python -m scripts.migrate up [--target 6]
+"""
+import argparse
+import sys
+from dotenv import load_dotenv
+from utils.db import get_db_connection, close_connection
+from utils.migrations import MigrationError, applied_migrations, load_migrations, migrate
+
+
+def show_status(connection):
+    """
+    Print every migration and whether it has been applied
+    Args:
+        connection: Database connection
+    Returns:
+        int: Number of pending migrations
+    """
+    applied = applied_migrations(connection)
+    pending = 0
+    for migration in load_migrations():
+        checksum = applied.get(migration.version)
+        if checksum is None:
+            state = 'pending'
+            pending += 1
+        elif checksum != migration.checksum:
+            state = 'applied (file changed since)'
+        else:
+            state = 'applied'
+        print(f"{migration.version:04d} {migration.name}: {state}")
+    return pending
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status
+    """
+    parser = argparse.ArgumentParser(description='Schema migrations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('status', help='List migrations and whether they are applied')
+
+    up_parser = subparsers.add_parser('up', help='Apply pending migrations')
+    up_parser.add_argument('--target', type=int, help='Stop after this version')
+
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    connection = get_db_connection()
+    try:
+        if args.command == 'status':
+            print(f"{show_status(connection)} pending")
+            return 0
+
+        for migration in migrate(connection, target=args.target):
+            print(f"Applied {migration.version:04d} {migration.name}")
+        return 0
+    except MigrationError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        close_connection(connection)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Precompress static frontend assets for Menuda Finance
+
+Reads the asset list from frontend/service-worker.js (urlsToCache) and writes
+a .gz (and .br when brotli is installed) file next to each asset, so the
+static file server can send precompressed files instead of compressing on
+every request (e.g. nginx `gzip_static on;` / `brotli_static on;`).
+
+Usage:
+    python scripts/precompress_static.py [--root PATH] [--min-size BYTES] [--check]
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+
+try:
+    import brotli
+except ImportError:  # brotli output is skipped when the package is missing
+    brotli = None
+
+# Repository root (backend/scripts/ -> repo root)
+DEFAULT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Assets smaller than this rarely benefit from compression
+DEFAULT_MIN_SIZE = 512
+
+
+def read_cached_urls(root):
+    """
+    Extract the urlsToCache list from the service worker
+    Args:
+        root (str): Repository root
+    Returns:
+        list: URL paths listed in the service worker
+    """
+    service_worker_path = os.path.join(root, 'frontend', 'service-worker.js')
+    with open(service_worker_path, 'r', encoding='utf-8') as service_worker:
+        source = service_worker.read()
+
+    match = re.search(r'urlsToCache\s*=\s*\[(.*?)\]', source, re.DOTALL)
+    if not match:
+        raise ValueError('urlsToCache not found in service-worker.js')
+
+    return re.findall(r"['\"]([^'\"]+)['\"]", match.group(1))
+
+
+def url_to_path(root, url):
+    """
+    Map a service worker URL to a file on disk
+    Args:
+        root (str): Repository root
+        url (str): URL path (e.g. '/frontend/home.html')
+    Returns:
+        str: Absolute file path
+    """
+    relative = url.lstrip('/') or 'index.html'
+    return os.path.join(root, relative)
+
+
+def precompress_file(path, min_size, check_only=False):
+    """
+    Write compressed variants of a single file
+    Args:
+        path (str): File to compress
+        min_size (int): Skip files smaller than this many bytes
+        check_only (bool): Only report whether compressed files are up to date
+    Returns:
+        list: Paths of compressed files written (or stale, in check mode)
+    """
+    with open(path, 'rb') as source:
+        data = source.read()
+
+    if len(data) < min_size:
+        return []
+
+    variants = {
+        # mtime=0 keeps the output byte-for-byte reproducible across builds
+        path + '.gz': gzip.compress(data, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants[path + '.br'] = brotli.compress(data, quality=11)
+
+    written = []
+    for target, compressed in variants.items():
+        # Only keep variants that are actually smaller than the original
+        if len(compressed) >= len(data):
+            continue
+
+        if os.path.exists(target):
+            with open(target, 'rb') as existing:
+                if existing.read() == compressed:
+                    continue
+
+        written.append(target)
+        if not check_only:
+            with open(target, 'wb') as output:
+                output.write(compressed)
+
+    return written
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Command line arguments (defaults to sys.argv)
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(description='Precompress static frontend assets')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='Repository root')
+    parser.add_argument('--min-size', type=int, default=DEFAULT_MIN_SIZE,
+                        help='Skip files smaller than this many bytes')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with status 1 if any compressed file is missing or stale')
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print('brotli not installed, writing gzip variants only')
+
+    stale = []
+    for url in read_cached_urls(args.root):
+        path = url_to_path(args.root, url)
+        if not os.path.isfile(path):
+            print(f'Skipping missing asset: {url}')
+            continue
+
+        for target in precompress_file(path, args.min_size, check_only=args.check):
+            stale.append(target)
+            action = 'Stale' if args.check else 'Wrote'
+            print(f'{action}: {os.path.relpath(target, args.root)}')
+
+    if args.check and stale:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
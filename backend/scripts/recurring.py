@@ -0,0 +1,140 @@
+"""
+Recurring transaction jobs for Menuda Finance
+
+detect       Scan users' transactions and store the recurring series found
+materialize  Create the occurrences due up to today + horizon, in bulk
+schedule     Run detect and materialize every --interval seconds
+
+Run one schedule process per deployment (or call detect/materialize from
+cron); overlapping materialize runs are rejected by the unique
+(series_id, occurrence_date) key in recurring_occurrences.
+
+Usage (from the backend directory):
+    python -m scripts.recurring detect [--user-id ID]
+    python -m scripts.recurring materialize [--horizon-days 7]
+    python -m scripts.recurring schedule [--interval 3600] [--horizon-days 7]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from utils.db import get_db_connection, close_connection
+from utils.recurring import detect_for_user, materialize_due
+
+# Days ahead for which upcoming occurrences are created
+DEFAULT_HORIZON_DAYS = int(os.environ.get('RECURRING_HORIZON_DAYS', 7))
+
+# Days back that missed occurrences are still created (e.g. scheduler downtime)
+DEFAULT_CATCH_UP_DAYS = int(os.environ.get('RECURRING_CATCH_UP_DAYS', 3))
+
+# Seconds between scheduler runs
+DEFAULT_INTERVAL = int(os.environ.get('RECURRING_INTERVAL', 3600))
+
+
+def user_ids(connection):
+    """
+    List every user ID
+    Args:
+        connection: Database connection
+    Returns:
+        list: User IDs
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT user_id FROM users")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def run_detect(user_id=None):
+    """
+    Detect recurring series for one user or all users
+    Args:
+        user_id (str): Only this user (optional)
+    Returns:
+        int: Number of active series stored
+    """
+    connection = get_db_connection()
+    try:
+        total = 0
+        for current in ([user_id] if user_id else user_ids(connection)):
+            try:
+                total += len(detect_for_user(connection, current))
+            except Exception as e:
+                connection.rollback()
+                print(f"Error detecting recurring series for {current}: {e}")
+        return total
+    finally:
+        close_connection(connection)
+
+
+def run_materialize(horizon_days, catch_up_days=DEFAULT_CATCH_UP_DAYS):
+    """
+    Create the occurrences due up to today + horizon
+    Args:
+        horizon_days (int): Days ahead to materialize
+        catch_up_days (int): Days back that missed occurrences are still created
+    Returns:
+        int: Number of transactions created
+    """
+    connection = get_db_connection()
+    try:
+        today = datetime.date.today()
+        since = today - datetime.timedelta(days=catch_up_days)
+        until = today + datetime.timedelta(days=horizon_days)
+        return materialize_due(connection, since, until)
+    finally:
+        close_connection(connection)
+
+
+def main(argv=None):
+    """
+    Command line entry point
+    Args:
+        argv (list): Arguments (defaults to sys.argv)
+    Returns:
+        int: Exit status
+    """
+    parser = argparse.ArgumentParser(description='Recurring transaction jobs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    detect_parser = subparsers.add_parser('detect', help='Detect and store recurring series')
+    detect_parser.add_argument('--user-id', help='Only scan this user')
+
+    materialize_parser = subparsers.add_parser('materialize', help='Create due occurrences')
+    materialize_parser.add_argument('--horizon-days', type=int, default=DEFAULT_HORIZON_DAYS,
+                                    help='Create occurrences up to this many days ahead')
+
+    schedule_parser = subparsers.add_parser('schedule', help='Run detect and materialize periodically')
+    schedule_parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL,
+                                 help='Seconds between runs')
+    schedule_parser.add_argument('--horizon-days', type=int, default=DEFAULT_HORIZON_DAYS,
+                                 help='Create occurrences up to this many days ahead')
+
+    args = parser.parse_args(argv)
+    load_dotenv()
+
+    if args.command == 'detect':
+        print(f"Stored {run_detect(args.user_id)} recurring series")
+        return 0
+
+    if args.command == 'materialize':
+        print(f"Created {run_materialize(args.horizon_days)} transactions")
+        return 0
+
+    while True:
+        started = time.monotonic()
+        try:
+            series = run_detect()
+            created = run_materialize(args.horizon_days)
+            print(f"Stored {series} recurring series, created {created} transactions")
+        except Exception as e:
+            print(f"Error in recurring schedule: {e}")
+        time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Tests for utils.extraction amount parsing and JSON repair
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import json
+from decimal import Decimal
+
+import pytest
+
+from utils.extraction import normalize_amount, parse_amount, parse_extraction, repair_json
+
+RESPONSE = '{{"title": "Almuerzo", "amount": {amount}, "date": "2025-03-05", "vendor": "Crepes", "category": "Food"}}'
+
+
+@pytest.mark.parametrize('token, expected', [
+    ('25.000', Decimal('25000')),
+    ('1.234.567', Decimal('1234567')),
+    ('1,234.50', Decimal('1234.50')),
+    ('1.234,56', Decimal('1234.56')),
+    ('12,50', Decimal('12.50')),
+    ('0.125', Decimal('0.125')),
+    ('0,125', Decimal('0.125')),
+    ('1234.500', Decimal('1234.500')),
+    ('abc', None),
+])
+def test_parse_amount(token, expected):
+    assert parse_amount(token) == expected
+
+
+def test_normalize_amount_strings():
+    assert normalize_amount('$ 25.000') == Decimal('25000')
+    assert normalize_amount('(12.50)') == Decimal('-12.50')
+    assert normalize_amount('twelve') is None
+
+
+@pytest.mark.parametrize('amount', ['25.000', '"25.000"', "'25.000'", '25000'])
+def test_quoted_and_bare_thousands_agree(amount):
+    # Valid JSON either way, or repaired for the single-quoted one
+    data, invalid = parse_extraction(RESPONSE.format(amount=amount))
+    assert invalid == []
+    assert data['amount'] == 25000.0
+
+
+@pytest.mark.parametrize('amount, expected', [
+    ('12.5', 12.5),
+    ('0.125', 0.125),
+    ('1234.500', 1234.5),
+    ('1e3', 1000.0),
+])
+def test_bare_decimals_stay_decimals(amount, expected):
+    data, _ = parse_extraction(RESPONSE.format(amount=amount))
+    assert data['amount'] == expected
+
+
+def test_repaired_bare_thousands():
+    text = "```json\n{title: 'Almuerzo', amount: 25.000, date: '2025-03-05', vendor: Crepes, category: Food,}\n```"
+    data, invalid = parse_extraction(text)
+    assert invalid == []
+    assert data['amount'] == 25000.0
+    assert data['vendor'] == 'Crepes'
+
+
+def test_repair_quotes_grouped_numbers():
+    assert json.loads(repair_json("{amount: 1.234.567}")) == {'amount': '1.234.567'}
+    assert json.loads(repair_json("{amount: 25,000}")) == {'amount': '25,000'}
+
+
+def test_repair_drops_truncated_value():
+    assert json.loads(repair_json('{"title": "Almuerzo", "amount": 25.0')) == {'title': 'Almuerzo'}
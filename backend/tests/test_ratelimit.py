@@ -0,0 +1,43 @@
+"""
+Tests for utils.ratelimit request identities
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import pytest
+from flask import Flask
+
+from utils.ratelimit import Limit, MemoryRateLimitStore, RateLimiter, init_rate_limits, set_rate_limiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', 'true')
+    set_rate_limiter(RateLimiter(MemoryRateLimitStore(), Limit(per_minute=1, burst=2), {}))
+    app = Flask(__name__)
+    init_rate_limits(app)
+
+    @app.route('/api/things')
+    def things():
+        return {'status': 'success'}
+
+    yield app.test_client()
+    set_rate_limiter(None)
+
+
+def _get(client, user_id, address):
+    return client.get(f'/api/things?user_id={user_id}', environ_base={'REMOTE_ADDR': address}).status_code
+
+
+def test_unverified_user_ids_share_the_address_bucket(client):
+    assert _get(client, 'user-a', '203.0.113.7') == 200
+    assert _get(client, 'user-b', '203.0.113.7') == 200
+    # Bucket of 2 drained by two different made-up user_ids
+    assert _get(client, 'user-c', '203.0.113.7') == 429
+
+
+def test_other_addresses_keep_their_bucket(client):
+    for _ in range(2):
+        _get(client, 'user-a', '203.0.113.7')
+    assert _get(client, 'user-a', '203.0.113.7') == 429
+    assert _get(client, 'user-a', '198.51.100.2') == 200
@@ -0,0 +1,80 @@
+"""
+Tests for utils.recurring detection and materialization, on the SQLite stand-in
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import datetime
+import uuid
+
+import pytest
+
+from benchmarks.standins import SQLiteConnection, create_sqlite_database
+from utils.recurring import detect_for_user, materialize_due
+
+USER_ID = str(uuid.uuid4())
+VENDOR_ID = str(uuid.uuid4())
+CATEGORY_ID = str(uuid.uuid4())
+
+
+@pytest.fixture
+def connection(tmp_path):
+    path = str(tmp_path / 'recurring.sqlite3')
+    create_sqlite_database(path)
+    connection = SQLiteConnection(path)
+    yield connection
+    connection.close()
+
+
+def _record(connection, dates, amount=39900):
+    cursor = connection.cursor()
+    for transaction_date in dates:
+        cursor.execute("""
+            INSERT INTO transactions (
+                transaction_id, user_id, title, amount, transaction_date,
+                category_id, vendor_id, created_at, updated_at, is_deleted
+            ) VALUES (%s, %s, 'Streaming', %s, %s, %s, %s, NOW(), NOW(), FALSE)
+        """, (str(uuid.uuid4()), USER_ID, amount, transaction_date, CATEGORY_ID, VENDOR_ID))
+    connection.commit()
+    cursor.close()
+
+
+def _active_series(connection):
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute("SELECT period, is_active FROM recurring_series WHERE user_id = %s", (USER_ID,))
+    rows = cursor.fetchall()
+    cursor.close()
+    return [row['period'] for row in rows if row['is_active']]
+
+
+def test_monthly_series_detected(connection):
+    _record(connection, [datetime.date(2025, month, 5) for month in range(1, 5)])
+    series = detect_for_user(connection, USER_ID, today=datetime.date(2025, 4, 20))
+    assert [item['period'] for item in series] == ['monthly']
+    assert series[0]['next_date'] == datetime.date(2025, 5, 5)
+
+
+def test_cancelled_series_goes_inactive_despite_materialized_occurrences(connection):
+    # Paid January to April, then cancelled
+    _record(connection, [datetime.date(2025, month, 5) for month in range(1, 5)])
+    detect_for_user(connection, USER_ID, today=datetime.date(2025, 4, 20))
+
+    # The job keeps materializing while the series is active, a month ahead
+    for today in (datetime.date(2025, 4, 20), datetime.date(2025, 5, 20)):
+        detect_for_user(connection, USER_ID, today=today)
+        materialize_due(connection, today, today + datetime.timedelta(days=31))
+    assert _active_series(connection) == ['monthly']
+
+    # May and June missed: the materialized rows do not keep the series alive
+    series = detect_for_user(connection, USER_ID, today=datetime.date(2025, 6, 20))
+    assert series == []
+    assert _active_series(connection) == []
+    assert materialize_due(connection, datetime.date(2025, 6, 20), datetime.date(2025, 7, 20)) == 0
+
+
+def test_future_dated_rows_ignored(connection):
+    _record(connection, [datetime.date(2025, month, 5) for month in range(1, 5)])
+    # A payment the user scheduled ahead does not count as an occurrence yet
+    _record(connection, [datetime.date(2025, 9, 5)])
+    series = detect_for_user(connection, USER_ID, today=datetime.date(2025, 4, 20))
+    assert series[0]['last_date'] == datetime.date(2025, 4, 5)
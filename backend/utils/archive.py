@@ -0,0 +1,149 @@
+"""
+Transaction archival for Menuda Finance API
+
+delete_transaction only sets is_deleted = TRUE. Once a deleted row is older
+than the retention window it moves to transactions_archive, so the hot
+table (and its indexes) only hold rows the app still shows. Optionally,
+whole years before a cutoff move there too; GET /transactions?archived=true
+reads them.
+
+On MySQL, transactions is range-partitioned by transaction_date, one
+partition per year (migrations/0008_partition_transactions.mysql.sql), and
+queries with a date range only read the years they cover. New years need a
+partition before their first row arrives; add_year_partitions splits them
+off the empty catch-all pmax partition ahead of time.
+
+Rows move in batches, each copied and deleted in one transaction. Their
+IDs stay in transaction_ids, so an archived ID is never issued again. All
+of it is run by scripts/archive_transactions.py.
+"""
+import datetime
+import re
+
+# Columns copied to transactions_archive (which adds archived_at)
+COLUMNS = (
+    'transaction_id', 'user_id', 'title', 'amount', 'transaction_date', 'category_id',
+    'vendor_id', 'attachment_url', 'attachment_type', 'created_at', 'updated_at', 'is_deleted',
+)
+
+# Yearly partitions are named p<year>; pmax catches dates past the last one
+_YEAR_PARTITION = re.compile(r'^p(\d{4})$')
+
+PARTITIONS_QUERY = """
+SELECT
+    PARTITION_NAME
+FROM
+    information_schema.PARTITIONS
+WHERE
+    TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'transactions'
+    AND PARTITION_NAME IS NOT NULL
+"""
+
+
+def _move(connection, condition, params, batch_size):
+    """
+    Move the rows matching a condition to transactions_archive, a batch at a time
+    Args:
+        connection: Database connection
+        condition (str): WHERE clause on transactions
+        params (tuple): Parameters of the condition
+        batch_size (int): Rows per transaction
+    Returns:
+        int: Rows moved
+    """
+    columns = ', '.join(COLUMNS)
+    moved = 0
+    cursor = connection.cursor()
+    try:
+        while True:
+            cursor.execute(
+                f"SELECT transaction_id FROM transactions WHERE {condition} LIMIT %s",
+                (*params, batch_size)
+            )
+            transaction_ids = [row[0] for row in cursor.fetchall()]
+            if not transaction_ids:
+                return moved
+
+            # The condition is checked again: a row may have changed since
+            placeholders = ', '.join(['%s'] * len(transaction_ids))
+            try:
+                cursor.execute(f"""
+                    INSERT INTO transactions_archive ({columns}, archived_at)
+                    SELECT {columns}, NOW() FROM transactions
+                    WHERE transaction_id IN ({placeholders}) AND {condition}
+                """, (*transaction_ids, *params))
+                cursor.execute(
+                    f"DELETE FROM transactions WHERE transaction_id IN ({placeholders}) AND {condition}",
+                    (*transaction_ids, *params)
+                )
+                moved += cursor.rowcount
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+            if len(transaction_ids) < batch_size:
+                return moved
+    finally:
+        cursor.close()
+
+
+def archive_deleted(connection, deleted_before, batch_size=1000):
+    """
+    Archive transactions deleted before a point in time
+    Args:
+        connection: Database connection
+        deleted_before (datetime.datetime): Rows whose delete (updated_at) is
+            older than this move
+        batch_size (int): Rows per transaction
+    Returns:
+        int: Rows archived
+    """
+    return _move(connection, "is_deleted = TRUE AND updated_at < %s", (deleted_before,), batch_size)
+
+
+def archive_before(connection, cutoff, batch_size=1000):
+    """
+    Archive every transaction dated before a day, deleted or not
+    Args:
+        connection: Database connection
+        cutoff (datetime.date): First day that stays in transactions
+        batch_size (int): Rows per transaction
+    Returns:
+        int: Rows archived
+    """
+    return _move(connection, "transaction_date < %s", (cutoff,), batch_size)
+
+
+def add_year_partitions(connection, through_year):
+    """
+    Split yearly partitions off pmax up to a year (MySQL only)
+    Args:
+        connection: MySQL connection
+        through_year (int): Last year that must have its own partition
+    Returns:
+        list: Names of the partitions added (empty when transactions is not
+            partitioned or already covers the year)
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(PARTITIONS_QUERY)
+        names = [row[0] for row in cursor.fetchall()]
+        years = [int(match.group(1)) for match in map(_YEAR_PARTITION.match, names) if match]
+        if not years or 'pmax' not in names:
+            return []
+
+        added = []
+        for year in range(max(years) + 1, through_year + 1):
+            # Instant while pmax is empty, which it is as long as this runs ahead
+            cursor.execute(f"""
+                ALTER TABLE transactions REORGANIZE PARTITION pmax INTO (
+                    PARTITION p{year} VALUES LESS THAN ('{datetime.date(year + 1, 1, 1).isoformat()}'),
+                    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+            added.append(f'p{year}')
+        return added
+    finally:
+        cursor.close()
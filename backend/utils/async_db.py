@@ -0,0 +1,98 @@
+"""
+Async database utilities for Menuda Finance API (ASGI mode)
+
+Uses an aiomysql connection pool so a query waiting on MySQL yields the event
+loop instead of pinning a worker. The pool is created when the ASGI app starts
+serving (see asgi.py) and closed on shutdown.
+
+Configuration (environment variables):
+    DB_HOST, DB_USER, DB_PASSWORD, DB_NAME: Same as utils/db.py
+    DB_ASYNC_POOL_SIZE: Maximum connections in the async pool (default 10)
+"""
+import os
+import time
+import aiomysql
+from utils import metrics
+
+# Pool shared by all requests on this event loop
+_pool = None
+
+
+async def init_pool():
+    """
+    Create the async connection pool
+    Returns:
+        aiomysql.Pool: Connection pool
+    """
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            db=os.getenv('DB_NAME', 'menuda_finance'),
+            minsize=1,
+            maxsize=int(os.getenv('DB_ASYNC_POOL_SIZE', '10')),
+            # Reads only: autocommit keeps pooled connections from holding
+            # an old REPEATABLE READ snapshot between requests
+            autocommit=True,
+        )
+    return _pool
+
+
+async def close_pool():
+    """
+    Close the async connection pool and wait for connections to be released
+    """
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def _execute(query, params, fetch_one):
+    """
+    Run a read query on a pooled connection
+    Args:
+        query (str): SQL statement with %s placeholders
+        params (tuple): Statement parameters
+        fetch_one (bool): Return only the first row
+    Returns:
+        dict or list: Row(s) as dictionaries
+    """
+    pool = await init_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            start = time.perf_counter()
+            try:
+                await cursor.execute(query, params)
+                if fetch_one:
+                    return await cursor.fetchone()
+                return await cursor.fetchall()
+            finally:
+                metrics.record_query(query, params, time.perf_counter() - start)
+
+
+async def fetch_all(query, params=()):
+    """
+    Run a read query and return all rows
+    Args:
+        query (str): SQL statement with %s placeholders
+        params (tuple): Statement parameters
+    Returns:
+        list: Rows as dictionaries
+    """
+    return await _execute(query, params, fetch_one=False)
+
+
+async def fetch_one(query, params=()):
+    """
+    Run a read query and return the first row
+    Args:
+        query (str): SQL statement with %s placeholders
+        params (tuple): Statement parameters
+    Returns:
+        dict: First row or None
+    """
+    return await _execute(query, params, fetch_one=True)
@@ -0,0 +1,269 @@
+"""
+Session token utilities for Menuda Finance API
+
+check_user issues a signed, stateless session token once it has verified the
+Google ID token the client signed in with (signature, expiry, issuer, audience
+and email_verified). Clients send it back as `Authorization: Bearer <token>`
+and the user is resolved from the signature alone, without a users table
+lookup. Routes still accept the legacy user_id parameter when no token is
+sent, unless REQUIRE_SESSION_TOKEN is enabled.
+
+Without GOOGLE_CLIENT_ID the credential cannot be verified: check_user then
+trusts the profile in the request body and issues no token, so
+REQUIRE_SESSION_TOKEN needs both GOOGLE_CLIENT_ID and SESSION_SECRET_KEY.
+
+Configuration (environment variables):
+    GOOGLE_CLIENT_ID: OAuth client ID the frontend signs in with, the
+        audience ID tokens must be issued for (tokens are not issued when unset)
+    SESSION_SECRET_KEY: Signing key shared by all workers (tokens are not
+        issued when unset)
+    SESSION_TOKEN_MAX_AGE: Token lifetime in seconds (default 30 days)
+    REQUIRE_SESSION_TOKEN: Reject requests without a token ('true'/'false', default false)
+"""
+import hashlib
+import os
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+# Endpoints reachable without a session token even when tokens are required
+# (metrics checks its own METRICS_TOKEN)
+PUBLIC_ENDPOINTS = {'users.check_user', 'health_check', 'metrics.get_metrics', 'static'}
+
+# Endpoints that also accept the token as ?access_token=: a browser
+# EventSource cannot send headers. The token then shows up in access logs,
+# so keep it to these streams
+QUERY_TOKEN_ENDPOINTS = {'events.stream_changes', 'async_events.stream_changes'}
+
+
+class SessionError(Exception):
+    """
+    Raised when a presented session token is invalid or expired
+    """
+
+
+class CredentialError(Exception):
+    """
+    Raised when a Google ID token is missing, invalid or for an unverified email
+    """
+
+
+def _serializer():
+    """
+    Get the token serializer
+    Returns:
+        URLSafeTimedSerializer: Serializer, or None when no secret is configured
+    """
+    secret = os.getenv('SESSION_SECRET_KEY')
+    if not secret:
+        return None
+    return URLSafeTimedSerializer(secret, salt='menuda-session')
+
+
+def profile_fingerprint(name, picture):
+    """
+    Hash the profile fields check_user keeps in sync
+    Args:
+        name (str): User display name
+        picture (str): Profile picture URL
+    Returns:
+        str: Short fingerprint of the profile
+    """
+    digest = hashlib.sha256(f'{name}\x00{picture or ""}'.encode('utf-8')).hexdigest()
+    return digest[:16]
+
+
+def google_client_id():
+    """
+    Get the OAuth client ID Google credentials are verified against
+    Returns:
+        str: Client ID, or None when GOOGLE_CLIENT_ID is not set
+    """
+    return os.getenv('GOOGLE_CLIENT_ID') or None
+
+
+def verify_google_credential(credential):
+    """
+    Verify a Google ID token (the credential Google Identity Services hands
+    the frontend): signature, expiry, issuer, audience and email_verified
+    Args:
+        credential (str): Google ID token
+    Returns:
+        dict: Token claims (email, name, picture, ...)
+    Raises:
+        CredentialError: If the token is missing or invalid, was issued for
+            another client, or its email is not verified
+    """
+    client_id = google_client_id()
+    if not client_id:
+        raise CredentialError('Google sign-in is not configured')
+    if not credential:
+        raise CredentialError('Missing Google credential')
+
+    # Imported lazily: only sign-in needs it
+    from google.auth.transport import requests as google_requests
+    from google.oauth2 import id_token
+
+    try:
+        claims = id_token.verify_oauth2_token(
+            credential, google_requests.Request(), client_id, clock_skew_in_seconds=10
+        )
+    except ValueError:
+        raise CredentialError('Invalid Google credential')
+
+    if not claims.get('email') or claims.get('email_verified') not in (True, 'true'):
+        raise CredentialError('Google account email is not verified')
+    return claims
+
+
+def issue_session_token(user_id, email, name, picture):
+    """
+    Create a signed session token; only call it for a profile taken from a
+    verified credential (verify_google_credential)
+    Args:
+        user_id (str): UUID of the user
+        email (str): User email
+        name (str): User display name
+        picture (str): Profile picture URL
+    Returns:
+        str: Session token, or None when SESSION_SECRET_KEY or
+        GOOGLE_CLIENT_ID is not set
+    """
+    serializer = _serializer()
+    if serializer is None or not google_client_id():
+        return None
+    return serializer.dumps({
+        'uid': user_id,
+        'email': email,
+        'fp': profile_fingerprint(name, picture),
+    })
+
+
+def verify_session_token(token):
+    """
+    Verify a session token
+    Args:
+        token (str): Session token
+    Returns:
+        dict: Token payload with uid, email and fp
+    Raises:
+        SessionError: If the token is invalid or expired
+    """
+    serializer = _serializer()
+    if serializer is None:
+        raise SessionError('Session tokens are not configured')
+    max_age = int(os.getenv('SESSION_TOKEN_MAX_AGE', str(30 * 24 * 3600)))
+    try:
+        return serializer.loads(token, max_age=max_age)
+    except SignatureExpired:
+        raise SessionError('Session token expired')
+    except BadSignature:
+        raise SessionError('Invalid session token')
+
+
+def session_from_headers(headers):
+    """
+    Read and verify the bearer token from request headers
+    Args:
+        headers: Request headers
+    Returns:
+        dict: Token payload, or None when no bearer token was sent
+    Raises:
+        SessionError: If a token was sent but is invalid
+    """
+    authorization = headers.get('Authorization', '')
+    if not authorization.lower().startswith('bearer '):
+        return None
+    return verify_session_token(authorization[7:].strip())
+
+
+def session_from_request(headers, args, endpoint):
+    """
+    Read and verify the session token of a request: the bearer header, or
+    the access_token parameter on QUERY_TOKEN_ENDPOINTS
+    Args:
+        headers: Request headers
+        args: Query parameters
+        endpoint (str): Matched endpoint name
+    Returns:
+        dict: Token payload, or None when no token was sent
+    Raises:
+        SessionError: If a token was sent but is invalid
+    """
+    session = session_from_headers(headers)
+    if session is None and endpoint in QUERY_TOKEN_ENDPOINTS and args.get('access_token'):
+        return verify_session_token(args['access_token'])
+    return session
+
+
+def tokens_required():
+    """
+    Check whether requests must carry a session token
+    Returns:
+        bool: True when REQUIRE_SESSION_TOKEN is enabled
+    """
+    return os.getenv('REQUIRE_SESSION_TOKEN', 'false').lower() in ('1', 'true', 'yes')
+
+
+def current_session():
+    """
+    Get the verified session of the current request
+    Returns:
+        dict: Token payload or None
+    """
+    return g.get('session')
+
+
+def current_user_id(fallback=None):
+    """
+    Resolve the user of the current request
+    Args:
+        fallback (str): Legacy user_id parameter sent by the client
+    Returns:
+        str: User ID from the session token, else the fallback
+    """
+    session = g.get('session')
+    if session:
+        return session['uid']
+    return fallback
+
+
+def with_session_user(data):
+    """
+    Set user_id in a JSON body from the session token, if there is one
+    Args:
+        data (dict): Request body
+    Returns:
+        dict: The same body
+    """
+    session = g.get('session')
+    if session and isinstance(data, dict):
+        data['user_id'] = session['uid']
+    return data
+
+
+def init_auth(app):
+    """
+    Register session token verification on a Flask application
+    Args:
+        app: Flask application
+    """
+    @app.before_request
+    def load_session():
+        """Verify the bearer token and reject invalid ones early"""
+        if request.method == 'OPTIONS':
+            return None
+
+        try:
+            g.session = session_from_request(request.headers, request.args, request.endpoint)
+        except SessionError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 401
+
+        if g.session is None and tokens_required() and request.endpoint not in PUBLIC_ENDPOINTS:
+            return jsonify({
+                'status': 'error',
+                'message': 'Session token required'
+            }), 401
+        return None
@@ -0,0 +1,297 @@
+"""
+Budget engine for Menuda Finance API
+
+A budget is a spending limit for one category over a period (weekly,
+monthly or yearly). Spend per budget and period lives in budget_spend and is
+adjusted by the transaction write handlers inside their own database
+transaction, so reads never aggregate raw transactions. A budget_spend row
+is seeded from the transactions table the first time its period is read or
+written; a writer that finds the row created concurrently adds its delta to
+it instead, so no committed write is left out of the seeded total.
+
+Status reads are one query over the user's budgets (O(categories)) and are
+cached per worker for BUDGET_STATUS_TTL seconds; writes drop the user's
+cached status. When a write moves spend across one of the alert thresholds
+a 'budget.threshold_crossed' event is emitted (see utils/events.py).
+"""
+import datetime
+import os
+from decimal import Decimal
+from utils.cache import LRUCache
+from utils.db import get_db_connection, close_connection
+
+PERIODS = ('weekly', 'monthly', 'yearly')
+
+# Fractions of the limit that trigger an event when crossed upwards
+ALERT_THRESHOLDS = tuple(
+    Decimal(value) for value in os.environ.get('BUDGET_ALERT_THRESHOLDS', '0.8,1.0').split(',')
+)
+
+THRESHOLD_CROSSED = 'budget.threshold_crossed'
+
+# Cached status per (user_id, date)
+BUDGET_STATUS_TTL = float(os.environ.get('BUDGET_STATUS_TTL', 30))
+_status_cache = LRUCache(max_entries=int(os.environ.get('BUDGET_STATUS_CACHE_SIZE', 2000)), ttl=BUDGET_STATUS_TTL)
+
+STATUS_QUERY = """
+SELECT
+    b.budget_id,
+    b.category_id,
+    c.category_name,
+    b.period,
+    b.limit_amount,
+    s.spent
+FROM
+    budgets b
+    JOIN categories c ON b.category_id = c.category_id
+    LEFT JOIN budget_spend s ON s.budget_id = b.budget_id
+        AND s.period_start = CASE b.period
+            WHEN 'weekly' THEN %s
+            WHEN 'monthly' THEN %s
+            ELSE %s
+        END
+WHERE
+    b.user_id = %s
+    AND b.is_active = TRUE
+ORDER BY
+    c.category_name,
+    b.period
+"""
+
+
+def _as_date(value):
+    """Accept date, datetime or ISO string"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def period_bounds(on_date, period):
+    """
+    First and last day of the period containing a date
+    Args:
+        on_date (datetime.date): Any day in the period
+        period (str): 'weekly' (Monday to Sunday), 'monthly' or 'yearly'
+    Returns:
+        tuple: (start, end) dates, inclusive
+    """
+    on_date = _as_date(on_date)
+    if period == 'weekly':
+        start = on_date - datetime.timedelta(days=on_date.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if period == 'monthly':
+        start = on_date.replace(day=1)
+        next_month = (start + datetime.timedelta(days=32)).replace(day=1)
+        return start, next_month - datetime.timedelta(days=1)
+    start = on_date.replace(month=1, day=1)
+    return start, on_date.replace(month=12, day=31)
+
+
+def spend_changes(current=None, previous=None):
+    """
+    Spend deltas caused by a transaction write
+    Args:
+        current (dict): amount, category_id, transaction_date after the write (None when deleted)
+        previous (dict): The same fields before the write (None when created)
+    Returns:
+        list: (category_id, transaction_date, delta) tuples
+    """
+    changes = []
+    if previous is not None:
+        changes.append((previous['category_id'], _as_date(previous['transaction_date']),
+                        -Decimal(str(previous['amount']))))
+    if current is not None:
+        changes.append((current['category_id'], _as_date(current['transaction_date']),
+                        Decimal(str(current['amount']))))
+    return changes
+
+
+def apply_spend_changes(cursor, user_id, changes):
+    """
+    Adjust budget spend for a write, before the caller commits
+    Periods whose spend row does not exist yet are seeded from the
+    transactions table, which already includes this write, so threshold
+    events fire for the first writes of a period too.
+    Args:
+        cursor: Cursor on the connection doing the write
+        user_id (str): Owner of the transaction
+        changes (list): Output of spend_changes()
+    Returns:
+        list: (event_type, payload) pairs to emit after the commit
+    """
+    if not changes:
+        return []
+
+    category_ids = sorted({category_id for category_id, _, _ in changes})
+    placeholders = ', '.join(['%s'] * len(category_ids))
+    cursor.execute(f"""
+        SELECT budget_id, category_id, period, limit_amount
+        FROM budgets
+        WHERE user_id = %s AND is_active = TRUE AND category_id IN ({placeholders})
+    """, (user_id, *category_ids))
+    budgets = cursor.fetchall()
+    if not budgets:
+        return []
+
+    # Net delta per (budget, period); an update within one period may cancel out
+    deltas = {}
+    for budget in budgets:
+        for category_id, transaction_date, delta in changes:
+            if category_id == budget['category_id']:
+                start, end = period_bounds(transaction_date, budget['period'])
+                key = (budget['budget_id'], start, end)
+                deltas[key] = deltas.get(key, Decimal('0')) + delta
+
+    budgets_by_id = {budget['budget_id']: budget for budget in budgets}
+    events = []
+    for (budget_id, start, end), delta in deltas.items():
+        if delta == 0:
+            continue
+        cursor.execute("""
+            UPDATE budget_spend SET spent = spent + %s, updated_at = NOW()
+            WHERE budget_id = %s AND period_start = %s
+        """, (delta, budget_id, start))
+        if cursor.rowcount == 0:
+            # No row for the period yet (delta != 0, so a match always changes it)
+            _seed_spend(cursor, budgets_by_id[budget_id], start, end, user_id, delta)
+
+        cursor.execute(
+            "SELECT spent FROM budget_spend WHERE budget_id = %s AND period_start = %s",
+            (budget_id, start)
+        )
+        spent_after = Decimal(str(cursor.fetchone()['spent']))
+        spent_before = spent_after - delta
+        budget = budgets_by_id[budget_id]
+        limit_amount = Decimal(str(budget['limit_amount']))
+        for threshold in ALERT_THRESHOLDS:
+            mark = threshold * limit_amount
+            if spent_before < mark <= spent_after:
+                events.append((THRESHOLD_CROSSED, {
+                    'user_id': user_id,
+                    'budget_id': budget_id,
+                    'category_id': budget['category_id'],
+                    'period': budget['period'],
+                    'period_start': start.isoformat(),
+                    'threshold': float(threshold),
+                    'spent': float(spent_after),
+                    'limit_amount': float(limit_amount)
+                }))
+    return events
+
+
+def _seed_spend(cursor, budget, start, end, user_id, delta=None):
+    """
+    Compute a period's spend from raw transactions and store it
+    Args:
+        cursor: Cursor on the caller's connection
+        budget (dict): budget_id and category_id
+        start (datetime.date): First day of the period
+        end (datetime.date): Last day of the period
+        user_id (str): Budget owner
+        delta (Decimal): Set by writers: their own (uncommitted) change,
+            which the sum includes. If another transaction created the row
+            meanwhile, its total cannot include that change, so the delta is
+            added to it instead
+    Returns:
+        Decimal: Spend for the period, as computed here
+    """
+    cursor.execute("""
+        SELECT COALESCE(SUM(amount), 0) AS spent
+        FROM transactions
+        WHERE user_id = %s AND category_id = %s AND is_deleted = FALSE
+            AND transaction_date BETWEEN %s AND %s
+    """, (user_id, budget['category_id'], start, end))
+    spent = Decimal(str(cursor.fetchone()['spent']))
+
+    if delta is None:
+        # Keep a row a concurrent transaction already created: every write
+        # committed since our sum has added itself to it
+        cursor.execute("""
+            INSERT INTO budget_spend (budget_id, period_start, spent, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE spent = spent
+        """, (budget['budget_id'], start, spent))
+    else:
+        cursor.execute("""
+            INSERT INTO budget_spend (budget_id, period_start, spent, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE spent = spent + %s, updated_at = NOW()
+        """, (budget['budget_id'], start, spent, delta))
+    return spent
+
+
+def budget_status(user_id, on_date=None):
+    """
+    Spend against every active budget for the periods containing a date
+    Args:
+        user_id (str): User ID
+        on_date (datetime.date): Reference day (defaults to today)
+    Returns:
+        list: One dict per budget with limit, spent, remaining, ratio and status
+    """
+    on_date = _as_date(on_date or datetime.date.today())
+    cache_key = (user_id, on_date)
+    cached = _status_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    starts = {period: period_bounds(on_date, period) for period in PERIODS}
+    connection = get_db_connection()
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(STATUS_QUERY, (
+            starts['weekly'][0], starts['monthly'][0], starts['yearly'][0], user_id
+        ))
+        rows = cursor.fetchall()
+
+        seeded = False
+        status = []
+        for row in rows:
+            start, end = starts[row['period']]
+            if row['spent'] is None:
+                row['spent'] = _seed_spend(cursor, row, start, end, user_id)
+                seeded = True
+
+            limit_amount = Decimal(str(row['limit_amount']))
+            spent = Decimal(str(row['spent']))
+            ratio = spent / limit_amount if limit_amount else Decimal('0')
+            if ratio >= 1:
+                state = 'exceeded'
+            elif ratio >= ALERT_THRESHOLDS[0]:
+                state = 'warning'
+            else:
+                state = 'ok'
+
+            status.append({
+                'budget_id': row['budget_id'],
+                'category_id': row['category_id'],
+                'category_name': row['category_name'],
+                'period': row['period'],
+                'period_start': start.isoformat(),
+                'period_end': end.isoformat(),
+                'limit_amount': float(limit_amount),
+                'spent': float(spent),
+                'remaining': float(limit_amount - spent),
+                'ratio': round(float(ratio), 4),
+                'status': state
+            })
+
+        if seeded:
+            connection.commit()
+    finally:
+        close_connection(connection, cursor)
+
+    _status_cache.set(cache_key, status)
+    return status
+
+
+def invalidate_status(user_id):
+    """
+    Drop a user's cached budget status after a write
+    Args:
+        user_id (str): User ID
+    """
+    _status_cache.pop_matching(lambda key: key[0] == user_id)
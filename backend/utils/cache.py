@@ -0,0 +1,129 @@
+"""
+In-process cache utilities for Menuda Finance API
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel distinguishing a missing entry from a cached None
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with optional time-to-live
+
+    Entries are per worker process; use it for data that can be rebuilt from
+    the database (indexes, computed summaries), never as the source of truth.
+    """
+    def __init__(self, max_entries=1000, ttl=None):
+        """
+        Initialize cache
+        Args:
+            max_entries (int): Maximum number of entries before evicting the oldest
+            ttl (float): Seconds an entry stays valid (None for no expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-key locks held while a missing value is being created
+        self._create_locks = {}
+
+    def get(self, key, default=None):
+        """
+        Get a cached value
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl (float): Override the cache's default time-to-live
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, key, factory):
+        """
+        Get a cached value, creating it once if it is missing
+        Concurrent callers for the same missing key wait for a single
+        factory call instead of each running it.
+        Args:
+            key: Cache key
+            factory: Callable returning the value to cache
+        Returns:
+            Cached or newly created value
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            create_lock = self._create_locks.setdefault(key, threading.Lock())
+        with create_lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = factory()
+                self.set(key, value)
+        with self._lock:
+            self._create_locks.pop(key, None)
+        return value
+
+    def pop(self, key, default=None):
+        """
+        Remove an entry
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing
+        Returns:
+            Removed value or default
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def pop_matching(self, predicate):
+        """
+        Remove every entry whose key matches a predicate
+        Args:
+            predicate: Callable taking a key and returning True to remove it
+        Returns:
+            int: Number of removed entries
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,565 @@
+"""
+Change feed for Menuda Finance API
+
+Clients open one server-sent event stream (GET /api/events) and hear about
+writes made on another device or by the invoice pipeline, instead of
+re-polling GET /api/transactions. Write handlers emit small events through
+utils.events after they commit; every event whose payload carries a user_id
+is published to a broker, and the broker delivers it to that user's open
+streams.
+
+Events are notifications, not a replicated log: they name what changed
+(e.g. {'transaction_id': ...}) and clients refetch it. A stream that falls
+too far behind gets a 'resync' event, and clients refetch what they show
+after a reconnect, as events sent while they were away are not replayed.
+
+Brokers:
+- MemoryBroker delivers to the streams of the worker that emitted the event
+  (a single worker, or local development)
+- DatabaseBroker shares events between workers through the change_events
+  table (migrations/0009_change_events.*.sql); a background thread per worker
+  writes them in batches and polls for new ones
+
+Configuration (environment variables):
+    CHANGE_BROKER: 'memory' (per worker, default) or 'database'
+    CHANGE_POLL_INTERVAL: Seconds between database broker polls (default 1)
+    CHANGE_RETENTION: Seconds change_events rows are kept (default 3600)
+    SSE_HEARTBEAT: Seconds between keep-alive comments on an idle stream (default 15)
+    SSE_MAX_DURATION: Seconds before a stream is closed and the client
+        reconnects, freeing the worker thread in WSGI mode (default 300)
+    SSE_MAX_STREAMS_PER_USER: Open streams per user and worker (default 5;
+        the /api/events rate limit allows 2 per user across workers)
+    SSE_MAX_WORKER_STREAMS: Streams a WSGI worker serves at once (default 2,
+        see routes/events.py)
+    SSE_QUEUE_SIZE: Events buffered for a slow stream before it is told to
+        resync (default 100)
+"""
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from utils import events
+from utils.db import get_db_connection, close_connection
+from utils.metrics import registry
+
+TRANSACTION_CREATED = 'transaction.created'
+TRANSACTION_UPDATED = 'transaction.updated'
+TRANSACTION_DELETED = 'transaction.deleted'
+# Bulk update or delete: clients refetch their transactions list
+TRANSACTIONS_CHANGED = 'transactions.changed'
+INVOICE_PROCESSED = 'invoice.processed'
+# Offline writes replayed through /api/sync/push, with counts per entity
+SYNC_APPLIED = 'sync.applied'
+# Sent to a stream that missed events: clients refetch everything they show
+RESYNC = 'resync'
+
+# Milliseconds an EventSource waits before reconnecting
+RECONNECT_DELAY_MS = 3000
+
+# Rows read per database broker poll
+POLL_BATCH_SIZE = 1000
+
+# Seconds between purges of expired change_events rows (per worker)
+PURGE_INTERVAL = 600
+
+sse_streams_open = registry.gauge(
+    'menuda_sse_streams_open',
+    'Server-sent event streams currently open in this worker'
+)
+sse_events_sent = registry.counter(
+    'menuda_sse_events_sent_total',
+    'Change events delivered to server-sent event streams',
+    ('event_type',)
+)
+
+
+def _setting(name, default):
+    """Read a numeric setting from the environment"""
+    return float(os.getenv(name, str(default)))
+
+
+class Subscription:
+    """
+    One open stream's queue of events, readable from a thread or a coroutine
+    """
+    def __init__(self, user_id, max_pending=100):
+        """
+        Initialize subscription
+        Args:
+            user_id (str): User whose events are delivered
+            max_pending (int): Events buffered before the stream is told to resync
+        """
+        self.user_id = user_id
+        self.max_pending = max_pending
+        self._events = deque()
+        self._overflowed = False
+        self._condition = threading.Condition()
+        # Set when an async stream reads it: pushes then wake the event loop
+        self._loop = None
+        self._wakeup = None
+
+    def push(self, event):
+        """
+        Queue an event (called from any thread)
+        Args:
+            event (tuple): (event_id, event_type, payload)
+        """
+        with self._condition:
+            if len(self._events) >= self.max_pending:
+                self._events.clear()
+                self._overflowed = True
+            elif not self._overflowed:
+                self._events.append(event)
+            self._condition.notify()
+            loop, wakeup = self._loop, self._wakeup
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    def _drain_locked(self):
+        if self._overflowed:
+            self._overflowed = False
+            return [(None, RESYNC, {'user_id': self.user_id})]
+        drained = list(self._events)
+        self._events.clear()
+        return drained
+
+    def get(self, timeout):
+        """
+        Wait for events in a thread
+        Args:
+            timeout (float): Seconds to wait
+        Returns:
+            list: Events queued since the last read (empty on timeout)
+        """
+        with self._condition:
+            if not self._events and not self._overflowed:
+                self._condition.wait(timeout)
+            return self._drain_locked()
+
+    async def get_async(self, timeout):
+        """
+        Wait for events in a coroutine
+        Args:
+            timeout (float): Seconds to wait
+        Returns:
+            list: Events queued since the last read (empty on timeout)
+        """
+        with self._condition:
+            if self._wakeup is None:
+                self._loop = asyncio.get_running_loop()
+                self._wakeup = asyncio.Event()
+            self._wakeup.clear()
+            drained = self._drain_locked()
+        if drained:
+            return drained
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._condition:
+            return self._drain_locked()
+
+
+class ChangeHub:
+    """
+    Open streams of this worker, by user
+    """
+    def __init__(self, max_streams_per_user=5, max_pending=100):
+        """
+        Initialize hub
+        Args:
+            max_streams_per_user (int): Open streams allowed per user
+            max_pending (int): Events buffered per stream
+        """
+        self.max_streams_per_user = max_streams_per_user
+        self.max_pending = max_pending
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """
+        Open a subscription to a user's events
+        Args:
+            user_id (str): User ID
+        Returns:
+            Subscription: New subscription, or None when the user has too many open
+        """
+        subscription = Subscription(user_id, self.max_pending)
+        with self._lock:
+            if len(self._subscriptions[user_id]) >= self.max_streams_per_user:
+                return None
+            self._subscriptions[user_id].add(subscription)
+        sse_streams_open.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Close a subscription
+        Args:
+            subscription (Subscription): Subscription from subscribe()
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if not subscriptions or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+        sse_streams_open.dec()
+
+    def has_subscribers(self):
+        """
+        Check whether any stream is open in this worker
+        Returns:
+            bool: True when at least one stream is open
+        """
+        with self._lock:
+            return bool(self._subscriptions)
+
+    def deliver(self, event_id, event_type, payload):
+        """
+        Queue an event on its user's streams
+        Args:
+            event_id (int): Broker-assigned event ID
+            event_type (str): Event type
+            payload (dict): Event data, with user_id
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(payload.get('user_id'), ()))
+        for subscription in subscriptions:
+            subscription.push((event_id, event_type, payload))
+            sse_events_sent.inc(event_type=event_type)
+
+
+class MemoryBroker:
+    """
+    Broker that delivers events to this worker's streams only
+    """
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._hub = None
+
+    def start(self, hub):
+        """
+        Deliver published events to a hub
+        Args:
+            hub (ChangeHub): Hub of this worker
+        """
+        self._hub = hub
+
+    def publish(self, event_type, payload):
+        """
+        Deliver an event right away
+        Args:
+            event_type (str): Event type
+            payload (dict): Event data, with user_id
+        """
+        if self._hub is not None:
+            self._hub.deliver(next(self._ids), event_type, payload)
+
+
+class DatabaseBroker:
+    """
+    Broker sharing events between workers through the change_events table
+    """
+    def __init__(self, poll_interval=1.0, retention=3600):
+        """
+        Initialize broker
+        Args:
+            poll_interval (float): Seconds between polls for new events
+            retention (float): Seconds events are kept in the table
+        """
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._hub = None
+        self._outbox = queue.Queue()
+        self._last_id = None
+        self._purged_at = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def start(self, hub):
+        """
+        Deliver events polled from the table to a hub
+        Args:
+            hub (ChangeHub): Hub of this worker
+        """
+        self._hub = hub
+
+    def _ensure_thread(self):
+        """Start the background thread on first use (after a pre-fork import)"""
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-broker', daemon=True)
+                self._thread.start()
+
+    def publish(self, event_type, payload):
+        """
+        Queue an event for the next batch insert (never blocks the caller)
+        Args:
+            event_type (str): Event type
+            payload (dict): Event data, with user_id
+        """
+        self._outbox.put((payload['user_id'], event_type, json.dumps(payload, default=str)))
+        self._ensure_thread()
+
+    def watch(self):
+        """
+        Make sure this worker polls for events (called when a stream opens)
+        """
+        self._ensure_thread()
+
+    def _run(self):
+        """Write queued events and poll for new ones until the process exits"""
+        polled_at = 0.0
+        while True:
+            timeout = max(0.0, self.poll_interval - (time.monotonic() - polled_at))
+            batch = []
+            try:
+                batch.append(self._outbox.get(timeout=timeout))
+                while True:
+                    batch.append(self._outbox.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self.write(batch)
+                if time.monotonic() - polled_at >= self.poll_interval:
+                    polled_at = time.monotonic()
+                    self.poll()
+            except Exception as e:
+                print(f"Error in change broker: {e}")
+
+    def write(self, batch):
+        """
+        Insert queued events
+        Args:
+            batch (list): (user_id, event_type, payload JSON) tuples
+        """
+        now = datetime.datetime.now()
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(
+                "INSERT INTO change_events (user_id, event_type, payload, created_at) VALUES (%s, %s, %s, %s)",
+                [(user_id, event_type, payload, now) for user_id, event_type, payload in batch]
+            )
+            self._purge(cursor, now)
+            connection.commit()
+        finally:
+            close_connection(connection, cursor)
+
+    def _purge(self, cursor, now):
+        """Delete expired rows at most every PURGE_INTERVAL seconds"""
+        current = time.monotonic()
+        if self._purged_at is not None and current - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = current
+        cursor.execute(
+            "DELETE FROM change_events WHERE created_at < %s",
+            (now - datetime.timedelta(seconds=self.retention),)
+        )
+
+    def poll(self):
+        """
+        Deliver the events inserted since the last poll to this worker's streams
+        """
+        # Nobody to deliver to: start from the newest event when a stream opens
+        if self._hub is None or not self._hub.has_subscribers():
+            self._last_id = None
+            return
+
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            if self._last_id is None:
+                cursor.execute("SELECT COALESCE(MAX(event_id), 0) AS last_id FROM change_events")
+                self._last_id = cursor.fetchone()['last_id']
+                return
+            cursor.execute("""
+                SELECT event_id, event_type, payload
+                FROM change_events
+                WHERE event_id > %s
+                ORDER BY event_id
+                LIMIT %s
+            """, (self._last_id, POLL_BATCH_SIZE))
+            rows = cursor.fetchall()
+        finally:
+            close_connection(connection, cursor)
+
+        for row in rows:
+            self._last_id = row['event_id']
+            self._hub.deliver(row['event_id'], row['event_type'], json.loads(row['payload']))
+
+
+_hub = None
+_broker = None
+_lock = threading.Lock()
+
+
+def get_change_hub():
+    """
+    Get the worker's hub of open streams, creating it on first use
+    Returns:
+        ChangeHub: Hub
+    """
+    global _hub
+    if _hub is None:
+        with _lock:
+            if _hub is None:
+                _hub = ChangeHub(
+                    max_streams_per_user=int(_setting('SSE_MAX_STREAMS_PER_USER', 5)),
+                    max_pending=int(_setting('SSE_QUEUE_SIZE', 100))
+                )
+    return _hub
+
+
+def get_broker():
+    """
+    Get the configured broker, creating it on first use
+    Returns:
+        MemoryBroker or DatabaseBroker
+    """
+    global _broker
+    if _broker is None:
+        hub = get_change_hub()
+        with _lock:
+            if _broker is None:
+                if os.getenv('CHANGE_BROKER', 'memory').lower() == 'database':
+                    broker = DatabaseBroker(
+                        poll_interval=_setting('CHANGE_POLL_INTERVAL', 1),
+                        retention=_setting('CHANGE_RETENTION', 3600)
+                    )
+                else:
+                    broker = MemoryBroker()
+                broker.start(hub)
+                _broker = broker
+    return _broker
+
+
+def set_broker(broker):
+    """
+    Replace the broker (None restores the configured one)
+    Args:
+        broker: Object with start(hub) and publish(event_type, payload)
+    """
+    global _broker
+    if broker is not None:
+        broker.start(get_change_hub())
+    _broker = broker
+
+
+def publish_event(event_type, payload):
+    """
+    Event bus handler: publish events that belong to a user
+    Args:
+        event_type (str): Event type
+        payload (dict): Event data
+    """
+    if isinstance(payload, dict) and payload.get('user_id'):
+        get_broker().publish(event_type, payload)
+
+
+def format_event(event_id, event_type, payload):
+    """
+    Encode an event in the text/event-stream format
+    Args:
+        event_id (int): Event ID (None for stream-level events)
+        event_type (str): Event type
+        payload (dict): Event data
+    Returns:
+        str: Event block
+    """
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(payload, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def open_stream(user_id):
+    """
+    Subscribe to a user's events for a new stream
+    Args:
+        user_id (str): User ID
+    Returns:
+        Subscription: New subscription, or None when the user has too many streams open
+    """
+    broker = get_broker()
+    subscription = get_change_hub().subscribe(user_id)
+    if subscription is not None and hasattr(broker, 'watch'):
+        broker.watch()
+    return subscription
+
+
+def stream_events(subscription):
+    """
+    Stream a subscription's events from a worker thread (WSGI mode)
+    Args:
+        subscription (Subscription): Subscription from open_stream()
+    Yields:
+        str: text/event-stream chunks, until SSE_MAX_DURATION elapses
+    """
+    heartbeat = _setting('SSE_HEARTBEAT', 15)
+    deadline = time.monotonic() + _setting('SSE_MAX_DURATION', 300)
+    try:
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+        while time.monotonic() < deadline:
+            pending = subscription.get(min(heartbeat, max(0.0, deadline - time.monotonic())))
+            if not pending:
+                yield ': keep-alive\n\n'
+            for event in pending:
+                yield format_event(*event)
+    finally:
+        get_change_hub().unsubscribe(subscription)
+
+
+async def stream_events_async(subscription):
+    """
+    Stream a subscription's events from a coroutine (ASGI mode)
+    Args:
+        subscription (Subscription): Subscription from open_stream()
+    Yields:
+        str: text/event-stream chunks, until SSE_MAX_DURATION elapses
+    """
+    heartbeat = _setting('SSE_HEARTBEAT', 15)
+    deadline = time.monotonic() + _setting('SSE_MAX_DURATION', 300)
+    try:
+        yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+        while time.monotonic() < deadline:
+            pending = await subscription.get_async(min(heartbeat, max(0.0, deadline - time.monotonic())))
+            if not pending:
+                yield ': keep-alive\n\n'
+            for event in pending:
+                yield format_event(*event)
+    finally:
+        get_change_hub().unsubscribe(subscription)
+
+
+_initialized = False
+
+
+def init_change_feed(app):
+    """
+    Publish user events from the event bus to the broker
+    Args:
+        app: Flask application (the Quart app shares the same bus)
+    """
+    global _initialized
+    with _lock:
+        if _initialized:
+            return
+        _initialized = True
+    events.subscribe(events.ALL_EVENTS, publish_event)
@@ -0,0 +1,176 @@
+"""
+Response compression utilities for Menuda Finance API
+
+Compresses API responses with brotli or gzip depending on the client's
+Accept-Encoding header. Small payloads are sent as-is (compressing them costs
+more CPU than it saves on the wire), and streamed responses are compressed
+chunk by chunk so they keep streaming.
+
+Configuration (environment variables):
+    COMPRESSION_MIN_SIZE: Minimum body size in bytes to compress (default 1024)
+    COMPRESSION_GZIP_LEVEL: gzip compression level 1-9 (default 6)
+    COMPRESSION_BROTLI_QUALITY: brotli quality 0-11 (default 4)
+"""
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# MIME types worth compressing; images and PDFs are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/manifest+json',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/event-stream',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+
+
+def get_supported_encodings():
+    """
+    Get the content encodings this server can produce, in order of preference
+    Returns:
+        list: Encoding names (e.g. ['br', 'gzip'])
+    """
+    if brotli is not None:
+        return ['br', 'gzip']
+    return ['gzip']
+
+
+def choose_encoding(accept_encodings):
+    """
+    Pick the best encoding accepted by the client
+    Args:
+        accept_encodings: werkzeug Accept object from request.accept_encodings
+    Returns:
+        str: 'br', 'gzip' or None when no supported encoding is accepted
+    """
+    return accept_encodings.best_match(get_supported_encodings())
+
+
+def compress_bytes(data, encoding, gzip_level=6, brotli_quality=4):
+    """
+    Compress a complete payload
+    Args:
+        data (bytes): Payload to compress
+        encoding (str): 'br' or 'gzip'
+        gzip_level (int): gzip compression level
+        brotli_quality (int): brotli quality
+    Returns:
+        bytes: Compressed payload
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # wbits=31 produces a gzip container instead of a raw zlib stream
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, gzip_level=6, brotli_quality=4):
+    """
+    Compress an iterable of chunks, flushing after every chunk so that
+    streamed responses (e.g. server-sent events) reach the client promptly
+    Args:
+        chunks: Iterable of bytes or str chunks
+        encoding (str): 'br' or 'gzip'
+        gzip_level (int): gzip compression level
+        brotli_quality (int): brotli quality
+    Yields:
+        bytes: Compressed chunks
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            out = compressor.process(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            out = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if out:
+                yield out
+        yield compressor.flush()
+
+
+def _add_vary_header(response):
+    """
+    Mark the response as varying by Accept-Encoding so caches keep one copy
+    per encoding
+    Args:
+        response: Flask response object
+    """
+    vary = response.headers.get('Vary', '')
+    values = [value.strip() for value in vary.split(',') if value.strip()]
+    if 'accept-encoding' not in [value.lower() for value in values]:
+        values.append('Accept-Encoding')
+        response.headers['Vary'] = ', '.join(values)
+
+
+def init_compression(app):
+    """
+    Register the response compression hook on a Flask application
+    Args:
+        app: Flask application
+    """
+    min_size = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    gzip_level = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    brotli_quality = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+
+    @app.after_request
+    def compress_response(response):
+        """Compress the response body when the client supports it"""
+        # Skip responses that have no body or are already encoded
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if request.method == 'HEAD' or response.direct_passthrough:
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        # Responses of this type vary by encoding even when sent uncompressed
+        _add_vary_header(response)
+
+        encoding = choose_encoding(request.accept_encodings)
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            # Size is unknown up front, so only honour an explicit length
+            content_length = response.content_length
+            if content_length is not None and content_length < min_size:
+                return response
+
+            response.response = compress_stream(
+                response.response, encoding, gzip_level, brotli_quality
+            )
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+
+            response.set_data(compress_bytes(data, encoding, gzip_level, brotli_quality))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
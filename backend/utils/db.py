@@ -1,30 +1,722 @@
 """
 Database connection utilities for Menuda Finance API
+
+Writes always go to the primary. Read-only handlers ask for
+get_db_connection(readonly=True, user_id=...) and are routed to a read
+replica when one is configured, healthy and within the allowed lag;
+otherwise they fall back to the primary. A user whose write committed less
+than DB_STICKY_SECONDS ago reads from the primary (read-your-writes).
+
+A worker only knows the writes it committed itself, and the next read may
+land on another worker (or the ASGI app). So the client carries the window:
+a response to a request that wrote has an X-Last-Write header (the commit's
+wall-clock time), the frontend echoes its latest value on every request,
+and reads treat it like a local write. The value is not signed: a client
+that forges it can only send its own reads to the primary.
+
+Configuration (environment variables):
+    DB_HOST, DB_USER, DB_PASSWORD, DB_NAME: Primary connection settings
+    DB_POOL_SIZE: Connections per pool (default 5, 0 disables pooling)
+    DB_STATEMENT_CACHE_SIZE: Prepared statements kept per pooled session
+        (default 64, see InstrumentedConnection.execute_prepared)
+    DB_REPLICA_HOSTS: Comma-separated replica host[:port] list (optional;
+        replicas use the primary's user, password and database)
+    DB_REPLICA_MAX_LAG: Seconds of replication lag tolerated (default 2)
+    DB_REPLICA_CHECK_INTERVAL: Seconds between lag checks per replica (default 5)
+    DB_STICKY_SECONDS: Seconds after a user's write during which their reads
+        go to the primary (default 5)
 """
+import contextvars
+import itertools
 import os
+import threading
+import time
+from collections import OrderedDict
+from flask import request
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+from utils import metrics
+
+# Connection pool shared by all requests in this worker (created lazily)
+_pool = None
+_pool_lock = threading.Lock()
+
+# Optional override used by benchmarks and local stand-ins (see set_connection_factory)
+_connection_factory = None
+
+# Read replicas (created lazily from DB_REPLICA_HOSTS or the stand-in factories)
+_replicas = None
+_replica_factories = None
+_replica_lock = threading.Lock()
+_replica_cursor = itertools.count()
+
+# Last committed write per user (monotonic time), for read-your-writes
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+_RECENT_WRITES_PRUNE_SIZE = 10000
+
+_WRITE_OPERATIONS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Header carrying a client's last write between workers
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+# Per request: the client's last write (time.monotonic() of this worker) and
+# the wall-clock time of a write committed by the request itself
+_client_write = contextvars.ContextVar('client_write', default=None)
+_request_write = contextvars.ContextVar('request_write', default=None)
+
 
-def get_db_connection():
+class InstrumentedCursor:
+    """
+    Cursor wrapper that records statement timings in utils.metrics
+    """
+    def __init__(self, cursor, connection=None):
+        """
+        Initialize wrapper
+        Args:
+            cursor: MySQL cursor object
+            connection (InstrumentedConnection): Connection notified of writes
+        """
+        self._cursor = cursor
+        self._connection = connection
+
+    def _note_write(self, operation):
+        if self._connection is not None and isinstance(operation, str):
+            if operation.lstrip()[:7].upper().startswith(_WRITE_OPERATIONS):
+                self._connection.wrote = True
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        """
+        Execute a statement and record its latency
+        Args:
+            operation (str): SQL statement
+            params: Statement parameters
+        Returns:
+            Result of the underlying cursor's execute
+        """
+        self._note_write(operation)
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            metrics.record_query(operation, params, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        """
+        Execute a statement for every parameter set and record its latency
+        Args:
+            operation (str): SQL statement
+            seq_params: Sequence of parameter sets
+        Returns:
+            Result of the underlying cursor's executemany
+        """
+        self._note_write(operation)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            metrics.record_query(operation, None, time.perf_counter() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """
+    Connection wrapper that hands out instrumented cursors, tracks how many
+    connections are checked out and marks the user sticky when a write commits
+    """
+    def __init__(self, connection, user_id=None, target='primary'):
+        """
+        Initialize wrapper
+        Args:
+            connection: MySQL connection (pooled or direct)
+            user_id (str): User whose reads stick to the primary after a commit
+            target (str): 'primary' or the replica name
+        """
+        self._connection = connection
+        self._closed = False
+        self.user_id = user_id
+        self.target = target
+        self.wrote = False
+        metrics.db_connections_in_use.inc()
+
+    def cursor(self, *args, **kwargs):
+        """
+        Create an instrumented cursor
+        Returns:
+            InstrumentedCursor: Wrapped cursor
+        """
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self)
+
+    def commit(self):
+        """
+        Commit, then start the user's read-your-writes window if anything was written
+        """
+        self._connection.commit()
+        if self.wrote:
+            self.wrote = False
+            record_write(self.user_id)
+
+    def rollback(self):
+        """
+        Roll back the current transaction
+        """
+        self.wrote = False
+        self._connection.rollback()
+
+    def execute_prepared(self, statement, params=()):
+        """
+        Execute a statement as a server-side prepared statement
+        Pooled sessions outlive this wrapper, so each one prepares a statement
+        the first time it runs it and reuses the handle afterwards (up to
+        DB_STATEMENT_CACHE_SIZE statements, least recently used evicted).
+        Direct connections and stand-ins run the statement as usual.
+        Args:
+            statement (str): SQL statement with %s placeholders
+            params (tuple): Statement parameters
+        Returns:
+            InstrumentedCursor: Dictionary cursor holding the result; fetch
+                from it but do not close it (that deallocates the statement)
+        """
+        session = self._connection._cnx if isinstance(self._connection, pooling.PooledMySQLConnection) else None
+        if session is None:
+            cursor = self.cursor(dictionary=True)
+            cursor.execute(statement, params)
+            return cursor
+
+        # A reconnect (new connection_id) drops the session's statements
+        if getattr(session, 'prepared_connection_id', None) != session.connection_id:
+            session.prepared_statements = OrderedDict()
+            session.prepared_connection_id = session.connection_id
+        cache = session.prepared_statements
+
+        entry = cache.get(statement)
+        if entry is None:
+            entry = cache[statement] = (statement, session.cursor(prepared=True, dictionary=True))
+            if len(cache) > _setting('DB_STATEMENT_CACHE_SIZE', 64):
+                _, (_, evicted) = cache.popitem(last=False)
+                evicted.close()
+        else:
+            cache.move_to_end(statement)
+
+        # mysql-connector re-prepares unless it gets the same str object
+        prepared_statement, prepared_cursor = entry
+        cursor = InstrumentedCursor(prepared_cursor, self)
+        cursor.execute(prepared_statement, tuple(params))
+        return cursor
+
+    def close(self):
+        """
+        Close the connection (returns it to the pool when pooled)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        metrics.db_connections_in_use.dec()
+        try:
+            # Pools do not reset sessions (prepared statements would go with
+            # them), so end a transaction left open, e.g. by a read
+            if isinstance(self._connection, pooling.PooledMySQLConnection) and self._connection.in_transaction:
+                self._connection.rollback()
+            self._connection.close()
+        except Error as err:
+            print(f"Error closing database connection: {err}")
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def _connection_config():
+    """
+    Get connection settings from environment variables
+    Returns:
+        dict: Keyword arguments for mysql.connector
+    """
+    return {
+        'host': os.getenv('DB_HOST'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME', 'menuda_finance'),
+    }
+
+
+def _setting(name, default):
+    """
+    Read a numeric setting from the environment
+    Args:
+        name (str): Environment variable
+        default (float): Value when unset
+    Returns:
+        float: Setting value
+    """
+    return float(os.getenv(name, default))
+
+
+def set_connection_factory(factory, replica_factories=None):
+    """
+    Replace how raw connections are opened (e.g. with a local stand-in)
+    Args:
+        factory: Callable returning a DB-API connection with a MySQL-style
+            cursor(dictionary=True), or None to restore the default
+        replica_factories (list): Callables opening read replica connections
+            (optional; they must answer SHOW REPLICA STATUS)
+    """
+    global _connection_factory, _replica_factories, _replicas
+    _connection_factory = factory
+    with _replica_lock:
+        _replica_factories = list(replica_factories) if replica_factories else None
+        _replicas = None
+
+
+def _create_pool(pool_name, config):
+    """
+    Create a connection pool
+    Args:
+        pool_name (str): Pool name (unique per worker)
+        config (dict): Keyword arguments for mysql.connector
+    Returns:
+        MySQLConnectionPool: Pool, or None when pooling is disabled (DB_POOL_SIZE=0)
+    """
+    pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+    if pool_size <= 0:
+        return None
+    # No session reset on return: it would drop the prepared statements
+    # (InstrumentedConnection.close rolls back open transactions instead)
+    pool = pooling.MySQLConnectionPool(
+        pool_name=pool_name, pool_size=pool_size, pool_reset_session=False, **config
+    )
+    metrics.db_pool_size.set(pool_size)
+    return pool
+
+
+def _get_pool():
+    """
+    Get the worker's primary connection pool, creating it on first use
+    Returns:
+        MySQLConnectionPool: Pool, or None when pooling is disabled (DB_POOL_SIZE=0)
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    if int(os.getenv('DB_POOL_SIZE', '5')) <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = _create_pool('menuda', _connection_config())
+    return _pool
+
+
+def warm_pool():
+    """
+    Open the primary pool and check each of its connections, so a new
+    worker's first requests do not pay for connecting
+    Returns:
+        int: Connections checked (0 with pooling disabled or a stand-in factory)
+    Raises:
+        Exception: Database connection error
+    """
+    if _connection_factory is not None:
+        return 0
+    pool = _get_pool()
+    if pool is None:
+        return 0
+
+    # Hold them all at once so every pooled connection is visited
+    held = []
+    try:
+        for _ in range(pool.pool_size):
+            connection = get_db_connection()
+            held.append(connection)
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchall()
+            cursor.close()
+    finally:
+        for connection in held:
+            close_connection(connection)
+    return len(held)
+
+
+def reset_pools():
+    """
+    Close the idle pooled connections and forget the pools, which are
+    recreated on next use. Call it in a preloading server's master before
+    forking: sockets inherited by several workers would interleave traffic
+    """
+    global _pool, _replicas
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool._remove_connections()
+    # Replica pools live in their openers; dropping them closes their
+    # connections when collected
+    with _replica_lock:
+        _replicas = None
+
+
+def _connect(pool, config, source, start):
+    """
+    Take a connection from a pool, or open a direct one when the pool is
+    disabled or exhausted
+    Args:
+        pool: MySQLConnectionPool or None
+        config (dict): Keyword arguments for mysql.connector
+        source (str): Label for db_connect_duration ('pool' is added when pooled)
+        start (float): perf_counter() when the request for a connection started
+    Returns:
+        Connection: Raw MySQL connection
+    """
+    if pool is not None:
+        try:
+            connection = pool.get_connection()
+            metrics.db_connect_duration.observe(time.perf_counter() - start, source=source + 'pool')
+            return connection
+        except PoolError:
+            # Pool saturated: count it and open an extra connection
+            metrics.db_pool_exhausted.inc()
+
+    connection = mysql.connector.connect(**config)
+    metrics.db_connect_duration.observe(time.perf_counter() - start, source=source + 'direct')
+    return connection
+
+
+class Replica:
+    """
+    A read replica: how to open connections to it and its last lag check
+    """
+    def __init__(self, name, open_connection):
+        """
+        Initialize replica
+        Args:
+            name (str): Name used in metrics (e.g. the host)
+            open_connection: Callable returning a raw connection
+        """
+        self.name = name
+        self._open_connection = open_connection
+        self.healthy = True
+        self.lag = None
+        self.checked_at = None
+        self._check_lock = threading.Lock()
+
+    def connect(self):
+        """
+        Open (or take from the pool) a raw connection
+        Returns:
+            Connection: Raw connection to the replica
+        """
+        return self._open_connection()
+
+    def check_due(self, now):
+        """
+        Whether the lag check interval has elapsed
+        Args:
+            now (float): time.monotonic()
+        Returns:
+            bool: True when the replica should be checked again
+        """
+        return self.checked_at is None or now - self.checked_at >= _setting('DB_REPLICA_CHECK_INTERVAL', 5)
+
+    def check(self, connection, now):
+        """
+        Measure replication lag on a connection to this replica
+        Only one thread checks at a time; the others keep the last result.
+        Args:
+            connection: Raw connection to the replica
+            now (float): time.monotonic()
+        Returns:
+            bool: Whether the replica may serve reads
+        """
+        if not self._check_lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            self.lag = _replication_lag(connection)
+            self.healthy = self.lag is not None and self.lag <= _setting('DB_REPLICA_MAX_LAG', 2)
+            self.checked_at = now
+            metrics.db_replica_lag.set(-1 if self.lag is None else self.lag, replica=self.name)
+            metrics.db_replica_healthy.set(1 if self.healthy else 0, replica=self.name)
+            return self.healthy
+        finally:
+            self._check_lock.release()
+
+    def mark_down(self, now):
+        """
+        Skip this replica until the next check interval (e.g. it refused a connection)
+        Args:
+            now (float): time.monotonic()
+        """
+        self.healthy = False
+        self.checked_at = now
+        metrics.db_replica_healthy.set(0, replica=self.name)
+
+
+def _replication_lag(connection):
+    """
+    Read Seconds_Behind_Source from a replica
+    Args:
+        connection: Raw connection to the replica
+    Returns:
+        float: Lag in seconds, or None when replication is not running
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except Error:
+            # MySQL before 8.0.22 and MariaDB
+            cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if not row:
+        return None
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+
+def _replica_config(address):
+    """
+    Connection settings for a replica
+    Args:
+        address (str): host or host:port
+    Returns:
+        dict: Keyword arguments for mysql.connector
+    """
+    config = _connection_config()
+    host, _, port = address.strip().partition(':')
+    config['host'] = host
+    if port:
+        config['port'] = int(port)
+    return config
+
+
+def _pooled_opener(index, address):
+    """
+    Build the connection opener for a replica from DB_REPLICA_HOSTS
+    Args:
+        index (int): Position in DB_REPLICA_HOSTS (names the pool)
+        address (str): host or host:port
+    Returns:
+        callable: Returns a raw connection to the replica
+    """
+    config = _replica_config(address)
+    pool = _create_pool(f'menuda_replica_{index}', config)
+    return lambda: _connect(pool, config, 'replica_', time.perf_counter())
+
+
+def _get_replicas():
+    """
+    Get the worker's read replicas, creating their pools on first use
+    Returns:
+        list: Replica objects (empty when none are configured)
+    """
+    global _replicas
+    if _replicas is not None:
+        return _replicas
+
+    with _replica_lock:
+        if _replicas is None:
+            if _replica_factories is not None:
+                _replicas = [
+                    Replica(f'replica{index}', factory)
+                    for index, factory in enumerate(_replica_factories)
+                ]
+            elif _connection_factory is not None:
+                _replicas = []
+            else:
+                addresses = [
+                    address for address in os.getenv('DB_REPLICA_HOSTS', '').split(',') if address.strip()
+                ]
+                _replicas = [
+                    Replica(address.strip(), _pooled_opener(index, address))
+                    for index, address in enumerate(addresses)
+                ]
+    return _replicas
+
+
+def record_write(user_id):
+    """
+    Start a user's read-your-writes window (their reads go to the primary)
+    Args:
+        user_id (str): User whose write just committed (ignored when None)
+    """
+    if not user_id:
+        return
+    _request_write.set(time.time())
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[user_id] = now
+        if len(_recent_writes) > _RECENT_WRITES_PRUNE_SIZE:
+            window = _setting('DB_STICKY_SECONDS', 5)
+            expired = [key for key, at in _recent_writes.items() if now - at >= window]
+            for key in expired:
+                del _recent_writes[key]
+
+
+def last_write(user_id):
+    """
+    When a user last committed a write, in this worker or as reported by the
+    client of the current request (X-Last-Write)
+    Args:
+        user_id (str): User ID
+    Returns:
+        float: time.monotonic() of the commit, or None when not recent
+    """
+    if not user_id:
+        return None
+    written = [at for at in (_recent_writes.get(user_id), _client_write.get()) if at is not None]
+    return max(written) if written else None
+
+
+def begin_request(headers):
+    """
+    Start a request's read-your-writes state from the X-Last-Write it echoes
+    Args:
+        headers: Request headers
+    """
+    _request_write.set(None)
+    _client_write.set(None)
+    try:
+        written_at = float(headers.get(LAST_WRITE_HEADER) or '')
+    except ValueError:
+        return
+    # Clocks may differ a little between servers; a future value counts as now
+    age = max(0.0, time.time() - written_at)
+    if age < _setting('DB_STICKY_SECONDS', 5):
+        _client_write.set(time.monotonic() - age)
+
+
+def last_write_header():
+    """
+    X-Last-Write value for the response of the current request
+    Returns:
+        str: Wall-clock time of the request's last commit, or None when it
+            did not write
+    """
+    written_at = _request_write.get()
+    return None if written_at is None else f'{written_at:.3f}'
+
+
+def init_read_your_writes(app):
+    """
+    Register the X-Last-Write exchange on a Flask application
+    Args:
+        app: Flask application
+    """
+    @app.before_request
+    def read_last_write():
+        """Apply the client's last write to this request's reads"""
+        begin_request(request.headers)
+
+    @app.after_request
+    def send_last_write(response):
+        """Tell the client when this request's write committed"""
+        header = last_write_header()
+        if header:
+            response.headers[LAST_WRITE_HEADER] = header
+        return response
+
+
+def is_sticky(user_id):
+    """
+    Whether a user wrote recently enough that replicas may not have the write
+    Args:
+        user_id (str): User ID
+    Returns:
+        bool: True when the user's reads must go to the primary
+    """
+    if not user_id:
+        return False
+    written_at = last_write(user_id)
+    return written_at is not None and time.monotonic() - written_at < _setting('DB_STICKY_SECONDS', 5)
+
+
+def _replica_connection(user_id):
+    """
+    Open a connection to a healthy replica for a read-only handler
+    Args:
+        user_id (str): User the read is for (sticky users get None)
+    Returns:
+        tuple: (Replica, raw connection, reason); Replica and connection are
+            None when the primary must serve the read
+    """
+    replicas = _get_replicas()
+    if not replicas:
+        return None, None, 'no_replicas'
+    if is_sticky(user_id):
+        return None, None, 'sticky'
+
+    now = time.monotonic()
+    first = next(_replica_cursor)
+    for offset in range(len(replicas)):
+        replica = replicas[(first + offset) % len(replicas)]
+        due = replica.check_due(now)
+        if not replica.healthy and not due:
+            continue
+        try:
+            connection = replica.connect()
+        except Exception as err:
+            print(f"Read replica {replica.name} unavailable: {err}")
+            replica.mark_down(now)
+            continue
+        try:
+            usable = replica.check(connection, now) if due else True
+        except Exception as err:
+            print(f"Replica lag check failed on {replica.name}: {err}")
+            replica.mark_down(now)
+            usable = False
+        if usable:
+            return replica, connection, 'replica'
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return None, None, 'unhealthy'
+
+
+def get_db_connection(readonly=False, user_id=None):
     """
     Create and return a database connection
+    Uses the connection pool when available and falls back to a direct
+    connection when the pool is exhausted
+    Args:
+        readonly (bool): The caller only reads, so a replica may serve it
+        user_id (str): User the request acts for; reads stick to the primary
+            after their writes, and commits with writes start that window
     Returns:
         Connection: MySQL database connection
     Raises:
         Exception: Database connection error
     """
+    start = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_NAME', 'menuda_finance')
-        )
-        return connection
+        if readonly:
+            replica, connection, reason = _replica_connection(user_id)
+            if replica is not None:
+                metrics.db_read_routing.inc(target='replica', reason=reason)
+                return InstrumentedConnection(connection, user_id, target=replica.name)
+            metrics.db_read_routing.inc(target='primary', reason=reason)
+
+        if _connection_factory is not None:
+            connection = _connection_factory()
+            metrics.db_connect_duration.observe(time.perf_counter() - start, source='factory')
+            return InstrumentedConnection(connection, user_id)
+
+        connection = _connect(_get_pool(), _connection_config(), '', start)
+        return InstrumentedConnection(connection, user_id)
     except Error as err:
         print(f"Database connection error: {err}")
         raise Exception(f"Database connection failed: {err}")
 
+
 def close_connection(connection, cursor=None):
     """
     Safely close database connection and cursor
@@ -34,5 +726,7 @@ def close_connection(connection, cursor=None):
     """
     if cursor:
         cursor.close()
-    if connection and connection.is_connected():
-        connection.close()
\ No newline at end of file
+    if connection:
+        # Always close: pooled connections must be returned even if the
+        # server dropped them, otherwise the pool slot leaks
+        connection.close()
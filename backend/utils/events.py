@@ -0,0 +1,73 @@
+"""
+In-process event bus for Menuda Finance API
+
+Write handlers emit domain events (e.g. a budget crossing a threshold) after
+their transaction commits; subscribers react without the handler knowing
+about them. Handlers run synchronously in the emitting thread, so they must
+be quick; a failing handler is logged and never breaks the request.
+"""
+import threading
+from collections import defaultdict
+from utils.metrics import registry
+
+# Subscribe to this event type to receive every event
+ALL_EVENTS = '*'
+
+events_emitted = registry.counter(
+    'menuda_events_emitted_total',
+    'Domain events emitted by write handlers',
+    ('event_type',)
+)
+
+_subscribers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def subscribe(event_type, handler):
+    """
+    Register a handler for an event type
+    Args:
+        event_type (str): Event type, or ALL_EVENTS
+        handler: Callable taking (event_type, payload)
+    """
+    with _lock:
+        _subscribers[event_type].append(handler)
+
+
+def unsubscribe(event_type, handler):
+    """
+    Remove a previously registered handler
+    Args:
+        event_type (str): Event type, or ALL_EVENTS
+        handler: Handler passed to subscribe()
+    """
+    with _lock:
+        if handler in _subscribers.get(event_type, ()):
+            _subscribers[event_type].remove(handler)
+
+
+def emit(event_type, payload):
+    """
+    Deliver an event to its subscribers
+    Args:
+        event_type (str): Event type (e.g. 'budget.threshold_crossed')
+        payload (dict): Event data
+    """
+    events_emitted.inc(event_type=event_type)
+    with _lock:
+        handlers = list(_subscribers.get(event_type, ())) + list(_subscribers.get(ALL_EVENTS, ()))
+    for handler in handlers:
+        try:
+            handler(event_type, payload)
+        except Exception as e:
+            print(f"Error in {event_type} event handler: {e}")
+
+
+def emit_all(events):
+    """
+    Deliver a list of (event_type, payload) pairs in order
+    Args:
+        events (list): Events collected while handling a request
+    """
+    for event_type, payload in events or ():
+        emit(event_type, payload)
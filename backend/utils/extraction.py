@@ -0,0 +1,493 @@
+"""
+Invoice extraction output parsing for Menuda Finance API
+
+The remote model is asked for structured output (INVOICE_SCHEMA as an OpenAI
+json_schema response format) and streamed: ChatCompletionStream reads the
+server-sent chunks and stops as soon as the top-level JSON object closes.
+Whatever arrives is then repaired locally (code fences, single quotes,
+unquoted keys and values, trailing commas, truncation) rather than paying
+for another extraction call, and validated against the compiled schema,
+which normalizes amounts ("1.234,56", "$ 25.000") and dates (day-first
+numeric dates, Spanish and English month names) into the values the
+transaction routes accept.
+"""
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+# Fields the extraction engines return. Sent to the model as the response
+# format, and compiled into validate_invoice below
+INVOICE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'title': {'type': 'string', 'description': 'Short description of the purchase'},
+        'amount': {'type': 'number', 'description': 'Total paid'},
+        'date': {'type': 'string', 'format': 'date', 'description': 'Transaction date, YYYY-MM-DD'},
+        'vendor': {'type': 'string', 'description': 'Store or company name'},
+        'category': {'type': 'string', 'description': 'Spending category'},
+    },
+    'required': ['title', 'amount', 'date', 'vendor', 'category'],
+    'additionalProperties': False,
+}
+
+# Month names and abbreviations (Spanish, then English), by their first three letters
+_MONTHS = {
+    'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'sep': 9, 'set': 9, 'oct': 10, 'nov': 11, 'dic': 12,
+    'jan': 1, 'apr': 4, 'aug': 8, 'dec': 12,
+}
+
+_MONTH = r'([a-záéíóú]{3,10})\.?'
+_ISO_DATE = re.compile(r'\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?!\d)')
+_NUMERIC_DATE = re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})(?!\d)')
+# '5 de marzo de 2025', '05-mar-2025', '5 Mar 2025'
+_DAY_MONTH_DATE = re.compile(
+    r'\b(\d{1,2})(?:\s+de\s+|[\s\-/]+)' + _MONTH + r'(?:\s+de\s+|\s+del\s+|[\s\-/,]+)(\d{4})\b', re.IGNORECASE
+)
+# 'marzo 5, 2025', 'March 5 2025'
+_MONTH_DAY_DATE = re.compile(r'\b' + _MONTH + r'\s+(\d{1,2}),?\s+(\d{4})\b', re.IGNORECASE)
+
+# Currency markers stripped before parsing an amount
+_CURRENCY = re.compile(r'(?i)cop|usd|eur|col\$|us\$|[$€\s ]')
+
+# Digits that can precede a thousands group
+_GROUP_LEAD = re.compile(r'-?[1-9]\d{0,2}')
+
+# JSON numbers that read as thousands when written as a string ('25.000')
+_GROUPED_NUMBER = re.compile(r'-?[1-9]\d{0,2}\.\d{3}')
+
+
+def parse_amount(token):
+    """
+    Parse an amount written with either decimal separator
+    Args:
+        token (str): Digits with '.'/',' separators (e.g. '25.000', '1,234.50', '12,50')
+    Returns:
+        Decimal: Amount, or None if the token is not a number
+    """
+    token = token.strip()
+    if '.' in token and ',' in token:
+        # The last separator is the decimal one
+        decimal_sep = '.' if token.rfind('.') > token.rfind(',') else ','
+        thousands_sep = ',' if decimal_sep == '.' else '.'
+        token = token.replace(thousands_sep, '').replace(decimal_sep, '.')
+    else:
+        for sep in ('.', ','):
+            if sep in token:
+                parts = token.split(sep)
+                # '25.000' and '1.234.567' group thousands; '12,50' and
+                # '0.125' have decimals (a group follows 1-3 digits, not 0)
+                if len(parts) > 2 or (len(parts[-1]) == 3 and _GROUP_LEAD.fullmatch(parts[0])):
+                    token = token.replace(sep, '')
+                else:
+                    token = token.replace(sep, '.')
+    try:
+        amount = Decimal(token)
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def normalize_amount(value):
+    """
+    Normalize an extracted amount
+    Args:
+        value: Number, or text such as '$ 1.234,56', 'COP 25.000' or '(12.50)'
+    Returns:
+        Decimal: Amount, or None when it cannot be read
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        amount = Decimal(str(value))
+        return amount if amount.is_finite() else None
+    text = _CURRENCY.sub('', str(value))
+    negative = text.startswith('-') or (text.startswith('(') and text.endswith(')'))
+    text = text.strip('-()+')
+    if not re.fullmatch(r'\d[\d.,]*', text):
+        return None
+    amount = parse_amount(text)
+    if amount is None:
+        return None
+    return -amount if negative else amount
+
+
+def _json_number(token):
+    """
+    parse_float for extraction output: a bare 25.000 is read like "25.000",
+    so an amount does not depend on whether the model quoted it
+    """
+    return parse_amount(token) if _GROUPED_NUMBER.fullmatch(token) else Decimal(token)
+
+
+def _month(name):
+    return _MONTHS.get(name[:3].lower().replace('é', 'e'))
+
+
+def _valid_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_candidates(text):
+    """
+    Dates in the text as (position, date), day-first for numeric dates (as
+    printed in Colombia) unless only month-first is valid
+    """
+    for match in _ISO_DATE.finditer(text):
+        found = _valid_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        if found:
+            yield match.start(), found
+    for match in _NUMERIC_DATE.finditer(text):
+        first, second, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        year += 2000 if year < 100 else 0
+        found = _valid_date(year, second, first) or _valid_date(year, first, second)
+        if found:
+            yield match.start(), found
+    for match in _DAY_MONTH_DATE.finditer(text):
+        found = _valid_date(int(match.group(3)), _month(match.group(2)), int(match.group(1)))
+        if found:
+            yield match.start(), found
+    for match in _MONTH_DAY_DATE.finditer(text):
+        found = _valid_date(int(match.group(3)), _month(match.group(1)), int(match.group(2)))
+        if found:
+            yield match.start(), found
+
+
+def find_date(text):
+    """
+    First date written in a text
+    Args:
+        text (str): Free text (e.g. OCR'd receipt)
+    Returns:
+        date: Date, or None
+    """
+    candidates = sorted(_date_candidates(text), key=lambda candidate: candidate[0])
+    return candidates[0][1] if candidates else None
+
+
+def normalize_date(value):
+    """
+    Normalize an extracted date
+    Args:
+        value: date/datetime, or text such as '2025-03-14', '14/03/2025' or
+            '5 de marzo de 2025'
+    Returns:
+        date: Date, or None when it cannot be read
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    return find_date(value.strip())
+
+
+def _normalize_text(value):
+    if value is None or isinstance(value, (dict, list, bool)):
+        return None
+    text = ' '.join(str(value).split())
+    return text or None
+
+
+def compile_schema(schema):
+    """
+    Compile an object schema into a validating normalizer. Each property gets
+    its normalizer once (number: normalize_amount, date strings:
+    normalize_date, strings: whitespace-collapsed text), so validating a
+    result is one call per field
+    Args:
+        schema (dict): JSON schema with type 'object' and flat properties
+    Returns:
+        callable: Takes a decoded object, returns (normalized dict, list of
+        invalid or missing field names). Invalid fields are '' in the dict
+        and properties not in the schema are dropped
+    Raises:
+        ValueError: If a property type is not supported
+    """
+    fields = []
+    for name, spec in schema['properties'].items():
+        if spec.get('type') == 'number':
+            fields.append((name, normalize_amount, float))
+        elif spec.get('type') == 'string' and spec.get('format') == 'date':
+            fields.append((name, normalize_date, date.isoformat))
+        elif spec.get('type') == 'string':
+            fields.append((name, _normalize_text, str))
+        else:
+            raise ValueError(f"Unsupported schema type for {name}: {spec.get('type')}")
+    fields = tuple(fields)
+
+    def validate(obj):
+        if not isinstance(obj, dict):
+            return {name: '' for name, _, _ in fields}, [name for name, _, _ in fields]
+        data = {}
+        invalid = []
+        for name, normalize, to_json in fields:
+            value = normalize(obj.get(name))
+            if value is None:
+                data[name] = ''
+                invalid.append(name)
+            else:
+                data[name] = to_json(value)
+        return data, invalid
+
+    return validate
+
+
+validate_invoice = compile_schema(INVOICE_SCHEMA)
+
+
+# Bare words the model writes for JSON literals
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null'}
+_BARE_NUMBER = re.compile(r'-?\d+(?:[.,]\d+)*')
+_JSON_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+
+def repair_json(text):
+    """
+    Rewrite almost-JSON into JSON: keeps the first object, drops code fences
+    and surrounding prose, converts single-quoted strings, quotes bare keys
+    and bare values, maps Python literals, removes trailing commas and
+    closes whatever a truncated response left open
+    Args:
+        text (str): Model output
+    Returns:
+        str: JSON text (may still be invalid if the input is hopeless)
+    Raises:
+        ValueError: If the text contains no object
+    """
+    start = text.find('{')
+    if start < 0:
+        raise ValueError("No JSON object found in response")
+
+    out = []
+    stack = []
+    position = start
+    length = len(text)
+    # Whether the last token ran into the end of the text
+    cut = False
+    while position < length:
+        char = text[position]
+        if char in '"\'':
+            # String: re-emit double-quoted, up to the matching quote or the end
+            quote = char
+            position += 1
+            chars = []
+            while position < length and text[position] != quote:
+                if text[position] == '\\' and position + 1 < length:
+                    chars.append(text[position:position + 2])
+                    position += 2
+                    continue
+                chars.append('\\"' if text[position] == '"' else text[position])
+                position += 1
+            out.append('"' + ''.join(chars).replace("\\'", "'").replace('\n', '\\n') + '"')
+            cut = position >= length
+            position += 1
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            out.append(char)
+            position += 1
+        elif char in '}]':
+            if not stack:
+                break
+            _drop_trailing_comma(out)
+            out.append(stack.pop())
+            position += 1
+            if not stack:
+                break
+        elif char in ',:':
+            out.append(char)
+            position += 1
+        elif char.isspace():
+            position += 1
+        else:
+            # Bare token: a number, a literal, a key or an unquoted value
+            number = _BARE_NUMBER.match(text, position)
+            if number and not text[number.end():number.end() + 1].isalpha():
+                token = number.group(0).rstrip(',')
+                position += len(token)
+                cut = position >= length
+                # JSON numbers stay bare (parse_extraction reads 25.000 as a
+                # thousands group); others ('25,000', '1.234.567') are
+                # quoted so normalize_amount reads them
+                out.append(token if _JSON_NUMBER.fullmatch(token) else json.dumps(token))
+                continue
+            end = position
+            while end < length and text[end] not in ',:{}[]"\n':
+                end += 1
+            token = text[position:end].strip()
+            position = end
+            cut = position >= length
+            if not token:
+                position += 1
+                continue
+            out.append(_LITERALS.get(token, json.dumps(token)))
+
+    if stack:
+        # Truncated response: drop the last member if it is incomplete (a cut
+        # value may read as a wrong amount or name) or has no value yet
+        _drop_trailing_comma(out)
+        if out and out[-1] == ':':
+            del out[-2:]
+        elif cut and len(out) >= 3 and out[-2] == ':':
+            del out[-3:]
+        elif stack[-1] == '}' and len(out) >= 2 and out[-1].startswith('"') and out[-2] in ',{':
+            out.pop()
+        _drop_trailing_comma(out)
+        while stack:
+            out.append(stack.pop())
+    return ''.join(out)
+
+
+def _drop_trailing_comma(out):
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def parse_extraction(text):
+    """
+    Decode and validate a model's extraction output
+    Args:
+        text (str): Model output (JSON, possibly fenced, wrapped or malformed)
+    Returns:
+        tuple: (dict with every INVOICE_SCHEMA field, list of invalid or
+        missing field names)
+    Raises:
+        ValueError: If no JSON object can be recovered
+    """
+    try:
+        obj = json.loads(text, parse_float=_json_number)
+    except json.JSONDecodeError:
+        try:
+            obj = json.loads(repair_json(text), parse_float=_json_number)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Unable to parse JSON from response: {e}")
+    return validate_invoice(obj)
+
+
+class JSONObjectStream:
+    """
+    Incremental scanner over streamed text that tells when the first
+    top-level JSON object is complete, so the caller can stop reading
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = None
+        self._escaped = False
+
+    def feed(self, chunk):
+        """
+        Add streamed text
+        Args:
+            chunk (str): Next piece of the output
+        Returns:
+            bool: True once the first object has closed
+        """
+        if self.complete:
+            return True
+        for index, char in enumerate(chunk):
+            if not self.started:
+                if char != '{':
+                    continue
+                self.started = True
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == self._in_string:
+                    self._in_string = None
+            elif char in '"\'':
+                self._in_string = char
+            elif char in '{[':
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.parts.append(chunk[:index + 1])
+                    self.complete = True
+                    return True
+        self.parts.append(chunk)
+        return False
+
+    def text(self):
+        """
+        Returns:
+            str: Everything fed so far, up to the end of the object when complete
+        """
+        return ''.join(self.parts)
+
+
+class ChatCompletionStream:
+    """
+    Reader for a streamed OpenAI chat completion (server-sent events). Feed it
+    the response lines; it collects the message deltas and reports when the
+    JSON object is complete. A non-streamed JSON body is accepted too
+    """
+
+    def __init__(self):
+        self.content = JSONObjectStream()
+        self._raw = []
+        self.finish_reason = None
+
+    def feed_line(self, line):
+        """
+        Add one response line
+        Args:
+            line (str|bytes): Line without its terminator
+        Returns:
+            bool: True when there is nothing more to read
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.startswith('data:'):
+            # Event-stream comments are ignored; anything else is a plain body
+            if line and not line.startswith(':'):
+                self._raw.append(line)
+            return False
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return True
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            return False
+        for choice in chunk.get('choices') or []:
+            self.finish_reason = choice.get('finish_reason') or self.finish_reason
+            delta = (choice.get('delta') or {}).get('content')
+            if delta and self.content.feed(delta):
+                return True
+        return False
+
+    def text(self):
+        """
+        Returns:
+            str: The model's message content
+        Raises:
+            ValueError: If the response carried no content
+        """
+        text = self.content.text()
+        if text:
+            return text
+        if self._raw:
+            try:
+                return json.loads('\n'.join(self._raw))['choices'][0]['message']['content']
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError):
+                pass
+        raise ValueError("Empty extraction response")
+
+    def result(self):
+        """
+        Parse and validate the streamed output
+        Returns:
+            tuple: (dict with every INVOICE_SCHEMA field, list of invalid or missing field names)
+        """
+        return parse_extraction(self.text())
@@ -0,0 +1,232 @@
+"""
+Month-end spending forecast for Menuda Finance API
+
+A user's daily totals per category are loaded with one grouped query and
+laid out as a (categories x days) NumPy matrix. Every statistic below is a
+whole-matrix operation:
+
+    spent_to_date   actual spend from the 1st of the month to the reference day
+    scheduled       transactions already dated later this month (e.g. recurring)
+    recent rate     28-day moving average daily spend x days left in the month
+    history         average spend after this day of the month over the last
+                    FORECAST_HISTORY_MONTHS complete months
+    seasonality     this calendar month's average vs. the average month, from
+                    previous years (clipped to [0.5, 2])
+
+projected_remaining = max(scheduled, mean(recent rate, history) x seasonality)
+
+Results are cached per worker and (user, day) for FORECAST_CACHE_TTL
+seconds. A write drops the user's cached forecast only in the process that
+made it; other workers recompute it when the client reports a write newer
+than their entry (utils.db.last_write), and otherwise serve it at most
+that long after the write.
+"""
+import datetime
+import os
+import time
+from utils.cache import LRUCache
+from utils.db import get_db_connection, close_connection, last_write
+
+# Days of history loaded (three years gives two previous same-month samples)
+FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 1096))
+
+# Complete months averaged for the day-of-month profile
+FORECAST_HISTORY_MONTHS = int(os.environ.get('FORECAST_HISTORY_MONTHS', 6))
+
+# Moving average window for the recent daily rate
+MOVING_AVERAGE_DAYS = 28
+
+SEASONALITY_BOUNDS = (0.5, 2.0)
+
+# Cached forecast per (user_id, date)
+FORECAST_CACHE_TTL = float(os.environ.get('FORECAST_CACHE_TTL', 60))
+_forecast_cache = LRUCache(max_entries=int(os.environ.get('FORECAST_CACHE_SIZE', 2000)), ttl=FORECAST_CACHE_TTL)
+
+DAILY_TOTALS_QUERY = """
+SELECT
+    t.category_id,
+    c.category_name,
+    t.transaction_date,
+    SUM(t.amount) AS total
+FROM
+    transactions t
+    JOIN categories c ON t.category_id = c.category_id
+WHERE
+    t.user_id = %s
+    AND t.is_deleted = FALSE
+    AND t.transaction_date BETWEEN %s AND %s
+GROUP BY
+    t.category_id,
+    c.category_name,
+    t.transaction_date
+"""
+
+
+def _month_end(on_date):
+    next_month = (on_date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+    return next_month - datetime.timedelta(days=1)
+
+
+def compute_forecast(rows, on_date):
+    """
+    Project month-end spend per category from daily totals
+    Args:
+        rows (list): Dicts with category_id, category_name, transaction_date, total
+        on_date (datetime.date): Reference day (its month is forecast)
+    Returns:
+        list: One dict per category, highest projected total first
+    """
+    if not rows:
+        return []
+
+    # numpy is imported on first use, keeping it out of worker boot
+    import numpy as np
+
+    month_start = on_date.replace(day=1)
+    month_end = _month_end(on_date)
+    first_day = np.datetime64(on_date - datetime.timedelta(days=FORECAST_HISTORY_DAYS), 'D')
+    day_count = int((np.datetime64(month_end, 'D') - first_day).astype(np.int64)) + 1
+
+    # Category codes and day offsets are built in one pass over the rows;
+    # converting date objects through numpy is several times slower
+    codes = {}
+    names = {}
+    row_count = len(rows)
+    category_codes = np.empty(row_count, dtype=np.int64)
+    day_index = np.empty(row_count, dtype=np.int64)
+    totals = np.empty(row_count, dtype=np.float64)
+    first_ordinal = first_day.astype(datetime.date).toordinal()
+    for position, row in enumerate(rows):
+        category_id = str(row['category_id'])
+        code = codes.get(category_id)
+        if code is None:
+            code = codes[category_id] = len(codes)
+            names[category_id] = row['category_name']
+        category_codes[position] = code
+        day_index[position] = row['transaction_date'].toordinal() - first_ordinal
+        totals[position] = row['total']
+    category_ids = list(codes)
+
+    # Dense (categories x days) matrix of daily spend
+    category_total = len(category_ids)
+    daily = np.bincount(
+        category_codes * day_count + day_index, weights=totals, minlength=category_total * day_count
+    ).reshape(category_total, day_count)
+
+    dates = first_day + np.arange(day_count)
+    months = dates.astype('datetime64[M]')
+    day_of_month = (dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+    today_index = int((np.datetime64(on_date, 'D') - first_day).astype(np.int64))
+    current_start = int((np.datetime64(month_start, 'D') - first_day).astype(np.int64))
+
+    spent_to_date = daily[:, current_start:today_index + 1].sum(axis=1)
+    scheduled = daily[:, today_index + 1:].sum(axis=1)
+    days_left = (month_end - on_date).days
+
+    # Recent rate over the last MOVING_AVERAGE_DAYS days up to the reference day
+    window = daily[:, max(0, today_index + 1 - MOVING_AVERAGE_DAYS):today_index + 1]
+    recent = window.sum(axis=1) / MOVING_AVERAGE_DAYS * days_left
+
+    # Complete months before the current one (the first loaded month is
+    # usually partial and is skipped)
+    month_starts = np.flatnonzero(np.concatenate(([True], months[1:] != months[:-1])))
+    complete = month_starts[month_starts < current_start]
+    if day_of_month[0] != 1:
+        complete = complete[1:]
+
+    if len(complete):
+        # Per complete month: total spend and spend after the reference day of month
+        past = daily[:, complete[0]:current_start]
+        offsets = complete - complete[0]
+        monthly_totals = np.add.reduceat(past, offsets, axis=1)
+        after_day = np.where(day_of_month[complete[0]:current_start] > on_date.day, past, 0.0)
+        monthly_rest = np.add.reduceat(after_day, offsets, axis=1)
+        history = monthly_rest[:, -FORECAST_HISTORY_MONTHS:].mean(axis=1)
+        projected = (recent + history) / 2
+
+        # Seasonality: same calendar month in previous years vs. the average month
+        complete_months = months[complete].astype(np.int64) % 12
+        same_month = complete_months == (on_date.month - 1)
+        average_month = monthly_totals.mean(axis=1)
+        if same_month.any():
+            same_month_average = monthly_totals[:, same_month].mean(axis=1)
+            seasonality = np.divide(
+                same_month_average, average_month,
+                out=np.ones(category_total), where=average_month > 0
+            )
+            seasonality = np.clip(seasonality, *SEASONALITY_BOUNDS)
+        else:
+            seasonality = np.ones(category_total)
+        last_month = monthly_totals[:, -1]
+    else:
+        projected = recent
+        seasonality = np.ones(category_total)
+        average_month = np.zeros(category_total)
+        last_month = np.zeros(category_total)
+
+    projected_remaining = np.maximum(scheduled, projected * seasonality)
+    projected_total = spent_to_date + projected_remaining
+
+    order = np.argsort(-projected_total, kind='stable')
+    return [
+        {
+            'category_id': category_ids[index],
+            'category_name': names[category_ids[index]],
+            'spent_to_date': round(float(spent_to_date[index]), 2),
+            'scheduled': round(float(scheduled[index]), 2),
+            'projected_remaining': round(float(projected_remaining[index]), 2),
+            'projected_total': round(float(projected_total[index]), 2),
+            'last_month_total': round(float(last_month[index]), 2),
+            'average_month_total': round(float(average_month[index]), 2),
+            'seasonality': round(float(seasonality[index]), 4)
+        }
+        for index in order
+        if projected_total[index] > 0 or last_month[index] > 0
+    ]
+
+
+def get_forecast(user_id, on_date=None):
+    """
+    Month-end forecast for a user, cached per (user, day)
+    Args:
+        user_id (str): User ID
+        on_date (datetime.date): Reference day (defaults to today)
+    Returns:
+        list: Output of compute_forecast()
+    """
+    on_date = on_date or datetime.date.today()
+    cache_key = (user_id, on_date)
+    cached = _forecast_cache.get(cache_key)
+    if cached is not None:
+        computed_at, forecast = cached
+        written_at = last_write(user_id)
+        if written_at is None or written_at < computed_at:
+            return forecast
+
+    started = time.monotonic()
+    connection = get_db_connection(readonly=True, user_id=user_id)
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(DAILY_TOTALS_QUERY, (
+            user_id,
+            on_date - datetime.timedelta(days=FORECAST_HISTORY_DAYS),
+            _month_end(on_date)
+        ))
+        rows = cursor.fetchall()
+    finally:
+        close_connection(connection, cursor)
+
+    forecast = compute_forecast(rows, on_date)
+
+    _forecast_cache.set(cache_key, (started, forecast))
+    return forecast
+
+
+def invalidate_forecast(user_id):
+    """
+    Drop a user's cached forecasts after a write
+    Args:
+        user_id (str): User ID
+    """
+    _forecast_cache.pop_matching(lambda key: key[0] == user_id)
@@ -0,0 +1,500 @@
+"""
+Idempotency keys for Menuda Finance API write routes
+
+Clients send `Idempotency-Key: <unique value>` with a write, generated once
+per user action and reused for its retries. The first request with a key
+runs normally and its response is stored; retries with the same key get the
+stored response (marked `Idempotent-Replayed: true`) without running the
+handler again, so a retried POST does not insert a second row or upload the
+file to S3 again.
+
+- Keys are scoped per user. Reusing a key for a different request (method,
+  path or body) is rejected with 422.
+- A retry that arrives while the first request is still running waits for
+  it when both are in the same worker, and gets 409 with Retry-After when
+  the first one is running in another worker (database store only).
+- 5xx responses are not stored, so retrying after a server error runs the
+  handler again.
+
+Configuration (environment variables):
+    IDEMPOTENCY_STORE: 'memory' (per worker, default) or 'database' (shared
+        by all workers; table idempotency_keys, see migrations/0004_idempotency.sql)
+    IDEMPOTENCY_TTL: Seconds a stored response is replayed (default 86400)
+    IDEMPOTENCY_CACHE_SIZE: Responses kept by the memory store (default 10000)
+"""
+import asyncio
+import datetime
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from flask import current_app, jsonify, request
+from utils.auth import current_user_id
+from utils.cache import LRUCache
+from utils.db import get_db_connection, close_connection
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Seconds a key stays reserved by a request that never finished (e.g. a
+# worker killed mid-request); longer than the slowest write (invoice extraction)
+PENDING_TTL = 300
+
+# Seconds between sweeps of expired rows in the database store (per worker)
+PURGE_INTERVAL = 600
+
+
+class MemoryResponseStore:
+    """
+    Per-worker response store with TTL eviction
+    """
+    def __init__(self, max_entries=10000, ttl=86400):
+        """
+        Initialize store
+        Args:
+            max_entries (int): Stored responses kept before evicting the oldest
+            ttl (float): Seconds a stored response is replayed
+        """
+        self.ttl = ttl
+        self._cache = LRUCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+
+    def reserve(self, scope, fingerprint, owner):
+        """
+        Claim a key, or get the record already stored for it
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            fingerprint (str): Hash of the request
+            owner (str): Token identifying this attempt
+        Returns:
+            dict: Record with fingerprint, owner, status, content_type and
+                body; status is None while the owner is still running
+        """
+        with self._lock:
+            record = self._cache.get(scope)
+            if record is None:
+                record = {
+                    'fingerprint': fingerprint,
+                    'owner': owner,
+                    'status': None,
+                    'content_type': None,
+                    'body': None
+                }
+                self._cache.set(scope, record, ttl=PENDING_TTL)
+            return dict(record)
+
+    def complete(self, scope, owner, status, content_type, body):
+        """
+        Store the response of a reserved key
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            owner (str): Token passed to reserve()
+            status (int): HTTP status code
+            content_type (str): Response Content-Type
+            body (bytes): Response body
+        """
+        with self._lock:
+            record = self._cache.get(scope)
+            if record is not None and record['owner'] == owner:
+                self._cache.set(scope, dict(record, status=status, content_type=content_type, body=body),
+                                ttl=self.ttl)
+
+    def release(self, scope, owner):
+        """
+        Forget a reserved key whose request failed, so a retry runs again
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            owner (str): Token passed to reserve()
+        """
+        with self._lock:
+            record = self._cache.get(scope)
+            if record is not None and record['owner'] == owner:
+                self._cache.pop(scope)
+
+
+class DatabaseResponseStore:
+    """
+    Response store in the idempotency_keys table, shared by all workers
+    """
+    def __init__(self, ttl=86400):
+        """
+        Initialize store
+        Args:
+            ttl (float): Seconds a stored response is replayed
+        """
+        self.ttl = ttl
+        self._purged_at = None
+
+    def _purge(self, cursor, now):
+        """Delete expired rows at most every PURGE_INTERVAL seconds"""
+        current = time.monotonic()
+        if self._purged_at is not None and current - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = current
+        cursor.execute("DELETE FROM idempotency_keys WHERE expires_at <= %s", (now,))
+
+    def reserve(self, scope, fingerprint, owner):
+        """
+        Claim a key, or get the record already stored for it
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            fingerprint (str): Hash of the request
+            owner (str): Token identifying this attempt
+        Returns:
+            dict: Same shape as MemoryResponseStore.reserve()
+        """
+        user_id, key = scope
+        now = datetime.datetime.now()
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            self._purge(cursor, now)
+
+            # A finished or abandoned entry past its expiry no longer holds the key
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key = %s AND expires_at <= %s
+            """, (user_id, key, now))
+
+            # Claim the key unless another attempt holds it (no-op update)
+            cursor.execute("""
+                INSERT INTO idempotency_keys (
+                    user_id, idempotency_key, request_fingerprint, owner_token, created_at, expires_at
+                ) VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE user_id = user_id
+            """, (user_id, key, fingerprint, owner, now, now + datetime.timedelta(seconds=PENDING_TTL)))
+
+            cursor.execute("""
+                SELECT request_fingerprint, owner_token, status_code, content_type, response_body
+                FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key = %s
+            """, (user_id, key))
+            row = cursor.fetchone()
+            connection.commit()
+        finally:
+            close_connection(connection, cursor)
+
+        return {
+            'fingerprint': row['request_fingerprint'],
+            'owner': row['owner_token'],
+            'status': row['status_code'],
+            'content_type': row['content_type'],
+            'body': bytes(row['response_body']) if row['response_body'] is not None else None
+        }
+
+    def complete(self, scope, owner, status, content_type, body):
+        """
+        Store the response of a reserved key
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            owner (str): Token passed to reserve()
+            status (int): HTTP status code
+            content_type (str): Response Content-Type
+            body (bytes): Response body
+        """
+        user_id, key = scope
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=self.ttl)
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status_code = %s, content_type = %s, response_body = %s, expires_at = %s
+                WHERE user_id = %s AND idempotency_key = %s AND owner_token = %s
+            """, (status, content_type, body, expires_at, user_id, key, owner))
+            connection.commit()
+        finally:
+            close_connection(connection, cursor)
+
+    def release(self, scope, owner):
+        """
+        Forget a reserved key whose request failed, so a retry runs again
+        Args:
+            scope (tuple): (user_id, idempotency key)
+            owner (str): Token passed to reserve()
+        """
+        user_id, key = scope
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key = %s AND owner_token = %s
+            """, (user_id, key, owner))
+            connection.commit()
+        finally:
+            close_connection(connection, cursor)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_response_store():
+    """
+    Get the configured response store, creating it on first use
+    Returns:
+        MemoryResponseStore or DatabaseResponseStore
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                ttl = float(os.getenv('IDEMPOTENCY_TTL', '86400'))
+                if os.getenv('IDEMPOTENCY_STORE', 'memory').lower() == 'database':
+                    _store = DatabaseResponseStore(ttl=ttl)
+                else:
+                    _store = MemoryResponseStore(
+                        max_entries=int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000')), ttl=ttl
+                    )
+    return _store
+
+
+def set_response_store(store):
+    """
+    Replace the response store (None restores the configured one)
+    Args:
+        store: Object with reserve(), complete() and release()
+    """
+    global _store
+    _store = store
+
+
+def request_fingerprint(method, path, json_data=None, form=None, files=None, body=b''):
+    """
+    Hash what makes two requests "the same" for an idempotency key
+    JSON is hashed in canonical form and multipart bodies by field and file
+    content, since a retried upload is re-encoded with a new boundary.
+    Args:
+        method (str): HTTP method
+        path (str): Path with query string
+        json_data: Parsed JSON body (None when not JSON)
+        form (MultiDict): Form fields (multipart or urlencoded bodies)
+        files (MultiDict): Uploaded FileStorage objects
+        body (bytes): Raw body, used when there is no JSON or form
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256(f'{method} {path}\n'.encode('utf-8'))
+    if json_data is not None:
+        digest.update(json.dumps(json_data, sort_keys=True, default=str).encode('utf-8'))
+    elif form or files:
+        for name, value in sorted((form or {}).items(multi=True)):
+            digest.update(f'{name}={value}\n'.encode('utf-8'))
+        for name, storage in sorted((files or {}).items(multi=True), key=lambda item: item[0]):
+            digest.update(f'{name}:{storage.filename}:{storage.mimetype}\n'.encode('utf-8'))
+            for chunk in iter(lambda: storage.stream.read(65536), b''):
+                digest.update(chunk)
+            # Leave the upload readable for the handler
+            storage.stream.seek(0)
+    else:
+        digest.update(body or b'')
+    return digest.hexdigest()
+
+
+def _invalid_key(key):
+    """Error message for a malformed key, or None"""
+    if len(key) > MAX_KEY_LENGTH:
+        return f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+    return None
+
+
+def _run_reserved(store, scope, fingerprint, run_handler):
+    """
+    Reserve a key and run the handler if this attempt owns it
+    Args:
+        store: Response store
+        scope (tuple): (user_id, idempotency key)
+        fingerprint (str): Hash of the request
+        run_handler: Callable returning (status, content_type, body)
+    Returns:
+        dict: Record to answer with (see MemoryResponseStore.reserve()),
+            plus replayed=True when another attempt produced it
+    """
+    owner = uuid.uuid4().hex
+    record = store.reserve(scope, fingerprint, owner)
+    if record['owner'] != owner:
+        return dict(record, replayed=True)
+
+    try:
+        status, content_type, body = run_handler()
+    except BaseException:
+        store.release(scope, owner)
+        raise
+    if status >= 500:
+        store.release(scope, owner)
+    else:
+        store.complete(scope, owner, status, content_type, body)
+    return dict(record, status=status, content_type=content_type, body=body, replayed=False)
+
+
+def _answer(record, fingerprint, shared):
+    """
+    Decide the response for a record
+    Args:
+        record (dict): Output of _run_reserved()
+        fingerprint (str): Hash of the current request
+        shared (bool): The record came from a concurrent request in this worker
+    Returns:
+        tuple: (status, content_type, body, extra headers); body is a dict
+            for errors produced here
+    """
+    if record['fingerprint'] != fingerprint:
+        return 422, None, {
+            'status': 'error',
+            'message': f'{IDEMPOTENCY_HEADER} was already used for a different request'
+        }, {}
+    if record['status'] is None:
+        return 409, None, {
+            'status': 'error',
+            'message': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'
+        }, {'Retry-After': '1'}
+    headers = {REPLAYED_HEADER: 'true'} if shared or record['replayed'] else {}
+    return record['status'], record['content_type'], record['body'], headers
+
+
+def _body_user_id():
+    """user_id sent by the client in the query string, JSON body or form"""
+    user_id = request.args.get('user_id')
+    if user_id:
+        return user_id
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and data.get('user_id'):
+            return data['user_id']
+    return request.form.get('user_id')
+
+
+_flights = SingleFlight('idempotency')
+
+
+def idempotent(view):
+    """
+    Make a Flask write view honour the Idempotency-Key header
+    Requests without the header run the view unchanged.
+    Args:
+        view: View function
+    Returns:
+        Wrapped view function
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not key:
+            return view(*args, **kwargs)
+        error = _invalid_key(key)
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
+
+        if request.is_json:
+            fingerprint = request_fingerprint(request.method, request.full_path,
+                                              json_data=request.get_json(silent=True))
+        elif request.form or request.files:
+            fingerprint = request_fingerprint(request.method, request.full_path,
+                                              form=request.form, files=request.files)
+        else:
+            fingerprint = request_fingerprint(request.method, request.full_path, body=request.get_data())
+        user_id = current_user_id(_body_user_id())
+        if not user_id:
+            return view(*args, **kwargs)
+
+        def run_handler():
+            response = current_app.make_response(view(*args, **kwargs))
+            return response.status_code, response.content_type, response.get_data()
+
+        scope = (user_id, key)
+        store = get_response_store()
+        record, shared = _flights.do(scope, lambda: _run_reserved(store, scope, fingerprint, run_handler))
+        status, content_type, body, headers = _answer(record, fingerprint, shared)
+        if isinstance(body, dict):
+            response = jsonify(body)
+            response.status_code = status
+        else:
+            response = current_app.response_class(body, status=status, content_type=content_type)
+        response.headers.update(headers)
+        return response
+    return wrapper
+
+
+_async_flights = AsyncSingleFlight('idempotency')
+
+
+def idempotent_async(view):
+    """
+    Make a Quart write view honour the Idempotency-Key header
+    Store calls run in a thread so the database store does not block the loop.
+    Args:
+        view: Async view function
+    Returns:
+        Wrapped view function
+    """
+    from quart import current_app as quart_app, g as quart_g, request as quart_request
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        key = quart_request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not key:
+            return await view(*args, **kwargs)
+        error = _invalid_key(key)
+        if error:
+            return quart_app.response_class(
+                quart_app.json.dumps({'status': 'error', 'message': error}),
+                status=400, content_type='application/json'
+            )
+
+        form = files = None
+        if quart_request.is_json:
+            fingerprint = request_fingerprint(quart_request.method, quart_request.full_path,
+                                              json_data=await quart_request.get_json(silent=True))
+        elif quart_request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+            form = await quart_request.form
+            files = await quart_request.files
+            fingerprint = request_fingerprint(quart_request.method, quart_request.full_path,
+                                              form=form, files=files)
+        else:
+            fingerprint = request_fingerprint(quart_request.method, quart_request.full_path,
+                                              body=await quart_request.get_data())
+        user_id = quart_g.session['uid'] if quart_g.session else quart_request.args.get('user_id')
+        if not user_id and form is not None:
+            user_id = form.get('user_id')
+        if not user_id:
+            return await view(*args, **kwargs)
+
+        scope = (user_id, key)
+        store = get_response_store()
+
+        async def reserved():
+            owner = uuid.uuid4().hex
+            record = await asyncio.to_thread(store.reserve, scope, fingerprint, owner)
+            if record['owner'] != owner:
+                return dict(record, replayed=True)
+            try:
+                response = await quart_app.make_response(await view(*args, **kwargs))
+                status, content_type = response.status_code, response.content_type
+                response_body = await response.get_data()
+            except BaseException:
+                await asyncio.to_thread(store.release, scope, owner)
+                raise
+            if status >= 500:
+                await asyncio.to_thread(store.release, scope, owner)
+            else:
+                await asyncio.to_thread(store.complete, scope, owner, status, content_type, response_body)
+            return dict(record, status=status, content_type=content_type, body=response_body, replayed=False)
+
+        record, shared = await _async_flights.do(scope, reserved)
+        status, content_type, response_body, headers = _answer(record, fingerprint, shared)
+        if isinstance(response_body, dict):
+            response_body = quart_app.json.dumps(response_body)
+            content_type = 'application/json'
+        response = quart_app.response_class(response_body, status=status, content_type=content_type)
+        response.headers.update(headers)
+        return response
+    return wrapper
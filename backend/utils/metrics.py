@@ -0,0 +1,494 @@
+"""
+Request and dependency instrumentation for Menuda Finance API
+
+Keeps in-process counters, gauges and histograms and renders them in the
+Prometheus text exposition format (served by routes/metrics.py). Metrics are
+per worker process; Prometheus aggregates across workers when each worker is
+scraped, or they can be summed at query time.
+
+Configuration (environment variables):
+    SLOW_QUERY_LOG_MS: Log SQL statements slower than this many milliseconds
+        (disabled when unset). Parameters are never logged, only their count.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+# Default latency buckets in seconds (5 ms .. 10 s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for per-request query counts
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    """
+    Render a Prometheus label set
+    Args:
+        label_names (tuple): Label names
+        label_values (tuple): Label values in the same order
+        extra (tuple): Optional additional (name, value) pair
+    Returns:
+        str: Label set such as '{method="GET",status="200"}' or ''
+    """
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    rendered = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        rendered.append(f'{name}="{value}"')
+    return '{' + ','.join(rendered) + '}'
+
+
+def _format_value(value):
+    """
+    Render a sample value the way Prometheus expects
+    Args:
+        value (float): Sample value
+    Returns:
+        str: Rendered value
+    """
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base class for labelled metrics
+    """
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, label_names=()):
+        """
+        Initialize metric
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            label_names (tuple): Names of the labels this metric is keyed by
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        """
+        Build the internal key for a label set
+        Args:
+            labels (dict): Label values by name
+        Returns:
+            tuple: Label values ordered like label_names
+        """
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self):
+        """
+        Render the metric in Prometheus text format
+        Returns:
+            list: Output lines
+        """
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter
+    """
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        Increment the counter
+        Args:
+            amount (float): Amount to add
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """
+        Get the current counter value
+        Args:
+            **labels: Label values
+        Returns:
+            float: Current value
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down
+    """
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        """
+        Set the gauge value
+        Args:
+            value (float): New value
+            **labels: Label values
+        """
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        """
+        Increment the gauge
+        Args:
+            amount (float): Amount to add
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """
+        Decrement the gauge
+        Args:
+            amount (float): Amount to subtract
+            **labels: Label values
+        """
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        """
+        Get the current gauge value
+        Args:
+            **labels: Label values
+        Returns:
+            float: Current value
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """
+    Cumulative histogram with fixed buckets
+    """
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize histogram
+        Args:
+            name (str): Metric name
+            documentation (str): Help text
+            label_names (tuple): Names of the labels this metric is keyed by
+            buckets (tuple): Upper bounds of the buckets, ascending
+        """
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """
+        Record an observation
+        Args:
+            value (float): Observed value
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [bucket counts..., sum, count]
+                state = [0] * len(self.buckets) + [0.0, 0]
+                self._values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels):
+        """
+        Get the number of observations
+        Args:
+            **labels: Label values
+        Returns:
+            int: Observation count
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[-1] if state else 0
+
+    def render(self):
+        """
+        Render the histogram in Prometheus text format
+        Returns:
+            list: Output lines
+        """
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for index, bound in enumerate(self.buckets):
+                labels = _format_labels(self.label_names, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {state[index]}')
+            labels = _format_labels(self.label_names, key, ('le', '+Inf'))
+            lines.append(f'{self.name}_bucket{labels} {state[-1]}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{labels} {state[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together on the metrics endpoint
+    """
+    def __init__(self):
+        """
+        Initialize an empty registry
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric to the registry (returns the existing one on re-register)
+        Args:
+            metric (Metric): Metric to register
+        Returns:
+            Metric: The registered metric
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, label_names=()):
+        """Create and register a Counter"""
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        """Create and register a Gauge"""
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram"""
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self):
+        """
+        Render all metrics in Prometheus text format
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    'menuda_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ('method', 'endpoint', 'status')
+)
+http_request_db_seconds = registry.histogram(
+    'menuda_http_request_db_seconds',
+    'Time spent in database calls per HTTP request',
+    ('method', 'endpoint')
+)
+http_request_db_queries = registry.histogram(
+    'menuda_http_request_db_queries',
+    'Number of database queries per HTTP request',
+    ('method', 'endpoint'),
+    buckets=QUERY_COUNT_BUCKETS
+)
+db_query_duration = registry.histogram(
+    'menuda_db_query_duration_seconds',
+    'Database statement latency by statement type',
+    ('operation',)
+)
+db_slow_queries = registry.counter(
+    'menuda_db_slow_queries_total',
+    'Database statements slower than SLOW_QUERY_LOG_MS',
+    ('operation',)
+)
+db_connect_duration = registry.histogram(
+    'menuda_db_connect_duration_seconds',
+    'Time to acquire a database connection',
+    ('source',)
+)
+db_pool_size = registry.gauge(
+    'menuda_db_pool_size',
+    'Configured database connection pool size'
+)
+db_connections_in_use = registry.gauge(
+    'menuda_db_connections_in_use',
+    'Database connections currently checked out'
+)
+db_pool_exhausted = registry.counter(
+    'menuda_db_pool_exhausted_total',
+    'Connection requests that found the pool exhausted'
+)
+db_read_routing = registry.counter(
+    'menuda_db_read_routing_total',
+    'Read-only connection requests by target and routing reason',
+    ('target', 'reason')
+)
+db_replica_lag = registry.gauge(
+    'menuda_db_replica_lag_seconds',
+    'Replication lag measured at the last check (-1 when replication is stopped)',
+    ('replica',)
+)
+db_replica_healthy = registry.gauge(
+    'menuda_db_replica_healthy',
+    'Whether a read replica is currently used for reads (1) or skipped (0)',
+    ('replica',)
+)
+external_call_duration = registry.histogram(
+    'menuda_external_call_duration_seconds',
+    'Latency of calls to external services',
+    ('service', 'operation', 'outcome')
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _statement_operation(statement):
+    """
+    Get the SQL verb of a statement (SELECT, INSERT, ...)
+    Args:
+        statement (str): SQL statement
+    Returns:
+        str: Upper-case verb or 'OTHER'
+    """
+    words = statement.lstrip().split(None, 1)
+    if not words:
+        return 'OTHER'
+    verb = words[0].upper()
+    if verb in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CALL', 'WITH', 'SHOW', 'EXPLAIN'):
+        return verb
+    return 'OTHER'
+
+
+def _slow_query_threshold():
+    """
+    Get the slow query threshold in seconds
+    Returns:
+        float: Threshold or None when the slow query log is disabled
+    """
+    value = os.getenv('SLOW_QUERY_LOG_MS')
+    if not value:
+        return None
+    return float(value) / 1000.0
+
+
+def record_query(statement, params, duration):
+    """
+    Record a database statement execution
+    Args:
+        statement (str): SQL statement (with %s placeholders)
+        params: Statement parameters (only their count is ever logged)
+        duration (float): Execution time in seconds
+    """
+    if isinstance(statement, bytes):
+        statement = statement.decode('utf-8', 'replace')
+    operation = _statement_operation(statement)
+    db_query_duration.observe(duration, operation=operation)
+
+    if has_request_context():
+        g.db_time = g.get('db_time', 0.0) + duration
+        g.db_queries = g.get('db_queries', 0) + 1
+
+    threshold = _slow_query_threshold()
+    if threshold is not None and duration >= threshold:
+        db_slow_queries.inc(operation=operation)
+        param_count = len(params) if isinstance(params, (list, tuple, dict)) else 0
+        endpoint = request.endpoint if has_request_context() else None
+        compact = _WHITESPACE.sub(' ', statement).strip()
+        print(f"Slow query ({duration * 1000:.1f} ms, {param_count} params redacted, "
+              f"endpoint={endpoint}): {compact}")
+
+
+@contextmanager
+def time_external(service, operation):
+    """
+    Time a call to an external service (S3, extraction API, ...)
+    Args:
+        service (str): Service name (e.g. 's3')
+        operation (str): Operation name (e.g. 'upload_file')
+    """
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        external_call_duration.observe(
+            time.perf_counter() - start,
+            service=service, operation=operation, outcome=outcome
+        )
+
+
+def _endpoint_label():
+    """
+    Get a bounded-cardinality label for the current route
+    Returns:
+        str: URL rule (e.g. '/api/transactions/<transaction_id>') or 'unmatched'
+    """
+    if request.url_rule is not None:
+        return request.url_rule.rule
+    return 'unmatched'
+
+
+def init_metrics(app):
+    """
+    Register request timing hooks on a Flask application
+    Args:
+        app: Flask application
+    """
+    @app.before_request
+    def start_request_timer():
+        """Reset per-request counters and start the request timer"""
+        g.request_start = time.perf_counter()
+        g.db_time = 0.0
+        g.db_queries = 0
+
+    @app.after_request
+    def record_request_metrics(response):
+        """Record route latency and database usage for the request"""
+        start = g.get('request_start')
+        if start is None:
+            return response
+
+        endpoint = _endpoint_label()
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method, endpoint=endpoint, status=response.status_code
+        )
+        http_request_db_seconds.observe(g.get('db_time', 0.0), method=request.method, endpoint=endpoint)
+        http_request_db_queries.observe(g.get('db_queries', 0), method=request.method, endpoint=endpoint)
+        return response
@@ -0,0 +1,204 @@
+"""
+Versioned schema migrations for Menuda Finance API
+
+Migrations are the migrations/NNNN_description.sql files, applied in version
+order and at most once; the versions already applied (with a checksum of
+their file) are stored in schema_migrations. Write them in the MySQL subset
+the SQLite stand-in (benchmarks/standins.py) also runs: CREATE TABLE IF NOT
+EXISTS, and indexes as separate CREATE INDEX statements. Statements only
+MySQL supports (partitioning, row formats) go in NNNN_description.mysql.sql
+files, which the stand-in skips.
+
+MySQL commits each DDL statement on its own, so a migration that fails
+halfway is not rolled back and its version is not recorded. Fix the cause
+and run it again: indexes that already exist are skipped.
+
+Run with python -m scripts.migrate (once per deployment, before the new
+code starts serving).
+"""
+import hashlib
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+_FILENAME = re.compile(r'^(\d+)_(\w+?)(?:\.(mysql|sqlite))?\.sql$')
+_COMMENT = re.compile(r'--[^\n]*')
+
+# MySQL error for CREATE INDEX with a name the table already has
+ER_DUP_KEYNAME = 1061
+
+HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum CHAR(64) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+
+class MigrationError(Exception):
+    """
+    Raised when the migration files and the database history disagree
+    """
+
+
+class Migration:
+    """
+    One migration file
+    """
+    def __init__(self, version, name, path, dialect=None):
+        """
+        Initialize migration
+        Args:
+            version (int): Version number from the file name
+            name (str): Description from the file name
+            path (str): File path
+            dialect (str): 'mysql' or 'sqlite' when only that database runs it
+        """
+        self.version = version
+        self.name = name
+        self.path = path
+        self.dialect = dialect
+        with open(path, encoding='utf-8') as migration_file:
+            self.sql = migration_file.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+
+    @property
+    def statements(self):
+        return split_statements(self.sql)
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.name!r})"
+
+
+def split_statements(sql):
+    """
+    Split a migration file into statements
+    Args:
+        sql (str): File contents (statements end with ';', comments start with --)
+    Returns:
+        list: Statements without comments or the trailing ';'
+    """
+    statements = (statement.strip() for statement in _COMMENT.sub('', sql).split(';'))
+    return [statement for statement in statements if statement]
+
+
+def load_migrations(directory=MIGRATIONS_DIR, dialect='mysql'):
+    """
+    Read the migration files
+    Args:
+        directory (str): Directory with NNNN_description.sql files
+        dialect (str): Database the migrations run on ('mysql' or 'sqlite');
+            files for the other one are left out
+    Returns:
+        list: Migration objects in version order
+    Raises:
+        MigrationError: Two files have the same version
+    """
+    migrations = {}
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        if match.group(3) not in (None, dialect):
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename), match.group(3))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def applied_migrations(connection):
+    """
+    Get the migrations recorded in the database, creating the history table
+    on first use
+    Args:
+        connection: Database connection
+    Returns:
+        dict: Checksum by applied version
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(HISTORY_TABLE)
+        cursor.execute("SELECT version, checksum FROM schema_migrations")
+        applied = {int(version): checksum for version, checksum in cursor.fetchall()}
+        connection.commit()
+        return applied
+    finally:
+        cursor.close()
+
+
+def pending_migrations(connection, migrations=None, dialect='mysql'):
+    """
+    Get the migrations not applied yet
+    Args:
+        connection: Database connection
+        migrations (list): Migration objects (default: load_migrations(dialect=dialect))
+        dialect (str): Database the connection is to ('mysql' or 'sqlite')
+    Returns:
+        list: Migration objects in version order
+    Raises:
+        MigrationError: An applied migration's file was edited afterwards
+    """
+    if migrations is None:
+        migrations = load_migrations(dialect=dialect)
+    applied = applied_migrations(connection)
+    for migration in migrations:
+        checksum = applied.get(migration.version)
+        if checksum is not None and checksum != migration.checksum:
+            raise MigrationError(
+                f"Migration {migration.version} ({migration.name}) changed after it was applied; "
+                f"add a new migration instead of editing it"
+            )
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def apply_migration(connection, migration):
+    """
+    Run one migration's statements and record it
+    Args:
+        connection: Database connection
+        migration (Migration): Migration to apply
+    """
+    cursor = connection.cursor()
+    try:
+        for statement in migration.statements:
+            try:
+                cursor.execute(statement)
+            except Exception as e:
+                # Left over from an earlier, interrupted run of this migration
+                if getattr(e, 'errno', None) != ER_DUP_KEYNAME:
+                    raise
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (%s, %s, %s, NOW())",
+            (migration.version, migration.name, migration.checksum)
+        )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def migrate(connection, target=None, migrations=None, dialect='mysql'):
+    """
+    Apply the pending migrations in order
+    Args:
+        connection: Database connection
+        target (int): Stop after this version (default: apply all)
+        migrations (list): Migration objects (default: load_migrations(dialect=dialect))
+        dialect (str): Database the connection is to ('mysql' or 'sqlite')
+    Returns:
+        list: Migration objects applied
+    """
+    applied = []
+    for migration in pending_migrations(connection, migrations, dialect):
+        if target is not None and migration.version > target:
+            break
+        apply_migration(connection, migration)
+        applied.append(migration)
+    return applied
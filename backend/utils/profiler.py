@@ -0,0 +1,227 @@
+"""
+Per-request profiling for Menuda Finance API
+
+Profiles individual requests in production without redeploying. A request is
+profiled when it carries the admin header (X-Profile-Token matching
+PROFILE_ADMIN_TOKEN) or when it is picked by the sampling rate. Profiles are
+written to PROFILE_DIR and the oldest files are removed beyond
+PROFILE_MAX_FILES.
+
+Two modes are available:
+    sampling: A background thread samples the request thread's stack every
+        PROFILE_INTERVAL_MS and writes collapsed stacks (.folded), which
+        flamegraph.pl, speedscope and inferno read directly. Low overhead.
+    cprofile: Deterministic cProfile of the request, written as a pstats
+        file (.prof) for snakeviz / flameprof. Higher overhead, exact counts.
+
+Configuration (environment variables):
+    PROFILE_ADMIN_TOKEN: Secret that enables profiling via X-Profile-Token
+    PROFILE_SAMPLE_RATE: Fraction of requests to profile (default 0)
+    PROFILE_MODE: 'sampling' (default) or 'cprofile'
+    PROFILE_INTERVAL_MS: Sampling interval in milliseconds (default 5)
+    PROFILE_DIR: Output directory (default /tmp/menuda-profiles)
+    PROFILE_MAX_FILES: Number of profiles to keep (default 50)
+"""
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+from utils.metrics import registry
+
+profiles_captured = registry.counter(
+    'menuda_profiles_captured_total',
+    'Requests profiled by the per-request profiler',
+    ('mode',)
+)
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval and aggregates the
+    samples into collapsed stacks
+    """
+    def __init__(self, thread_id, interval):
+        """
+        Initialize sampler
+        Args:
+            thread_id (int): Identifier of the thread to sample
+            interval (float): Sampling interval in seconds
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='menuda-stack-sampler', daemon=True)
+
+    def start(self):
+        """Start sampling"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to exit"""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        """Sampling loop"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.samples[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        """
+        Render a stack as 'outer;...;inner' frame names
+        Args:
+            frame: Innermost frame of the stack
+        Returns:
+            str: Collapsed stack
+        """
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(names)
+
+    def write(self, path):
+        """
+        Write collapsed stacks ('stack count' per line)
+        Args:
+            path (str): Output file path
+        """
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, count in self.samples.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+def _should_profile():
+    """
+    Decide whether the current request is profiled
+    Returns:
+        bool: True when the admin header matches or the request is sampled
+    """
+    admin_token = os.getenv('PROFILE_ADMIN_TOKEN')
+    header_token = request.headers.get('X-Profile-Token')
+    if admin_token and header_token and hmac.compare_digest(admin_token, header_token):
+        return True
+
+    sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _profile_path(directory, extension, elapsed):
+    """
+    Build the output path for a request profile
+    Args:
+        directory (str): Output directory
+        extension (str): File extension ('.folded' or '.prof')
+        elapsed (float): Request duration in seconds
+    Returns:
+        str: Output file path
+    """
+    endpoint = re.sub(r'[^A-Za-z0-9_.-]+', '_', request.endpoint or 'unmatched')
+    timestamp = time.strftime('%Y%m%dT%H%M%S')
+    suffix = os.urandom(3).hex()
+    name = f'{timestamp}_{request.method}_{endpoint}_{int(elapsed * 1000)}ms_{suffix}{extension}'
+    return os.path.join(directory, name)
+
+
+def _rotate(directory, max_files):
+    """
+    Delete the oldest profiles beyond max_files
+    Args:
+        directory (str): Profile directory
+        max_files (int): Number of files to keep
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(('.folded', '.prof')):
+            path = os.path.join(directory, name)
+            entries.append((os.path.getmtime(path), path))
+    entries.sort()
+    for _, path in entries[:max(len(entries) - max_files, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def init_profiler(app):
+    """
+    Register the per-request profiling hooks on a Flask application
+    Args:
+        app: Flask application
+    """
+    @app.before_request
+    def start_profiler():
+        """Start profiling the request when it is selected"""
+        if not _should_profile():
+            return
+
+        mode = os.getenv('PROFILE_MODE', 'sampling')
+        g.profile_mode = mode
+        g.profile_start = time.perf_counter()
+        if mode == 'cprofile':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        else:
+            interval = float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000.0
+            g.profiler = StackSampler(threading.get_ident(), interval)
+            g.profiler.start()
+
+    def stop_profiler():
+        """
+        Stop the active profiler, if any
+        Returns:
+            The stopped profiler or None
+        """
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return None
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+        return profiler
+
+    @app.after_request
+    def write_profile(response):
+        """Stop profiling and store the profile"""
+        profiler = stop_profiler()
+        if profiler is None:
+            return response
+
+        try:
+            directory = os.getenv('PROFILE_DIR', '/tmp/menuda-profiles')
+            os.makedirs(directory, exist_ok=True)
+            elapsed = time.perf_counter() - g.profile_start
+
+            if g.profile_mode == 'cprofile':
+                path = _profile_path(directory, '.prof', elapsed)
+                profiler.dump_stats(path)
+            else:
+                path = _profile_path(directory, '.folded', elapsed)
+                profiler.write(path)
+
+            _rotate(directory, int(os.getenv('PROFILE_MAX_FILES', '50')))
+            profiles_captured.inc(mode=g.profile_mode)
+            response.headers['X-Profile-Id'] = os.path.basename(path)
+        except Exception as e:
+            print(f"Error writing request profile: {e}")
+
+        return response
+
+    @app.teardown_request
+    def cleanup_profiler(exception=None):
+        """Make sure the profiler is stopped if the request failed early"""
+        stop_profiler()
@@ -0,0 +1,192 @@
+"""
+Shared statements for Menuda Finance API
+
+The transaction and vendor SELECTs several routes run are defined once here
+and executed as server-side prepared statements through
+InstrumentedConnection.execute_prepared: every pooled session parses a
+statement once and reuses it, and rows come back over the binary protocol
+already typed (Decimal, datetime.date, datetime.datetime) instead of being
+parsed from text.
+
+Statements are module constants, or built by cached functions for the few
+variable shapes (date filters, IN lists), so the same str object is passed
+on every call; mysql-connector only reuses a prepared statement for the
+object it was prepared with.
+
+The async routes run the same statements through utils.async_db (aiomysql
+has no prepared statements).
+"""
+import functools
+
+TRANSACTION_COLUMNS = """
+    t.transaction_id,
+    t.title,
+    t.amount,
+    t.transaction_date,
+    t.attachment_url,
+    t.attachment_type,
+    t.created_at,
+    t.updated_at,
+    c.category_id,
+    c.category_name,
+    v.vendor_id,
+    v.vendor_name"""
+
+# Transaction with its category and vendor names
+TRANSACTION_BY_ID = f"""
+SELECT{TRANSACTION_COLUMNS}
+FROM
+    transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    JOIN vendors v ON t.vendor_id = v.vendor_id
+WHERE
+    t.transaction_id = %s
+"""
+
+# Same, only when the user owns it and it is not deleted
+USER_TRANSACTION = f"""
+SELECT{TRANSACTION_COLUMNS}
+FROM
+    transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    JOIN vendors v ON t.vendor_id = v.vendor_id
+WHERE
+    t.transaction_id = %s
+    AND t.user_id = %s
+    AND t.is_deleted = FALSE
+"""
+
+VENDOR_COLUMNS = """
+    v.vendor_id,
+    v.vendor_name,
+    v.category_id,
+    c.category_name,
+    v.created_at,
+    v.updated_at"""
+
+# Active vendors with their default category name
+USER_VENDORS = f"""
+SELECT{VENDOR_COLUMNS}
+FROM
+    vendors v
+    JOIN categories c ON v.category_id = c.category_id
+WHERE
+    v.user_id = %s
+    AND v.is_active = TRUE
+ORDER BY
+    v.vendor_name
+"""
+
+# Vendor with its default category name
+VENDOR_BY_ID = f"""
+SELECT{VENDOR_COLUMNS}
+FROM
+    vendors v
+    JOIN categories c ON v.category_id = c.category_id
+WHERE
+    v.vendor_id = %s
+"""
+
+# Reserve the ID of a new transaction before inserting it; fails on the
+# primary key when the ID was ever issued, even if its row is now archived
+# (see migrations/0010_transaction_ids.sql)
+RESERVE_TRANSACTION_ID = """
+INSERT INTO transaction_ids (transaction_id, user_id, created_at) VALUES (%s, %s, NOW())
+"""
+
+# Columns converted to ISO strings for JSON responses
+_DATE_FIELDS = ('transaction_date', 'created_at', 'updated_at')
+
+
+@functools.lru_cache(maxsize=None)
+def user_transactions(archived=False, from_date=False, to_date=False):
+    """
+    Statement listing a user's transactions, newest first
+    Args:
+        archived (bool): Read transactions_archive instead of transactions
+        from_date (bool): Add a transaction_date >= %s parameter
+        to_date (bool): Add a transaction_date <= %s parameter
+    Returns:
+        str: Statement taking user_id, then the date parameters in order
+    """
+    date_filters = ''
+    if from_date:
+        date_filters += '\n    AND t.transaction_date >= %s'
+    if to_date:
+        date_filters += '\n    AND t.transaction_date <= %s'
+    return f"""
+SELECT{TRANSACTION_COLUMNS}
+FROM
+    {'transactions_archive' if archived else 'transactions'} t
+    JOIN categories c ON t.category_id = c.category_id
+    JOIN vendors v ON t.vendor_id = v.vendor_id
+WHERE
+    t.user_id = %s
+    AND t.is_deleted = FALSE{date_filters}
+ORDER BY
+    t.transaction_date DESC
+"""
+
+
+@functools.lru_cache(maxsize=128)
+def user_transactions_by_ids(count):
+    """
+    Statement loading some of a user's transactions by ID
+    Args:
+        count (int): Number of IDs
+    Returns:
+        str: Statement taking the IDs, then user_id
+    """
+    placeholders = ', '.join(['%s'] * count)
+    return f"""
+SELECT{TRANSACTION_COLUMNS}
+FROM
+    transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    JOIN vendors v ON t.vendor_id = v.vendor_id
+WHERE
+    t.transaction_id IN ({placeholders})
+    AND t.user_id = %s
+    AND t.is_deleted = FALSE
+"""
+
+
+def fetch_all(connection, statement, params=()):
+    """
+    Run a prepared statement and return every row
+    Args:
+        connection (InstrumentedConnection): Database connection
+        statement (str): One of the statements in this module
+        params (tuple): Statement parameters
+    Returns:
+        list: Rows as dicts of typed values
+    """
+    return connection.execute_prepared(statement, params).fetchall()
+
+
+def fetch_one(connection, statement, params=()):
+    """
+    Run a prepared statement and return its first row
+    Args:
+        connection (InstrumentedConnection): Database connection
+        statement (str): One of the statements in this module
+        params (tuple): Statement parameters
+    Returns:
+        dict: First row, or None when there are no rows
+    """
+    rows = fetch_all(connection, statement, params)
+    return rows[0] if rows else None
+
+
+def to_json(row):
+    """
+    Convert a row's date and datetime values to ISO strings, in place
+    Args:
+        row (dict): Row from fetch_all/fetch_one
+    Returns:
+        dict: The same row
+    """
+    for field in _DATE_FIELDS:
+        if row.get(field):
+            row[field] = row[field].isoformat()
+    return row
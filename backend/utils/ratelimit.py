@@ -0,0 +1,502 @@
+"""
+Rate limiting for Menuda Finance API
+
+Every request is charged to a per-user token bucket; the expensive routes
+(invoice extraction, uploads) also have their own per-user bucket and caps on
+concurrent requests, per user and across all users. A request over any limit
+is rejected before the handler runs with 429 and a Retry-After header, so one
+client hammering /api/invoices/process cannot take every worker or the
+extraction quota.
+
+Buckets use GCRA: a bucket is stored as the time it will be full again
+(its "theoretical arrival time"), which behaves like a token bucket of
+`burst` tokens refilled at `per_minute` but needs a single number per key.
+
+Users are identified by their verified session token. Requests without one
+are charged to their IP address alone: the user_id a client sends is not
+verified, so keying on it would let anyone drain another user's bucket, or
+get a fresh bucket and concurrency slot per made-up ID.
+
+Behind a load balancer, the client address must come from X-Forwarded-For
+or every client shares the proxy's bucket: set TRUSTED_PROXIES for the
+Flask app (main.py), and run uvicorn with --proxy-headers and
+--forwarded-allow-ips for the ASGI app.
+
+Configuration (environment variables):
+    RATE_LIMIT_ENABLED: 'true' (default) or 'false'
+    RATE_LIMIT_STORE: 'memory' (per worker, default) or 'database' (shared by
+        all workers; tables in migrations/0005_rate_limits.sql)
+    RATE_LIMIT_USER_PER_MINUTE / RATE_LIMIT_USER_BURST: Every route (600 / 100)
+    RATE_LIMIT_INVOICE_PER_MINUTE / _BURST / _CONCURRENCY / _ROUTE_CONCURRENCY:
+        /api/invoices/process (6 / 3 / 1 per user / 4 across users)
+    RATE_LIMIT_UPLOAD_PER_MINUTE / _BURST / _CONCURRENCY / _ROUTE_CONCURRENCY:
+        /api/attachments/upload (30 / 10 / 3 per user / 8 across users)
+    RATE_LIMIT_EVENTS_PER_MINUTE / _BURST / _CONCURRENCY:
+        /api/events (20 / 5 / 2 open streams per user); a stream keeps its
+        slot until it closes (see hold_request_slots)
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from flask import g, jsonify, request
+from utils.cache import LRUCache
+from utils.db import get_db_connection, close_connection
+from utils.metrics import registry
+
+# Routes never limited (health checks and metrics scraping)
+EXEMPT_RULES = {'/api/health', '/api/metrics'}
+
+# Seconds after which a concurrency slot not released (crashed worker) is
+# no longer counted by the database store
+SLOT_LEASE_SECONDS = 300
+
+# Seconds between sweeps of idle rows in the database store (per worker)
+PURGE_INTERVAL = 600
+
+rate_limited = registry.counter(
+    'menuda_rate_limited_total',
+    'Requests rejected with 429 by route and limit',
+    ('endpoint', 'limit')
+)
+
+
+class Limit:
+    """
+    Limits for one route: request rate and optional concurrency caps
+    """
+    def __init__(self, per_minute, burst, concurrency=None, route_concurrency=None):
+        """
+        Initialize limit
+        Args:
+            per_minute (float): Sustained requests per minute per user
+            burst (int): Requests allowed at once before the rate applies
+            concurrency (int): Requests in flight per user (None: no cap)
+            route_concurrency (int): Requests in flight across users (None: no cap)
+        """
+        self.interval = 60.0 / per_minute
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self.concurrency = concurrency
+        self.route_concurrency = route_concurrency
+
+
+def _env_limit(prefix, per_minute, burst, concurrency=None, route_concurrency=None):
+    """
+    Build a Limit from RATE_LIMIT_<prefix>_* variables
+    Returns:
+        Limit: Configured limit
+    """
+    def value(name, default):
+        raw = os.getenv(f'RATE_LIMIT_{prefix}_{name}')
+        return default if raw is None else float(raw)
+
+    concurrency = value('CONCURRENCY', concurrency)
+    route_concurrency = value('ROUTE_CONCURRENCY', route_concurrency)
+    return Limit(
+        value('PER_MINUTE', per_minute),
+        int(value('BURST', burst)),
+        int(concurrency) if concurrency else None,
+        int(route_concurrency) if route_concurrency else None
+    )
+
+
+class MemoryRateLimitStore:
+    """
+    Per-worker buckets and concurrency counters
+    """
+    blocking = False
+
+    def __init__(self, max_entries=100000):
+        """
+        Initialize store
+        Args:
+            max_entries (int): Buckets kept before evicting the least recent
+        """
+        self._buckets = LRUCache(max_entries=max_entries)
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        """
+        Take one token from a bucket
+        Args:
+            key (str): Bucket key
+            limit (Limit): Rate and burst
+        Returns:
+            float: 0 when allowed, else seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            arrival = max(self._buckets.get(key, now), now)
+            if arrival - limit.tolerance > now:
+                return arrival - limit.tolerance - now
+            arrival += limit.interval
+            # A bucket that has refilled completely is the same as a missing one
+            self._buckets.set(key, arrival, ttl=arrival - now)
+            return 0.0
+
+    def acquire(self, key, capacity):
+        """
+        Take a concurrency slot
+        Args:
+            key (str): Slot key
+            capacity (int): Maximum slots held at once
+        Returns:
+            bool: Whether a slot was taken
+        """
+        with self._lock:
+            held = self._slots.get(key, 0)
+            if held >= capacity:
+                return False
+            self._slots[key] = held + 1
+            return True
+
+    def release(self, key):
+        """
+        Give back a concurrency slot
+        Args:
+            key (str): Slot key passed to acquire()
+        """
+        with self._lock:
+            held = self._slots.get(key, 0) - 1
+            if held > 0:
+                self._slots[key] = held
+            else:
+                self._slots.pop(key, None)
+
+
+class DatabaseRateLimitStore:
+    """
+    Buckets and concurrency counters in the database, shared by all workers
+    Every check is a conditional UPDATE, so concurrent workers never
+    over-admit. Times are epoch seconds so hosts agree on them.
+    """
+    blocking = True
+
+    def __init__(self):
+        self._purged_at = None
+
+    def _purge(self, cursor, now):
+        """Delete buckets and slots idle for an hour, at most every PURGE_INTERVAL"""
+        current = time.monotonic()
+        if self._purged_at is not None and current - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = current
+        cursor.execute("DELETE FROM rate_limit_buckets WHERE arrival < %s", (now - 3600,))
+        cursor.execute("DELETE FROM rate_limit_slots WHERE in_flight = 0 AND updated_at < %s", (now - 3600,))
+
+    def take(self, key, limit):
+        """
+        Take one token from a bucket
+        Args:
+            key (str): Bucket key
+            limit (Limit): Rate and burst
+        Returns:
+            float: 0 when allowed, else seconds until a token is available
+        """
+        now = time.time()
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            self._purge(cursor, now)
+            for attempt in range(2):
+                cursor.execute("""
+                    UPDATE rate_limit_buckets SET arrival = GREATEST(arrival, %s) + %s
+                    WHERE bucket_key = %s AND GREATEST(arrival, %s) - %s <= %s
+                """, (now, limit.interval, key, now, limit.tolerance, now))
+                if cursor.rowcount == 1:
+                    connection.commit()
+                    return 0.0
+
+                cursor.execute("SELECT arrival FROM rate_limit_buckets WHERE bucket_key = %s", (key,))
+                row = cursor.fetchone()
+                if row is not None:
+                    connection.commit()
+                    return max(0.001, row['arrival'] - limit.tolerance - now)
+
+                # First request for this key: create a full bucket and retry
+                cursor.execute("""
+                    INSERT INTO rate_limit_buckets (bucket_key, arrival) VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE bucket_key = bucket_key
+                """, (key, now))
+            connection.commit()
+            return limit.interval
+        finally:
+            close_connection(connection, cursor)
+
+    def acquire(self, key, capacity):
+        """
+        Take a concurrency slot
+        Args:
+            key (str): Slot key
+            capacity (int): Maximum slots held at once
+        Returns:
+            bool: Whether a slot was taken
+        """
+        now = time.time()
+        stale = now - SLOT_LEASE_SECONDS
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor(dictionary=True)
+            for attempt in range(2):
+                # Counters untouched for a full lease were leaked by dead workers
+                cursor.execute("""
+                    UPDATE rate_limit_slots
+                    SET in_flight = CASE WHEN updated_at < %s THEN 1 ELSE in_flight + 1 END,
+                        updated_at = %s
+                    WHERE slot_key = %s AND (in_flight < %s OR updated_at < %s)
+                """, (stale, now, key, capacity, stale))
+                if cursor.rowcount == 1:
+                    connection.commit()
+                    return True
+
+                cursor.execute("SELECT in_flight FROM rate_limit_slots WHERE slot_key = %s", (key,))
+                if cursor.fetchone() is not None:
+                    connection.commit()
+                    return False
+
+                cursor.execute("""
+                    INSERT INTO rate_limit_slots (slot_key, in_flight, updated_at) VALUES (%s, 0, %s)
+                    ON DUPLICATE KEY UPDATE slot_key = slot_key
+                """, (key, now))
+            connection.commit()
+            return False
+        finally:
+            close_connection(connection, cursor)
+
+    def release(self, key):
+        """
+        Give back a concurrency slot
+        Args:
+            key (str): Slot key passed to acquire()
+        """
+        connection = get_db_connection()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                UPDATE rate_limit_slots SET in_flight = GREATEST(in_flight - 1, 0)
+                WHERE slot_key = %s
+            """, (key,))
+            connection.commit()
+        finally:
+            close_connection(connection, cursor)
+
+
+class RateLimitDecision:
+    """
+    Outcome of a rate limit check
+    """
+    def __init__(self, allowed, retry_after=0.0, limit=None, slots=()):
+        """
+        Initialize decision
+        Args:
+            allowed (bool): Whether the request may run
+            retry_after (float): Seconds the client should wait when rejected
+            limit (str): Which limit rejected the request
+            slots (tuple): Concurrency slots to release when the request ends
+        """
+        self.allowed = allowed
+        self.retry_after = retry_after
+        self.limit = limit
+        self.slots = slots
+
+
+class RateLimiter:
+    """
+    Applies the per-user and per-route limits to requests
+    """
+    def __init__(self, store, user_limit, route_limits):
+        """
+        Initialize limiter
+        Args:
+            store: MemoryRateLimitStore or DatabaseRateLimitStore
+            user_limit (Limit): Applies to every route
+            route_limits (dict): Route rule -> Limit for expensive routes
+        """
+        self.store = store
+        self.user_limit = user_limit
+        self.route_limits = route_limits
+
+    def check(self, rule, identity):
+        """
+        Charge a request to its buckets and take its concurrency slots
+        Args:
+            rule (str): Matched URL rule (e.g. '/api/invoices/process')
+            identity (str): User ID or 'ip:<address>'
+        Returns:
+            RateLimitDecision: Rejections say which limit was hit
+        """
+        wait = self.store.take(f'user:{identity}', self.user_limit)
+        if wait:
+            return RateLimitDecision(False, wait, 'user')
+
+        limit = self.route_limits.get(rule)
+        if limit is None:
+            return RateLimitDecision(True)
+
+        wait = self.store.take(f'route:{rule}:{identity}', limit)
+        if wait:
+            return RateLimitDecision(False, wait, 'route')
+
+        slots = []
+        for name, key, capacity in (
+            ('user_concurrency', f'slots:{rule}:{identity}', limit.concurrency),
+            ('route_concurrency', f'slots:{rule}', limit.route_concurrency),
+        ):
+            if capacity is None:
+                continue
+            if not self.store.acquire(key, capacity):
+                self.release(slots)
+                # No way to know when a slot frees up; ask for a short wait
+                return RateLimitDecision(False, 1.0, name)
+            slots.append(key)
+        return RateLimitDecision(True, slots=tuple(slots))
+
+    def release(self, slots):
+        """
+        Release the concurrency slots of a finished request
+        Args:
+            slots (tuple): RateLimitDecision.slots
+        """
+        for key in slots:
+            try:
+                self.store.release(key)
+            except Exception as e:
+                print(f"Error releasing rate limit slot {key}: {e}")
+
+    async def check_async(self, rule, identity):
+        """check() that keeps database round trips off the event loop"""
+        if self.store.blocking:
+            return await asyncio.to_thread(self.check, rule, identity)
+        return self.check(rule, identity)
+
+    async def release_async(self, slots):
+        """release() that keeps database round trips off the event loop"""
+        if self.store.blocking:
+            await asyncio.to_thread(self.release, slots)
+        else:
+            self.release(slots)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Get the worker's rate limiter (shared by the Flask and Quart apps)
+    Returns:
+        RateLimiter: Limiter, or None when RATE_LIMIT_ENABLED is false
+    """
+    global _limiter
+    if os.getenv('RATE_LIMIT_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                if os.getenv('RATE_LIMIT_STORE', 'memory').lower() == 'database':
+                    store = DatabaseRateLimitStore()
+                else:
+                    store = MemoryRateLimitStore()
+                _limiter = RateLimiter(
+                    store,
+                    _env_limit('USER', per_minute=600, burst=100),
+                    {
+                        '/api/invoices/process': _env_limit(
+                            'INVOICE', per_minute=6, burst=3, concurrency=1, route_concurrency=4
+                        ),
+                        '/api/attachments/upload': _env_limit(
+                            'UPLOAD', per_minute=30, burst=10, concurrency=3, route_concurrency=8
+                        ),
+                        '/api/events': _env_limit('EVENTS', per_minute=20, burst=5, concurrency=2),
+                    }
+                )
+    return _limiter
+
+
+def set_rate_limiter(limiter):
+    """
+    Replace the rate limiter (None restores the configured one)
+    Args:
+        limiter (RateLimiter): Limiter to use
+    """
+    global _limiter
+    _limiter = limiter
+
+
+def too_many_requests(decision):
+    """
+    Build the 429 response body and headers for a rejection
+    Args:
+        decision (RateLimitDecision): Rejected decision
+    Returns:
+        tuple: (JSON body, headers)
+    """
+    retry_after = max(1, math.ceil(decision.retry_after))
+    return {
+        'status': 'error',
+        'message': f'Too many requests, retry after {retry_after} seconds'
+    }, {'Retry-After': str(retry_after)}
+
+
+def hold_request_slots():
+    """
+    Take over the concurrency slots of the current request, for a streamed
+    response that outlives it: teardown no longer releases them, the caller
+    passes them to RateLimiter.release() when the stream closes
+    Returns:
+        tuple: Slots held by the request (empty when none)
+    """
+    return g.pop('rate_limit_slots', None) or ()
+
+
+def rate_limit_identity(session, remote_addr):
+    """
+    Bucket key a request is charged to
+    Args:
+        session (dict): Verified session, or None
+        remote_addr (str): Client IP address
+    Returns:
+        str: The session's user, else 'ip:<address>'
+    """
+    if session:
+        return session['uid']
+    return f'ip:{remote_addr}'
+
+
+def init_rate_limits(app):
+    """
+    Register rate limiting on a Flask application
+    Must be registered after init_auth so the session is already verified.
+    Args:
+        app: Flask application
+    """
+    @app.before_request
+    def enforce_rate_limits():
+        """Reject the request with 429 when it is over a limit"""
+        limiter = get_rate_limiter()
+        if limiter is None or request.method == 'OPTIONS' or request.url_rule is None:
+            return None
+        rule = request.url_rule.rule
+        if rule in EXEMPT_RULES:
+            return None
+
+        decision = limiter.check(rule, rate_limit_identity(g.get('session'), request.remote_addr))
+        if not decision.allowed:
+            rate_limited.inc(endpoint=rule, limit=decision.limit)
+            body, headers = too_many_requests(decision)
+            return jsonify(body), 429, headers
+        g.rate_limit_slots = decision.slots
+        return None
+
+    @app.teardown_request
+    def release_rate_limit_slots(exception=None):
+        """Give back the concurrency slots of the finished request"""
+        slots = g.pop('rate_limit_slots', None)
+        limiter = get_rate_limiter()
+        if slots and limiter is not None:
+            limiter.release(slots)
@@ -0,0 +1,437 @@
+"""
+Recurring transaction detection and materialization for Menuda Finance API
+
+Detection groups a user's transactions by vendor and similar amount, then
+looks for a regular interval (weekly, biweekly, monthly, quarterly, yearly)
+between consecutive dates. All per-row work (sorting, amount clustering,
+interval computation) is done on NumPy arrays; Python only loops over the
+resulting candidate groups.
+
+Detection only reads what the user recorded up to today: the transactions
+materialization created (recurring_occurrences) are left out, or a series
+would keep confirming itself and a cancelled subscription would never miss
+a period. A series goes inactive MAX_MISSED_PERIODS after the last
+occurrence the user recorded.
+
+Detected series are stored in recurring_series. Materialization inserts the
+occurrences that fall due (up to a horizon) as regular transactions, in bulk,
+and records each one in recurring_occurrences so a date is never created
+twice. Like the transaction write handlers, it adjusts budget spend in the
+same database transaction and emits the threshold events after the commit.
+Both steps are run by scripts/recurring.py.
+"""
+import calendar
+import datetime
+import uuid
+from utils.budgets import apply_spend_changes, invalidate_status, spend_changes
+from utils.events import emit_all
+from utils.forecast import invalidate_forecast
+from utils.queries import RESERVE_TRANSACTION_ID
+
+# Candidate periods: (name, length in days, tolerance in days)
+PERIODS = [
+    ('weekly', 7.0, 1.0),
+    ('biweekly', 14.0, 2.0),
+    ('monthly', 30.44, 3.0),
+    ('quarterly', 91.31, 7.0),
+    ('yearly', 365.25, 10.0),
+]
+
+# Minimum transactions before a vendor/amount group can be a series
+MIN_OCCURRENCES = 3
+
+# Share of intervals that must match the period
+MIN_REGULARITY = 0.75
+
+# Relative width of an amount cluster
+AMOUNT_TOLERANCE = 0.05
+
+# A series is inactive once this many periods pass without an occurrence
+MAX_MISSED_PERIODS = 2
+
+# Series below this confidence are listed but never materialized
+MATERIALIZE_MIN_CONFIDENCE = 0.6
+
+# Deterministic series IDs: one series per (user, vendor, period)
+SERIES_NAMESPACE = uuid.UUID('6f3a9c1e-2b7d-4e58-9a41-0c8d5e7f2b13')
+
+# Transactions the user recorded up to today (not materialized ones)
+TRANSACTIONS_QUERY = """
+SELECT
+    t.vendor_id,
+    t.category_id,
+    t.title,
+    t.amount,
+    t.transaction_date
+FROM
+    transactions t
+WHERE
+    t.user_id = %s
+    AND t.is_deleted = FALSE
+    AND t.transaction_date <= %s
+    AND NOT EXISTS (
+        SELECT 1 FROM recurring_occurrences o WHERE o.transaction_id = t.transaction_id
+    )
+"""
+
+UPSERT_SERIES_QUERY = """
+INSERT INTO recurring_series (
+    series_id, user_id, vendor_id, category_id, title, amount, amount_tolerance,
+    period, interval_days, anchor_day, occurrences, confidence,
+    first_date, last_date, next_date, is_active, created_at, updated_at
+) VALUES (
+    %s, %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s,
+    %s, %s, %s, TRUE, NOW(), NOW()
+)
+ON DUPLICATE KEY UPDATE
+    category_id = VALUES(category_id),
+    title = VALUES(title),
+    amount = VALUES(amount),
+    amount_tolerance = VALUES(amount_tolerance),
+    interval_days = VALUES(interval_days),
+    anchor_day = VALUES(anchor_day),
+    occurrences = VALUES(occurrences),
+    confidence = VALUES(confidence),
+    first_date = VALUES(first_date),
+    last_date = VALUES(last_date),
+    next_date = GREATEST(next_date, VALUES(next_date)),
+    is_active = TRUE,
+    updated_at = NOW()
+"""
+
+DUE_SERIES_QUERY = """
+SELECT
+    series_id,
+    user_id,
+    vendor_id,
+    category_id,
+    title,
+    amount,
+    period,
+    anchor_day,
+    next_date
+FROM
+    recurring_series
+WHERE
+    is_active = TRUE
+    AND confidence >= %s
+    AND next_date <= %s
+ORDER BY
+    user_id,
+    next_date
+"""
+
+
+def add_months(date, months, anchor_day):
+    """
+    Move a date by whole months, keeping the anchor day when the month has it
+    Args:
+        date (datetime.date): Starting date
+        months (int): Months to add
+        anchor_day (int): Preferred day of month (clamped to the month length)
+    Returns:
+        datetime.date: Shifted date
+    """
+    month_index = date.month - 1 + months
+    year = date.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(anchor_day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
+
+
+def next_occurrence(date, period, anchor_day):
+    """
+    Date of the occurrence after a given one
+    Args:
+        date (datetime.date): Current occurrence
+        period (str): Period name from PERIODS
+        anchor_day (int): Day of month for monthly and longer periods
+    Returns:
+        datetime.date: Next occurrence
+    """
+    if period == 'weekly':
+        return date + datetime.timedelta(days=7)
+    if period == 'biweekly':
+        return date + datetime.timedelta(days=14)
+    if period == 'monthly':
+        return add_months(date, 1, anchor_day)
+    if period == 'quarterly':
+        return add_months(date, 3, anchor_day)
+    return add_months(date, 12, anchor_day)
+
+
+def _match_period(intervals):
+    """
+    Find the period that best explains a set of intervals
+    Args:
+        intervals (numpy.ndarray): Days between consecutive occurrences
+    Returns:
+        tuple: (name, days, regularity) or None when nothing is regular enough
+    """
+    import numpy as np
+
+    median = float(np.median(intervals))
+    for name, days, tolerance in PERIODS:
+        if abs(median - days) <= tolerance:
+            regularity = float(np.mean(np.abs(intervals - days) <= tolerance))
+            if regularity >= MIN_REGULARITY:
+                return name, days, regularity
+            return None
+    return None
+
+
+def detect_series(rows, today):
+    """
+    Detect recurring series in one user's transactions
+    Args:
+        rows (list): Dicts with vendor_id, category_id, title, amount, transaction_date
+        today (datetime.date): Reference date for deciding whether a series is still active
+    Returns:
+        list: Detected series as dicts, at most one per (vendor, period)
+    """
+    count = len(rows)
+    if count < MIN_OCCURRENCES:
+        return []
+
+    # numpy is imported on first use, keeping it out of worker boot
+    import numpy as np
+
+    _, vendor_codes = np.unique(
+        np.array([row['vendor_id'] for row in rows], dtype=object).astype(str),
+        return_inverse=True
+    )
+    amounts = np.array([float(row['amount']) for row in rows], dtype=np.float64)
+    days = np.array([row['transaction_date'] for row in rows], dtype='datetime64[D]').astype(np.int64)
+
+    today_day = np.datetime64(today, 'D').astype(np.int64)
+    best = {}
+
+    # Amount clusters are log-scale bins AMOUNT_TOLERANCE wide; a second pass
+    # with bins shifted by half a width catches series straddling a bin edge
+    log_amounts = np.log(np.maximum(np.abs(amounts), 0.01)) / np.log1p(AMOUNT_TOLERANCE)
+    for offset in (0.0, 0.5):
+        bins = np.floor(log_amounts + offset).astype(np.int64)
+
+        # Order by (vendor, bin, date) so each cluster's dates are contiguous and sorted
+        order = np.lexsort((days, bins, vendor_codes))
+        sorted_vendors = vendor_codes[order]
+        sorted_bins = bins[order]
+        sorted_days = days[order]
+        boundaries = (sorted_vendors[1:] != sorted_vendors[:-1]) | (sorted_bins[1:] != sorted_bins[:-1])
+        starts = np.flatnonzero(np.concatenate(([True], boundaries)))
+        ends = np.append(starts[1:], count)
+        candidates = np.flatnonzero(ends - starts >= MIN_OCCURRENCES)
+
+        for group in candidates:
+            series = _series_from_group(rows, amounts, order[starts[group]:ends[group]],
+                                        sorted_days[starts[group]:ends[group]], today_day)
+            if series is None:
+                continue
+            key = (series['vendor_id'], series['period'])
+            current = best.get(key)
+            if current is None or (series['confidence'], series['occurrences']) > (current['confidence'], current['occurrences']):
+                best[key] = series
+
+    return list(best.values())
+
+
+def _series_from_group(rows, amounts, indexes, group_days, today_day):
+    """
+    Turn one vendor/amount cluster into a series if its dates are periodic
+    Args:
+        rows (list): All transaction rows
+        amounts (numpy.ndarray): Amount of every row
+        indexes (numpy.ndarray): Row indexes of the cluster, sorted by date
+        group_days (numpy.ndarray): Dates of the cluster as day numbers, sorted
+        today_day (int): Today as a day number
+    Returns:
+        dict: Series, or None when the cluster is not recurring
+    """
+    import numpy as np
+
+    # Same-day duplicates (split payments) count as one occurrence
+    keep = np.concatenate(([True], np.diff(group_days) > 0))
+    group_days = group_days[keep]
+    indexes = indexes[keep]
+    if len(group_days) < MIN_OCCURRENCES:
+        return None
+
+    intervals = np.diff(group_days).astype(np.float64)
+    matched = _match_period(intervals)
+    if matched is None:
+        return None
+    period, period_days, regularity = matched
+
+    # Skip series that stopped (cancelled subscriptions)
+    if today_day - group_days[-1] > MAX_MISSED_PERIODS * period_days:
+        return None
+
+    group_amounts = amounts[indexes]
+    median_amount = float(np.median(group_amounts))
+    latest = rows[indexes[-1]]
+    dates = group_days.astype('datetime64[D]').tolist()
+    anchor_day = int(np.median([date.day for date in dates]))
+    occurrences = len(dates)
+
+    return {
+        'vendor_id': latest['vendor_id'],
+        'category_id': latest['category_id'],
+        'title': latest['title'],
+        'amount': round(median_amount, 2),
+        'amount_tolerance': round(float(np.max(np.abs(group_amounts - median_amount))), 2),
+        'period': period,
+        'interval_days': round(float(np.median(intervals)), 2),
+        'anchor_day': anchor_day,
+        'occurrences': occurrences,
+        'confidence': round(regularity * min(1.0, occurrences / 6), 4),
+        'first_date': dates[0],
+        'last_date': dates[-1],
+        'next_date': next_occurrence(dates[-1], period, anchor_day),
+    }
+
+
+def series_id_for(user_id, vendor_id, period):
+    """
+    Stable series ID, so re-running detection updates rows instead of duplicating them
+    Args:
+        user_id (str): User ID
+        vendor_id (str): Vendor ID
+        period (str): Period name
+    Returns:
+        str: Series UUID
+    """
+    return str(uuid.uuid5(SERIES_NAMESPACE, f'{user_id}:{vendor_id}:{period}'))
+
+
+def detect_for_user(connection, user_id, today=None):
+    """
+    Detect and store a user's recurring series, deactivating ones no longer found
+    Args:
+        connection: Database connection
+        user_id (str): User ID
+        today (datetime.date): Reference date (defaults to today)
+    Returns:
+        list: Detected series
+    """
+    today = today or datetime.date.today()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(TRANSACTIONS_QUERY, (user_id, today))
+        series = detect_series(cursor.fetchall(), today)
+
+        series_ids = []
+        params = []
+        for item in series:
+            item['series_id'] = series_id_for(user_id, item['vendor_id'], item['period'])
+            series_ids.append(item['series_id'])
+            params.append((
+                item['series_id'], user_id, item['vendor_id'], item['category_id'], item['title'],
+                item['amount'], item['amount_tolerance'], item['period'], item['interval_days'],
+                item['anchor_day'], item['occurrences'], item['confidence'],
+                item['first_date'], item['last_date'], item['next_date']
+            ))
+
+        if params:
+            cursor.executemany(UPSERT_SERIES_QUERY, params)
+
+        # Series that no longer match stop being materialized
+        if series_ids:
+            placeholders = ', '.join(['%s'] * len(series_ids))
+            cursor.execute(
+                f"UPDATE recurring_series SET is_active = FALSE, updated_at = NOW() "
+                f"WHERE user_id = %s AND is_active = TRUE AND series_id NOT IN ({placeholders})",
+                (user_id, *series_ids)
+            )
+        else:
+            cursor.execute(
+                "UPDATE recurring_series SET is_active = FALSE, updated_at = NOW() "
+                "WHERE user_id = %s AND is_active = TRUE",
+                (user_id,)
+            )
+
+        connection.commit()
+        return series
+    finally:
+        cursor.close()
+
+
+def materialize_due(connection, since, until):
+    """
+    Create every occurrence due in a date range, in bulk
+    Args:
+        connection: Database connection
+        since (datetime.date): Earliest date to create; older due dates are
+            skipped rather than backfilled, since the user did not record them
+        until (datetime.date): Last date to materialize (today plus the horizon)
+    Returns:
+        int: Number of transactions created
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(DUE_SERIES_QUERY, (MATERIALIZE_MIN_CONFIDENCE, until))
+        due = cursor.fetchall()
+        if not due:
+            return 0
+
+        transaction_rows = []
+        occurrence_rows = []
+        series_updates = []
+        # Budget spend deltas per user
+        changes = {}
+        for series in due:
+            occurrence_date = series['next_date']
+            while occurrence_date < since:
+                occurrence_date = next_occurrence(occurrence_date, series['period'], series['anchor_day'])
+            while occurrence_date <= until:
+                transaction_id = str(uuid.uuid4())
+                transaction_rows.append((
+                    transaction_id, series['user_id'], series['title'], series['amount'],
+                    occurrence_date, series['category_id'], series['vendor_id']
+                ))
+                occurrence_rows.append((series['series_id'], occurrence_date, transaction_id))
+                changes.setdefault(series['user_id'], []).extend(spend_changes(current={
+                    'amount': series['amount'],
+                    'category_id': series['category_id'],
+                    'transaction_date': occurrence_date
+                }))
+                occurrence_date = next_occurrence(occurrence_date, series['period'], series['anchor_day'])
+            series_updates.append((occurrence_date, series['series_id']))
+
+        # recurring_occurrences has a unique (series_id, occurrence_date) key,
+        # so an overlapping run fails and rolls back instead of duplicating
+        cursor.executemany("""
+            INSERT INTO recurring_occurrences (series_id, occurrence_date, transaction_id, created_at)
+            VALUES (%s, %s, %s, NOW())
+        """, occurrence_rows)
+        cursor.executemany(RESERVE_TRANSACTION_ID, [row[:2] for row in transaction_rows])
+        cursor.executemany("""
+            INSERT INTO transactions (
+                transaction_id, user_id, title, amount, transaction_date,
+                category_id, vendor_id, created_at, updated_at, is_deleted
+            ) VALUES (
+                %s, %s, %s, %s, %s,
+                %s, %s, NOW(), NOW(), FALSE
+            )
+        """, transaction_rows)
+        cursor.executemany("""
+            UPDATE recurring_series SET next_date = %s, updated_at = NOW()
+            WHERE series_id = %s
+        """, series_updates)
+
+        events = []
+        for user_id, user_changes in changes.items():
+            events.extend(apply_spend_changes(cursor, user_id, user_changes))
+
+        connection.commit()
+
+        for user_id in changes:
+            invalidate_status(user_id)
+            invalidate_forecast(user_id)
+        emit_all(events)
+        return len(transaction_rows)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -2,10 +2,25 @@
 """
 Amazon S3 utilities for Menuda Finance API
 """
+import asyncio
 import os
 import uuid
-import boto3
-from botocore.exceptions import ClientError
+from utils.metrics import time_external
+
+# Optional override used by benchmarks and local stand-ins (see set_client_factory)
+_client_factory = None
+
+
+def set_client_factory(factory):
+    """
+    Replace how the S3 client is created (e.g. with a local stand-in)
+    Args:
+        factory: Callable returning an object with boto3's upload_file and
+            upload_fileobj methods, or None to restore the default
+    """
+    global _client_factory
+    _client_factory = factory
+
 
 class S3Manager:
     """
@@ -15,12 +30,18 @@ class S3Manager:
         """
         Initialize S3 client with credentials from environment variables
         """
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
-        )
+        if _client_factory is not None:
+            self.s3_client = _client_factory()
+        else:
+            # boto3 takes ~100ms to import; load it on the first upload
+            # rather than at worker boot
+            import boto3
+            self.s3_client = boto3.client(
+                's3',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION', 'us-east-1')
+            )
         self.bucket_name = os.getenv('S3_BUCKET_NAME')
         
     def upload_file(self, file_path, user_id, content_type=None):
@@ -38,6 +59,7 @@ class S3Manager:
         Raises:
             Exception: If upload fails
         """
+        from botocore.exceptions import ClientError
         try:
             # Generate a unique file name
             file_name = f"{uuid.uuid4().hex}{os.path.splitext(file_path)[1]}"
@@ -51,12 +73,13 @@ class S3Manager:
                 extra_args['ContentType'] = content_type
             
             # Upload the file
-            self.s3_client.upload_file(
-                file_path, 
-                self.bucket_name, 
-                s3_key,
-                ExtraArgs=extra_args
-            )
+            with time_external('s3', 'upload_file'):
+                self.s3_client.upload_file(
+                    file_path, 
+                    self.bucket_name, 
+                    s3_key,
+                    ExtraArgs=extra_args
+                )
             
             # Generate the URL
             url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
@@ -83,6 +106,7 @@ class S3Manager:
         Raises:
             Exception: If upload fails
         """
+        from botocore.exceptions import ClientError
         try:
             # Generate a unique file name
             file_name = f"{uuid.uuid4().hex}{file_ext}"
@@ -96,12 +120,13 @@ class S3Manager:
                 extra_args['ContentType'] = content_type
             
             # Upload the file object
-            self.s3_client.upload_fileobj(
-                file_obj, 
-                self.bucket_name, 
-                s3_key,
-                ExtraArgs=extra_args
-            )
+            with time_external('s3', 'upload_fileobj'):
+                self.s3_client.upload_fileobj(
+                    file_obj, 
+                    self.bucket_name, 
+                    s3_key,
+                    ExtraArgs=extra_args
+                )
             
             # Generate the URL
             url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
@@ -110,4 +135,20 @@ class S3Manager:
             
         except ClientError as e:
             print(f"Error uploading to S3: {e}")
-            raise Exception(f"Failed to upload file to S3: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to upload file to S3: {str(e)}")
+    
+    async def upload_file_async(self, file_path, user_id, content_type=None):
+        """
+        Upload a file to S3 without blocking the event loop (ASGI mode)
+        The boto3 client is thread-safe, so the upload runs in the default
+        executor while the event loop keeps serving other requests
+        
+        Args:
+            file_path (str): Path to the local file
+            user_id (str): User ID for organizing files in S3
+            content_type (str, optional): MIME type of the file
+            
+        Returns:
+            str: URL of the uploaded file
+        """
+        return await asyncio.to_thread(self.upload_file, file_path, user_id, content_type)
@@ -0,0 +1,344 @@
+"""
+In-process full-text search over transaction titles, vendors and categories
+
+Each user gets an inverted index built lazily from one query the first time
+they search, then kept current by the create/update/delete handlers. Indexes
+live in an LRU cache with a time-to-live, so memory stays bounded and writes
+served by other worker processes are picked up after at most
+SEARCH_INDEX_TTL seconds.
+
+Matching, per query term:
+    exact   - the term is in the index
+    prefix  - an indexed term starts with the query term ("ube" -> "uber")
+    fuzzy   - an indexed term is one edit away ("ubre" -> "uber")
+Every query term must match (AND). Results are ranked by the sum of
+field weight * match quality * idf, newest transaction first on ties.
+"""
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import unicodedata
+from utils.cache import LRUCache
+
+# Field weights: a vendor hit is a stronger signal than a word in the title
+FIELD_WEIGHTS = {
+    'vendor_name': 3.0,
+    'category_name': 2.0,
+    'title': 1.0
+}
+
+# Match quality multipliers
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.6
+FUZZY_MATCH = 0.4
+
+# Shorter terms produce too many fuzzy neighbours to be useful
+FUZZY_MIN_LENGTH = 4
+
+# Cache sizing
+SEARCH_INDEX_MAX_USERS = int(os.environ.get('SEARCH_INDEX_MAX_USERS', 200))
+SEARCH_INDEX_TTL = float(os.environ.get('SEARCH_INDEX_TTL', 300))
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Rows the index is built from
+INDEX_QUERY = """
+SELECT
+    t.transaction_id,
+    t.title,
+    t.transaction_date,
+    c.category_name,
+    v.vendor_name
+FROM
+    transactions t
+    JOIN categories c ON t.category_id = c.category_id
+    JOIN vendors v ON t.vendor_id = v.vendor_id
+WHERE
+    t.user_id = %s
+    AND t.is_deleted = FALSE
+"""
+
+
+def tokenize(text):
+    """
+    Split text into lowercase, accent-free tokens
+    Args:
+        text (str): Text to tokenize
+    Returns:
+        list: Tokens in order of appearance
+    """
+    if not text:
+        return []
+    normalized = unicodedata.normalize('NFKD', str(text).lower())
+    normalized = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    return _TOKEN_PATTERN.findall(normalized)
+
+
+def _deletions(term):
+    """All strings obtained by deleting one character from a term"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a, b):
+    """
+    Check whether two strings are at most one insertion, deletion,
+    substitution or adjacent transposition apart
+    """
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > 1:
+        return False
+    if len_a == len_b:
+        diffs = [i for i in range(len_a) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len_a > len_b:
+        a, b = b, a
+    # b is one character longer: it must equal a with one insertion
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class TransactionSearchIndex:
+    """
+    Inverted index over one user's transactions
+    """
+    def __init__(self, transactions=()):
+        """
+        Initialize index
+        Args:
+            transactions (iterable): Rows to index up front
+        """
+        self._lock = threading.RLock()
+        # term -> {transaction_id: field weight}
+        self._postings = {}
+        # transaction_id -> (terms, transaction_date)
+        self._documents = {}
+        # deletion variant -> terms, for one-edit fuzzy lookups
+        self._deletion_index = {}
+        # Sorted vocabulary for prefix lookups
+        self._vocabulary = []
+
+        # Bulk load: sort the vocabulary once at the end instead of per term
+        self._vocabulary_dirty = True
+        for transaction in transactions:
+            self.add(transaction)
+        self._vocabulary = sorted(self._postings)
+        self._vocabulary_dirty = False
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, transaction):
+        """
+        Index a transaction, replacing any previous version
+        Args:
+            transaction (dict): Row with transaction_id, title, vendor_name,
+                category_name and transaction_date
+        """
+        transaction_id = transaction['transaction_id']
+        weights = {}
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for term in tokenize(transaction.get(field)):
+                weights[term] = max(weights.get(term, 0.0), field_weight)
+
+        transaction_date = transaction.get('transaction_date')
+        if transaction_date is not None and not isinstance(transaction_date, str):
+            transaction_date = transaction_date.isoformat()
+
+        with self._lock:
+            self._remove_locked(transaction_id)
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    self._add_term_locked(term)
+                postings[transaction_id] = weight
+            self._documents[transaction_id] = (tuple(weights), transaction_date or '')
+
+    def remove(self, transaction_id):
+        """
+        Drop a transaction from the index
+        Args:
+            transaction_id (str): Transaction ID
+        """
+        with self._lock:
+            self._remove_locked(transaction_id)
+
+    def _add_term_locked(self, term):
+        if not self._vocabulary_dirty:
+            bisect.insort(self._vocabulary, term)
+        if len(term) >= FUZZY_MIN_LENGTH - 1:
+            for variant in _deletions(term) | {term}:
+                self._deletion_index.setdefault(variant, set()).add(term)
+
+    def _remove_locked(self, transaction_id):
+        document = self._documents.pop(transaction_id, None)
+        if document is None:
+            return
+        for term in document[0]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(transaction_id, None)
+            if not postings:
+                del self._postings[term]
+                position = bisect.bisect_left(self._vocabulary, term)
+                if position < len(self._vocabulary) and self._vocabulary[position] == term:
+                    del self._vocabulary[position]
+                for variant in _deletions(term) | {term}:
+                    terms = self._deletion_index.get(variant)
+                    if terms is not None:
+                        terms.discard(term)
+                        if not terms:
+                            del self._deletion_index[variant]
+
+    def _expand(self, query_term):
+        """
+        Find indexed terms matching a query term
+        Args:
+            query_term (str): Normalized query token
+        Returns:
+            dict: Indexed term -> match quality
+        """
+        matches = {}
+
+        # Exact and prefix matches form a contiguous run in the sorted vocabulary
+        position = bisect.bisect_left(self._vocabulary, query_term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(query_term):
+            term = self._vocabulary[position]
+            matches[term] = EXACT_MATCH if term == query_term else PREFIX_MATCH
+            position += 1
+
+        # One-edit neighbours share a deletion variant with the query term
+        if len(query_term) >= FUZZY_MIN_LENGTH:
+            for variant in _deletions(query_term) | {query_term}:
+                for term in self._deletion_index.get(variant, ()):
+                    if term not in matches and _within_one_edit(query_term, term):
+                        matches[term] = FUZZY_MATCH
+
+        return matches
+
+    def search(self, query, offset=0, limit=20):
+        """
+        Search the index
+        Args:
+            query (str): Free-text query
+            offset (int): Number of ranked results to skip
+            limit (int): Maximum number of results to return
+        Returns:
+            tuple: (list of transaction IDs for the page, total match count)
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return [], 0
+
+        with self._lock:
+            total_documents = len(self._documents) or 1
+            scores = None
+            for query_term in query_terms:
+                term_scores = {}
+                for term, quality in self._expand(query_term).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + total_documents / len(postings))
+                    for transaction_id, field_weight in postings.items():
+                        score = field_weight * quality * idf
+                        if score > term_scores.get(transaction_id, 0.0):
+                            term_scores[transaction_id] = score
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        transaction_id: score + term_scores[transaction_id]
+                        for transaction_id, score in scores.items()
+                        if transaction_id in term_scores
+                    }
+                if not scores:
+                    return [], 0
+
+            # Only the requested page needs a full ordering
+            documents = self._documents
+            ranked = heapq.nlargest(
+                offset + limit,
+                scores,
+                key=lambda transaction_id: (scores[transaction_id], documents[transaction_id][1])
+            )
+
+        return ranked[offset:], len(scores)
+
+
+class SearchIndexRegistry:
+    """
+    Per-user search indexes, built on first use
+    """
+    def __init__(self, max_users=SEARCH_INDEX_MAX_USERS, ttl=SEARCH_INDEX_TTL):
+        """
+        Initialize registry
+        Args:
+            max_users (int): Number of user indexes kept in memory
+            ttl (float): Seconds before an index is rebuilt from the database
+        """
+        self._indexes = LRUCache(max_entries=max_users, ttl=ttl)
+
+    def get(self, user_id, connection):
+        """
+        Get a user's index, building it from the database if needed
+        Args:
+            user_id (str): User ID
+            connection: Database connection used when the index is built
+        Returns:
+            TransactionSearchIndex: The user's index
+        """
+        def build():
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(INDEX_QUERY, (user_id,))
+                return TransactionSearchIndex(cursor.fetchall())
+            finally:
+                cursor.close()
+
+        # Concurrent first searches for the same user build the index once
+        return self._indexes.get_or_create(user_id, build)
+
+    def index_transaction(self, user_id, transaction):
+        """
+        Add or replace a transaction in the user's index, if it is loaded
+        Args:
+            user_id (str): User ID
+            transaction (dict): Transaction row
+        """
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.add(transaction)
+
+    def remove_transaction(self, user_id, transaction_id):
+        """
+        Remove a transaction from the user's index, if it is loaded
+        Args:
+            user_id (str): User ID
+            transaction_id (str): Transaction ID
+        """
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.remove(transaction_id)
+
+    def invalidate(self, user_id):
+        """
+        Drop a user's index so the next search rebuilds it
+        Args:
+            user_id (str): User ID
+        """
+        self._indexes.pop(user_id)
+
+
+# Process-wide registry used by the transaction routes
+search_indexes = SearchIndexRegistry()
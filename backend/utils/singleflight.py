@@ -0,0 +1,190 @@
+"""
+Request coalescing (single-flight) for Menuda Finance API
+
+When several identical requests arrive at once (the home, quick-access and
+transactions views all load /api/transactions on startup), only the first
+one runs the query and serializes the payload; the others wait for it and
+send the same bytes. Nothing is cached: once the leader finishes, the next
+request starts a new flight.
+
+A flight that started before the user's last write is never joined, so a
+read issued after a write always sees it.
+
+Metrics: menuda_singleflight_calls_total{group, role} where role is
+'leader' (ran the work) or 'follower' (shared a leader's result); the
+dedup hit rate is follower / (leader + follower).
+"""
+import asyncio
+import functools
+import threading
+import time
+from flask import current_app, request
+from utils.auth import current_user_id
+from utils.db import last_write
+from utils.metrics import registry
+
+singleflight_calls = registry.counter(
+    'menuda_singleflight_calls_total',
+    'Coalesced calls by group and role (leader ran the work, follower shared it)',
+    ('group', 'role')
+)
+
+
+class _Call:
+    """
+    One in-flight call and, once done, its result
+    """
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls with the same key across threads
+    """
+    def __init__(self, group):
+        """
+        Initialize group
+        Args:
+            group (str): Name used in metrics
+        """
+        self.group = group
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, not_before=None):
+        """
+        Run fn, or wait for the identical call already in flight
+        Args:
+            key: Hashable identity of the call
+            fn: Zero-argument callable doing the work
+            not_before (float): Only join a flight started at or after this
+                time.monotonic() value (e.g. the user's last write)
+        Returns:
+            tuple: (result, shared) where shared is True for followers
+        Raises:
+            Exception: Whatever fn raised (followers re-raise the leader's error)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and (not_before is None or call.started_at >= not_before):
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            singleflight_calls.inc(group=self.group, role='follower')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        singleflight_calls.inc(group=self.group, role='leader')
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # A newer flight may have replaced this one (see not_before)
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Deduplicate concurrent coroutine calls with the same key on one event loop
+    """
+    def __init__(self, group):
+        """
+        Initialize group
+        Args:
+            group (str): Name used in metrics
+        """
+        self.group = group
+        self._calls = {}
+
+    async def do(self, key, fn, not_before=None):
+        """
+        Await fn(), or the identical call already in flight
+        Args:
+            key: Hashable identity of the call
+            fn: Zero-argument coroutine function doing the work
+            not_before (float): Only join a flight started at or after this
+                time.monotonic() value
+        Returns:
+            tuple: (result, shared) where shared is True for followers
+        """
+        loop = asyncio.get_running_loop()
+        flight = self._calls.get((loop, key))
+        if flight is not None and (not_before is None or flight[0] >= not_before):
+            singleflight_calls.inc(group=self.group, role='follower')
+            # shield: a cancelled follower must not cancel the leader's work
+            return await asyncio.shield(flight[1]), True
+
+        singleflight_calls.inc(group=self.group, role='leader')
+        future = loop.create_future()
+        flight = self._calls[(loop, key)] = (time.monotonic(), future)
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited future does not log a warning
+            future.exception()
+            raise
+        finally:
+            if self._calls.get((loop, key)) is flight:
+                del self._calls[(loop, key)]
+
+
+def request_key(user_id):
+    """
+    Identity of the current GET request for coalescing
+    Args:
+        user_id (str): Resolved user the request acts for
+    Returns:
+        tuple: (endpoint, user_id, sorted query parameters)
+    """
+    return (request.endpoint, user_id, tuple(sorted(request.args.items(multi=True))))
+
+
+def coalesce(group):
+    """
+    Share one response between identical concurrent requests to a Flask view
+    The leader's response body is serialized once; followers get a new
+    response with the same bytes, status and headers.
+    Args:
+        group (str): Name used in metrics
+    Returns:
+        Decorator for a view function
+    """
+    flights = SingleFlight(group)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = current_user_id(request.args.get('user_id'))
+            if not user_id:
+                return view(*args, **kwargs)
+
+            def run():
+                response = current_app.make_response(view(*args, **kwargs))
+                return response.get_data(), response.status_code, list(response.headers.items())
+
+            (body, status, headers), _ = flights.do(
+                request_key(user_id) + (args, tuple(sorted(kwargs.items()))),
+                run,
+                not_before=last_write(user_id)
+            )
+            return current_app.response_class(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,350 @@
+"""
+Vendor-to-category suggestions for Menuda Finance API
+
+Each user gets a frequency index built from their transaction history: how
+often each vendor was booked under each category, plus the vendor list for
+name autocomplete. Indexes are built on first use from three small queries,
+updated incrementally by the vendor, category and transaction handlers, and
+held in an LRU cache (SUGGESTION_INDEX_MAX_USERS, SUGGESTION_INDEX_TTL) so
+changes made through other worker processes are picked up on rebuild.
+"""
+import bisect
+import os
+import threading
+from collections import Counter
+from utils.cache import LRUCache
+from utils.db import get_db_connection, close_connection
+from utils.search import tokenize
+
+# Cache sizing
+SUGGESTION_INDEX_MAX_USERS = int(os.environ.get('SUGGESTION_INDEX_MAX_USERS', 500))
+SUGGESTION_INDEX_TTL = float(os.environ.get('SUGGESTION_INDEX_TTL', 600))
+
+# Extra weight for the category stored on the vendor itself, so a vendor
+# without history still suggests the category it was created with
+VENDOR_DEFAULT_WEIGHT = 1
+
+# Transactions per vendor and category
+USAGE_QUERY = """
+SELECT
+    t.vendor_id,
+    t.category_id,
+    COUNT(*) AS uses
+FROM
+    transactions t
+WHERE
+    t.user_id = %s
+    AND t.is_deleted = FALSE
+GROUP BY
+    t.vendor_id,
+    t.category_id
+"""
+
+# Active vendors with their default category
+VENDORS_QUERY = """
+SELECT
+    v.vendor_id,
+    v.vendor_name,
+    v.category_id
+FROM
+    vendors v
+WHERE
+    v.user_id = %s
+    AND v.is_active = TRUE
+"""
+
+# Active categories
+CATEGORIES_QUERY = """
+SELECT
+    c.category_id,
+    c.category_name
+FROM
+    categories c
+WHERE
+    c.user_id = %s
+    AND c.is_active = TRUE
+"""
+
+
+def _normalize(name):
+    """Lowercase, accent-free form of a name used for matching"""
+    return ' '.join(tokenize(name))
+
+
+class VendorSuggestionIndex:
+    """
+    Per-user vendor and category usage counts
+    """
+    def __init__(self, vendors=(), categories=(), usage=()):
+        """
+        Initialize index
+        Args:
+            vendors (iterable): Rows with vendor_id, vendor_name, category_id
+            categories (iterable): Rows with category_id, category_name
+            usage (iterable): Rows with vendor_id, category_id, uses
+        """
+        self._lock = threading.Lock()
+        # vendor_id -> {'vendor_name', 'category_id'}
+        self._vendors = {}
+        # category_id -> category_name
+        self._categories = {}
+        # vendor_id -> Counter(category_id -> transactions)
+        self._usage = {}
+        # Counter(category_id -> transactions) across all vendors
+        self._category_totals = Counter()
+        # Sorted (word prefix key, vendor_id) pairs for autocomplete
+        self._name_keys = []
+
+        for row in categories:
+            self._categories[row['category_id']] = row['category_name']
+        for row in usage:
+            self._record_locked(row['vendor_id'], row['category_id'], int(row['uses']))
+        for row in vendors:
+            self._vendors[row['vendor_id']] = {
+                'vendor_name': row['vendor_name'],
+                'category_id': row['category_id']
+            }
+        self._name_keys = sorted(
+            (key, vendor_id)
+            for vendor_id, vendor in self._vendors.items()
+            for key in self._keys_for(vendor['vendor_name'])
+        )
+
+    @staticmethod
+    def _keys_for(vendor_name):
+        """
+        Autocomplete keys for a vendor name: the full name and every suffix
+        starting at a word, so "valdez" finds "Juan Valdez"
+        """
+        words = tokenize(vendor_name)
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _record_locked(self, vendor_id, category_id, delta):
+        counts = self._usage.setdefault(vendor_id, Counter())
+        counts[category_id] += delta
+        self._category_totals[category_id] += delta
+        if counts[category_id] <= 0:
+            del counts[category_id]
+        if self._category_totals[category_id] <= 0:
+            del self._category_totals[category_id]
+
+    def record(self, vendor_id, category_id, delta=1):
+        """
+        Count (or uncount) a transaction booked under a vendor and category
+        Args:
+            vendor_id (str): Vendor ID
+            category_id (str): Category ID
+            delta (int): +1 for a new transaction, -1 for a removed one
+        """
+        with self._lock:
+            self._record_locked(vendor_id, category_id, delta)
+
+    def set_vendor(self, vendor_id, vendor_name, category_id):
+        """
+        Add a vendor or change its name or default category
+        Args:
+            vendor_id (str): Vendor ID
+            vendor_name (str): Vendor name
+            category_id (str): Default category ID
+        """
+        with self._lock:
+            previous = self._vendors.get(vendor_id)
+            if previous is not None and previous['vendor_name'] != vendor_name:
+                for key in self._keys_for(previous['vendor_name']):
+                    position = bisect.bisect_left(self._name_keys, (key, vendor_id))
+                    if position < len(self._name_keys) and self._name_keys[position] == (key, vendor_id):
+                        del self._name_keys[position]
+            if previous is None or previous['vendor_name'] != vendor_name:
+                for key in self._keys_for(vendor_name):
+                    bisect.insort(self._name_keys, (key, vendor_id))
+            self._vendors[vendor_id] = {'vendor_name': vendor_name, 'category_id': category_id}
+
+    def set_category(self, category_id, category_name):
+        """
+        Add a category or change its name
+        Args:
+            category_id (str): Category ID
+            category_name (str): Category name
+        """
+        with self._lock:
+            self._categories[category_id] = category_name
+
+    def _vendor_uses(self, vendor_id):
+        return sum(self._usage.get(vendor_id, {}).values())
+
+    def _match_vendors(self, text, limit):
+        """
+        Vendors whose name (or a word in it) starts with the text,
+        exact matches first, then by number of transactions
+        """
+        prefix = _normalize(text)
+        if not prefix:
+            return []
+
+        matched = set()
+        position = bisect.bisect_left(self._name_keys, (prefix, ''))
+        while position < len(self._name_keys) and self._name_keys[position][0].startswith(prefix):
+            matched.add(self._name_keys[position][1])
+            position += 1
+
+        return sorted(
+            matched,
+            key=lambda vendor_id: (
+                _normalize(self._vendors[vendor_id]['vendor_name']) != prefix,
+                -self._vendor_uses(vendor_id),
+                self._vendors[vendor_id]['vendor_name']
+            )
+        )[:limit]
+
+    def _rank_categories(self, counts, limit):
+        total = sum(counts.values())
+        ranked = sorted(
+            (category_id for category_id in counts if category_id in self._categories),
+            key=lambda category_id: (-counts[category_id], self._categories[category_id])
+        )[:limit]
+        return [
+            {
+                'category_id': category_id,
+                'category_name': self._categories[category_id],
+                'score': round(counts[category_id] / total, 4) if total else 0.0
+            }
+            for category_id in ranked
+        ]
+
+    def suggest(self, query=None, vendor_id=None, limit=5):
+        """
+        Suggest vendors matching typed text and categories for the vendor
+        Args:
+            query (str): Vendor name typed so far
+            vendor_id (str): Vendor already chosen, if any
+            limit (int): Maximum suggestions of each kind
+        Returns:
+            dict: 'vendors' autocomplete list and ranked 'categories'
+        """
+        with self._lock:
+            vendor_ids = self._match_vendors(query, limit) if query else []
+
+            # Category evidence: the chosen vendor, else an exact name match,
+            # else every autocomplete match, else the user's overall usage
+            if vendor_id is None and vendor_ids:
+                top = vendor_ids[0]
+                if _normalize(self._vendors[top]['vendor_name']) == _normalize(query):
+                    vendor_id = top
+
+            if vendor_id is not None and vendor_id in self._vendors:
+                sources = [vendor_id]
+            else:
+                sources = vendor_ids
+
+            counts = Counter()
+            for source in sources:
+                counts.update(self._usage.get(source, {}))
+                counts[self._vendors[source]['category_id']] += VENDOR_DEFAULT_WEIGHT
+            if not counts:
+                counts = self._category_totals
+
+            return {
+                'vendors': [
+                    {
+                        'vendor_id': match,
+                        'vendor_name': self._vendors[match]['vendor_name'],
+                        'category_id': self._vendors[match]['category_id'],
+                        'uses': self._vendor_uses(match)
+                    }
+                    for match in vendor_ids
+                ],
+                'categories': self._rank_categories(counts, limit)
+            }
+
+
+class SuggestionIndexRegistry:
+    """
+    Per-user suggestion indexes, built on first use
+    """
+    def __init__(self, max_users=SUGGESTION_INDEX_MAX_USERS, ttl=SUGGESTION_INDEX_TTL):
+        """
+        Initialize registry
+        Args:
+            max_users (int): Number of user indexes kept in memory
+            ttl (float): Seconds before an index is rebuilt from the database
+        """
+        self._indexes = LRUCache(max_entries=max_users, ttl=ttl)
+
+    def get(self, user_id):
+        """
+        Get a user's index, building it from the database if needed
+        Args:
+            user_id (str): User ID
+        Returns:
+            VendorSuggestionIndex: The user's index
+        """
+        def build():
+            # A connection is only checked out when the index is not cached
+            connection = get_db_connection(readonly=True, user_id=user_id)
+            cursor = None
+            try:
+                cursor = connection.cursor(dictionary=True)
+                cursor.execute(VENDORS_QUERY, (user_id,))
+                vendors = cursor.fetchall()
+                cursor.execute(CATEGORIES_QUERY, (user_id,))
+                categories = cursor.fetchall()
+                cursor.execute(USAGE_QUERY, (user_id,))
+                usage = cursor.fetchall()
+            finally:
+                close_connection(connection, cursor)
+            return VendorSuggestionIndex(vendors, categories, usage)
+
+        return self._indexes.get_or_create(user_id, build)
+
+    def _loaded(self, user_id):
+        return self._indexes.get(user_id)
+
+    def record_transaction(self, user_id, vendor_id, category_id, delta=1):
+        """
+        Count a transaction in the user's index, if it is loaded
+        Args:
+            user_id (str): User ID
+            vendor_id (str): Vendor ID
+            category_id (str): Category ID
+            delta (int): +1 for a new transaction, -1 for a removed one
+        """
+        index = self._loaded(user_id)
+        if index is not None:
+            index.record(vendor_id, category_id, delta)
+
+    def set_vendor(self, user_id, vendor_id, vendor_name, category_id):
+        """
+        Add or update a vendor in the user's index, if it is loaded
+        Args:
+            user_id (str): User ID
+            vendor_id (str): Vendor ID
+            vendor_name (str): Vendor name
+            category_id (str): Default category ID
+        """
+        index = self._loaded(user_id)
+        if index is not None:
+            index.set_vendor(vendor_id, vendor_name, category_id)
+
+    def set_category(self, user_id, category_id, category_name):
+        """
+        Add or update a category in the user's index, if it is loaded
+        Args:
+            user_id (str): User ID
+            category_id (str): Category ID
+            category_name (str): Category name
+        """
+        index = self._loaded(user_id)
+        if index is not None:
+            index.set_category(category_id, category_name)
+
+    def invalidate(self, user_id):
+        """
+        Drop a user's index so the next lookup rebuilds it
+        Args:
+            user_id (str): User ID
+        """
+        self._indexes.pop(user_id)
+
+
+# Process-wide registry used by the vendor, category and transaction routes
+suggestion_indexes = SuggestionIndexRegistry()
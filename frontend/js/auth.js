@@ -19,8 +19,9 @@ function handleCredentialResponse(response) {
         picture: responsePayload.picture
     };
     
-    // Check if user exists and get or create UUID
-    checkUserAndGetUUID(userData)
+    // Check if user exists and get or create UUID; the backend verifies the
+    // credential itself before it issues a session token
+    checkUserAndGetUUID(userData, response.credential)
         .then(userWithId => {
             // Store complete user profile including UUID in localStorage
             localStorage.setItem('userProfile', JSON.stringify(userWithId));
@@ -52,22 +53,41 @@ function decodeJwtResponse(token) {
 /**
  * Checks if user exists in database and gets UUID or creates new user
  * @param {Object} userData - User data object with name, email, and picture
+ * @param {string} credential - Google ID token the profile was decoded from
  * @return {Promise<Object>} Promise resolving to user data with UUID
  */
-async function checkUserAndGetUUID(userData) {
+async function checkUserAndGetUUID(userData, credential) {
     try {
         // API endpoint for user checking/creation
         const endpoint = 'http://127.0.0.1:5000/api/users/check';
         
+        // Send the stored session token so an unchanged profile skips the database
+        const headers = {
+            'Content-Type': 'application/json'
+        };
+        const currentUser = getCurrentUser();
+        if (currentUser && currentUser.session_token && currentUser.email === userData.email) {
+            headers['Authorization'] = `Bearer ${currentUser.session_token}`;
+        }
+        const body = JSON.stringify({ ...userData, credential: credential });
+        
         // Make request to backend
-        const response = await fetch(endpoint, {
+        let response = await fetch(endpoint, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify(userData)
+            headers: headers,
+            body: body
         });
         
+        // Expired or rotated token: retry once without it
+        if (response.status === 401 && headers['Authorization']) {
+            delete headers['Authorization'];
+            response = await fetch(endpoint, {
+                method: 'POST',
+                headers: headers,
+                body: body
+            });
+        }
+        
         if (!response.ok) {
             throw new Error(`Server responded with status: ${response.status}`);
         }
@@ -78,10 +98,11 @@ async function checkUserAndGetUUID(userData) {
             throw new Error(data.message || 'Unknown error occurred');
         }
         
-        // Return user data with UUID
+        // Return user data with UUID and session token
         return {
             ...userData,
-            user_id: data.user_id
+            user_id: data.user_id,
+            session_token: data.session_token
         };
     } catch (error) {
         console.error('Error checking/creating user:', error);
@@ -98,6 +119,95 @@ function getCurrentUser() {
     return userProfile ? JSON.parse(userProfile) : null;
 }
 
+/**
+ * Gets the headers every API request carries: the bearer token, and the time
+ * of this browser's last write so any server worker reads it back
+ * @return {Object} Headers object (empty if not logged in and nothing written)
+ */
+function getAuthHeaders() {
+    const headers = {};
+    const user = getCurrentUser();
+    if (user && user.session_token) {
+        headers['Authorization'] = `Bearer ${user.session_token}`;
+    }
+    const lastWrite = localStorage.getItem('lastWrite');
+    if (lastWrite) {
+        headers['X-Last-Write'] = lastWrite;
+    }
+    return headers;
+}
+
+// Remember the X-Last-Write marker of every API response that wrote
+// (see backend/utils/db.py, read-your-writes)
+const nativeFetch = window.fetch.bind(window);
+window.fetch = async (...args) => {
+    const response = await nativeFetch(...args);
+    const lastWrite = response.headers.get('X-Last-Write');
+    if (lastWrite) {
+        localStorage.setItem('lastWrite', lastWrite);
+    }
+    return response;
+};
+
+/**
+ * Change events a page can react to (see backend/utils/changefeed.py)
+ */
+const CHANGE_EVENTS = [
+    'transaction.created',
+    'transaction.updated',
+    'transaction.deleted',
+    'transactions.changed',
+    'sync.applied',
+    'invoice.processed',
+    'resync'
+];
+
+/**
+ * Opens the change event stream for the current user
+ * EventSource cannot send headers, so the session token goes in the query string.
+ * The browser reconnects on its own after the server ends a stream; events sent
+ * while disconnected are not replayed, so a reconnect is reported as 'resync'.
+ * @param {Function} onChange - Called with (eventType, data) for every change
+ * @param {boolean} reconnecting - Report 'resync' once connected (a retried stream)
+ * @return {EventSource|null} The stream, or null if not logged in or unsupported
+ */
+function subscribeToChanges(onChange, reconnecting = false) {
+    const user = getCurrentUser();
+    if (!user || !user.user_id || typeof EventSource === 'undefined') {
+        return null;
+    }
+    
+    const params = new URLSearchParams({ user_id: user.user_id });
+    if (user.session_token) {
+        params.set('access_token', user.session_token);
+    }
+    
+    const source = new EventSource(`http://127.0.0.1:5000/api/events?${params}`);
+    let connected = reconnecting;
+    
+    source.addEventListener('open', () => {
+        if (connected) {
+            onChange('resync', {});
+        }
+        connected = true;
+    });
+    
+    CHANGE_EVENTS.forEach(eventType => {
+        source.addEventListener(eventType, event => {
+            onChange(eventType, JSON.parse(event.data || '{}'));
+        });
+    });
+    
+    // Rejected streams (server busy, too many open) are not retried by the browser
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => subscribeToChanges(onChange, true), 30000);
+        }
+    });
+    
+    return source;
+}
+
 /**
  * Logs out the current user by clearing localStorage
  */
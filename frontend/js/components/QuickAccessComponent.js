@@ -155,6 +155,7 @@ class QuickAccessComponent {
             // Send the file directly to the invoice processing endpoint
             const response = await fetch('http://127.0.0.1:5000/api/invoices/process', {
                 method: 'POST',
+                headers: getAuthHeaders(),
                 body: formData
             });
             
@@ -178,6 +179,7 @@ class QuickAccessComponent {
             
             const uploadResponse = await fetch('http://127.0.0.1:5000/api/attachments/upload', {
                 method: 'POST',
+                headers: getAuthHeaders(),
                 body: uploadFormData
             });
             
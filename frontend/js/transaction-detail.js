@@ -36,6 +36,7 @@ window.processInvoiceImage = async function(file) {
         // Send the file directly to the invoice processing endpoint
         const response = await fetch('http://127.0.0.1:5000/api/invoices/process', {
             method: 'POST',
+            headers: getAuthHeaders(),
             body: formData
         });
         
@@ -59,6 +60,7 @@ window.processInvoiceImage = async function(file) {
         
         const uploadResponse = await fetch('http://127.0.0.1:5000/api/attachments/upload', {
             method: 'POST',
+            headers: getAuthHeaders(),
             body: uploadFormData
         });
         
@@ -331,6 +333,7 @@ function initPage() {
                     
                     const uploadResponse = await fetch('http://127.0.0.1:5000/api/attachments/upload', {
                         method: 'POST',
+                        headers: getAuthHeaders(),
                         body: uploadFormData
                     });
                     
@@ -459,7 +462,8 @@ async function createCategory(userId, categoryName) {
         const response = await fetch('http://127.0.0.1:5000/api/categories', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                ...getAuthHeaders()
             },
             body: JSON.stringify(payload)
         });
@@ -500,7 +504,8 @@ async function createVendor(userId, vendorName, categoryId) {
         const response = await fetch('http://127.0.0.1:5000/api/vendors', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                ...getAuthHeaders()
             },
             body: JSON.stringify(payload)
         });
@@ -538,7 +543,7 @@ function loadCategories() {
         const userId = userProfile.user_id;
         
         // Now make the API call with the correct userId
-        fetch(`http://127.0.0.1:5000/api/categories?user_id=${userId}`)
+        fetch(`http://127.0.0.1:5000/api/categories?user_id=${userId}`, { headers: getAuthHeaders() })
             .then(response => {
                 if (!response.ok) {
                     throw new Error(`Failed to load categories: ${response.status}`);
@@ -620,7 +625,7 @@ function loadVendors() {
         const userId = userProfile.user_id;
         
         // Now make the API call with the correct userId
-        fetch(`http://127.0.0.1:5000/api/vendors?user_id=${userId}`)
+        fetch(`http://127.0.0.1:5000/api/vendors?user_id=${userId}`, { headers: getAuthHeaders() })
             .then(response => {
                 if (!response.ok) {
                     throw new Error(`Failed to load vendors: ${response.status}`);
@@ -802,7 +807,10 @@ async function loadTransaction(transactionId) {
  */
 async function fetchWithRetry(url, options = {}, retries = 3, delay = 1000) {
     try {
-        const response = await fetch(url, options);
+        const response = await fetch(url, {
+            ...options,
+            headers: { ...getAuthHeaders(), ...(options.headers || {}) }
+        });
         
         if (!response.ok) {
             throw new Error(`Server responded with status: ${response.status}`);
@@ -1183,7 +1191,8 @@ async function saveTransaction(transactionData) {
         const response = await fetch(url, {
             method: method,
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                ...getAuthHeaders()
             },
             body: JSON.stringify(payload)
         });
@@ -1232,7 +1241,8 @@ async function deleteTransaction(transactionId) {
         
         const userId = userProfile.user_id;
         const response = await fetch(`http://127.0.0.1:5000/api/transactions/${transactionId}?user_id=${userId}`, {
-            method: 'DELETE'
+            method: 'DELETE',
+            headers: getAuthHeaders()
         });
         
         if (!response.ok) {
@@ -1292,7 +1302,10 @@ function handleFileSelection(file) {
  */
 async function fetchWithRetry(url, options = {}, retries = 3, delay = 1000) {
     try {
-        const response = await fetch(url, options);
+        const response = await fetch(url, {
+            ...options,
+            headers: { ...getAuthHeaders(), ...(options.headers || {}) }
+        });
         
         if (!response.ok) {
             throw new Error(`Server responded with status: ${response.status}`);
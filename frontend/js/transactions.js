@@ -13,17 +13,30 @@ document.addEventListener('DOMContentLoaded', () => {
     
     const userData = JSON.parse(userProfile);
     loadTransactions(userData.user_id);
+    
+    // Refetch when transactions change on another device or from an invoice
+    let refreshTimer = null;
+    subscribeToChanges(() => {
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(() => loadTransactions(userData.user_id, true), 300);
+    });
 });
 
 /**
  * Load transactions from the API
+ * @param {string} userId - User UUID
+ * @param {boolean} quiet - Keep the current list on screen while refetching
  */
-async function loadTransactions(userId) {
+async function loadTransactions(userId, quiet = false) {
     try {
         const container = document.getElementById('transactions-container');
-        container.innerHTML = '<p class="loading">Loading transactions...</p>';
+        if (!quiet) {
+            container.innerHTML = '<p class="loading">Loading transactions...</p>';
+        }
         
-        const response = await fetch(`http://127.0.0.1:5000/api/transactions?user_id=${userId}`);
+        const response = await fetch(`http://127.0.0.1:5000/api/transactions?user_id=${userId}`, {
+            headers: getAuthHeaders()
+        });
         
         if (!response.ok) {
             throw new Error(`Error: ${response.status}`);